@@ -1,8 +1,13 @@
 #!/usr/bin/env python3
 """Script para normalizar o CSV venda_aparelhos.csv"""
-import csv, re, sys
+import csv, os, re, sys
 from collections import Counter
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+from leitor_csv import ler_vendas
+import perfilador
+perfilador.ativar()
+
 INPUT = 'venda_aparelhos.csv'
 OUTPUT = 'venda_aparelhos_normalizado.csv'
 
@@ -17,22 +22,12 @@ def fmt_brl(v):
     s = f'R$ {v:,.2f}'
     return s.replace(',', 'X').replace('.', ',').replace('X', '.')
 
+# Texto ja chega em UTF-8 limpo (ingestao_csv): so tirar acento, numa passada
+ACENTOS = str.maketrans('ÃÂÁÀÄÉÊÈËÍÎÌÏÓÔÕÒÖÚÛÙÜÇÑ', 'AAAAAEEEEIIIIOOOOOUUUUCN')
+
 def normalizar_forma(texto):
     if not texto or not texto.strip(): return 'nao_informado'
-    t = texto.encode('latin-1', errors='replace').decode('utf-8', errors='replace')
-    t = t.upper()
-    # Remover acentos
-    for ac, sem in [
-        ('Ãƒ', 'A'), ('Ã', 'A'), ('Â', 'A'), ('Á', 'A'), ('À', 'A'),
-        ('É', 'E'), ('Ê', 'E'), ('È', 'E'),
-        ('Í', 'I'), ('Î', 'I'),
-        ('Ó', 'O'), ('Ô', 'O'), ('Õ', 'O'), ('Ò', 'O'),
-        ('Ú', 'U'), ('Û', 'U'), ('Ù', 'U'),
-        ('Ç', 'C'), ('Ñ', 'N'),
-        ('¢', 'C'), ('©', 'C'),
-        ('€', 'E'),
-    ]:
-        t = t.replace(ac, sem)
+    t = texto.upper().translate(ACENTOS)
     t = re.sub(r'[^A-Z0-9 /]+', ' ', t)
     t = re.sub(r'\s+', ' ', t).strip()
 
@@ -49,27 +44,25 @@ def normalizar_forma(texto):
     return ' + '.join(f) if f else 'outros'
 
 # Ler
-with open(INPUT, 'r', encoding='latin-1') as f:
-    reader = csv.DictReader(f)
-    linhas = list(reader)
+linhas = ler_vendas(INPUT)
 
 # Processar
 novas = []
 for row in linhas:
-    venda = parse_brl(row.get('VALOR DE VENDA', ''))
-    custo = parse_brl(row.get('CUSTO APARELHO', ''))
-    brinde = parse_brl(row.get('BRINDE', ''))
-    lucro = parse_brl(row.get('LUCRO', ''))
-    forma_orig = row.get('FORMA DE PAGAMENTO', '').strip()
+    venda = parse_brl(row.valor_venda)
+    custo = parse_brl(row.custo)
+    brinde = parse_brl(row.brinde)
+    lucro = parse_brl(row.lucro)
+    forma_orig = row.forma
     forma_norm = normalizar_forma(forma_orig)
     vl = venda - brinde
-    imei = row.get('IMEI', '').strip().replace(' ', '')
-    vendedor = row.get('VENDEDOR', '').strip().title()
-    loja = row.get('LOJA', '').strip().upper()
+    imei = row.imei.replace(' ', '')
+    vendedor = row.vendedor.title()
+    loja = row.loja.upper()
 
     novas.append({
-        'DATA': row.get('DATA', '').strip(),
-        'MODELO': row.get('MODELO', '').strip(),
+        'DATA': row.data,
+        'MODELO': row.modelo,
         'IMEI': imei,
         'VALOR DE VENDA': fmt_brl(venda),
         'BRINDE': fmt_brl(brinde) if brinde > 0 else '',
@@ -79,8 +72,8 @@ for row in linhas:
         'VALOR LIQUIDO': fmt_brl(vl),
         'LUCRO': fmt_brl(lucro),
         'VENDEDOR': vendedor,
-        'MES': row.get('MES', '').strip() or row.get('M\xcaS', '').strip(),
-        'ANO': row.get('ANO', '').strip(),
+        'MES': row.mes,
+        'ANO': row.ano,
         'LOJA': loja,
     })
 
@@ -3,9 +3,16 @@
 Script de normalização e PREVIEW para vendas_aparelhos2.csv
 Não faz nenhuma alteração no banco. Apenas analisa e gera preview.
 """
-import csv, re, uuid, sys
+import os, re, sys
 from collections import Counter
-from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+from modelos import detectar_estado, extract_brand
+from registros_venda import LOJA, VENDEDOR, VendaNormalizada, gravar_csv
+from leitor_csv import ler_vendas
+import regex_seguro as rx
+import perfilador
+perfilador.ativar()
 
 INPUT = 'vendas_aparelhos2.csv'
 OUTPUT_PREVIEW = 'scripts/vendas_aparelhos2_normalizado.csv'
@@ -40,35 +47,29 @@ LOJA_MAP = {
 
 def parse_brl(v):
     if not v or not v.strip(): return 0.0
-    v = re.sub(r'^R?\$\s*', '', v.strip())
+    v = rx.sub(r'^R?\$\s*', '', v.strip())
     v = v.replace('.', '').replace(',', '.')
     try: return float(v)
     except: return 0.0
 
 def to_date(datestr):
     if not datestr or not datestr.strip(): return None
-    m = re.match(r'(\d{2})/(\d{2})/(\d{4})', datestr.strip())
+    m = rx.match(r'(\d{2})/(\d{2})/(\d{4})', datestr.strip())
     if m: return f'{m.group(3)}-{m.group(2)}-{m.group(1)}'
     return None
 
-def detectar_estado(modelo):
-    m = modelo.upper()
-    if 'NOVO' in m: return 'novo'
-    if 'SEMINOVO' in m: return 'seminovo'
-    if 'USADO' in m: return 'usado'
-    return 'seminovo'
-
-def extract_brand(modelo):
-    m = modelo.upper().strip()
-    if m.startswith('IPHONE') or m.startswith('IPAD') or m.startswith('MAC') or m.startswith('APPLE'): return 'Apple'
-    if m.startswith('SAMSUNG'): return 'Samsung'
-    if m.startswith('REDMI') or m.startswith('MI '): return 'Xiaomi'
-    if m.startswith('REALME'): return 'Realme'
-    if m.startswith('NOTE'): return 'Redmi'
-    return 'Outros'
-
 def normalizar_pagamento(texto):
     """Extrai valores de cada forma de pagamento do texto livre."""
+    # com prazo: texto patologico vai para revisao em vez de travar o lote
+    try:
+        with rx.prazo(texto or ''):
+            return _normalizar_pagamento(texto)
+    except rx.PrazoEsgotado as e:
+        return {'formas': 'nao_analisado', 'pix': 0, 'dinheiro': 0,
+                'cartao_credito': 0, 'cartao_debito': 0, 'troca': 0,
+                'modelo_troca': '', 'precisa_revisao': 'SIM', 'motivo': f'pagamento nao analisado ({e})'}
+
+def _normalizar_pagamento(texto):
     if not texto or not texto.strip():
         return {'formas': 'nao_informado', 'pix': 0, 'dinheiro': 0,
                 'cartao_credito': 0, 'cartao_debito': 0, 'troca': 0,
@@ -78,13 +79,13 @@ def normalizar_pagamento(texto):
     t_upper = t.upper()
 
     # Detectar PAGAMENTO JUNTO (grupo)
-    if 'PAGAMENTO JUNTO' in t_upper and re.search(r'APARELHO\s*[234]', t_upper):
+    if 'PAGAMENTO JUNTO' in t_upper and rx.search(r'APARELHO\s*[234]', t_upper):
         return {'formas': 'pagamento_junto_secundario', 'pix': 0, 'dinheiro': 0,
                 'cartao_credito': 0, 'cartao_debito': 0, 'troca': 0,
                 'modelo_troca': '', 'precisa_revisao': 'SIM', 'motivo': 'pagamento junto - aparelho 2+'}
 
     # Detectar GARANTIA
-    if re.match(r'^GARANTIA', t_upper):
+    if rx.match(r'^GARANTIA', t_upper):
         return {'formas': 'garantia', 'pix': 0, 'dinheiro': 0,
                 'cartao_credito': 0, 'cartao_debito': 0, 'troca': 0,
                 'modelo_troca': '', 'precisa_revisao': 'SIM', 'motivo': 'garantia - revisar manualmente'}
@@ -93,7 +94,7 @@ def normalizar_pagamento(texto):
                  'cartao_debito': 0.0, 'troca': 0.0, 'modelo_troca': ''}
 
     # Extrair troca/entrada
-    troca_match = re.search(
+    troca_match = rx.search(
         r'(?:entrou?|entrada|entrando|pegando|trocando)[^\d/]*(?:um|uma|iphone|samsung|redmi|realme)?[^R$\d]*'
         r'([A-Za-z0-9 ]+?)(?:\s+(?:por|a|no valor de|seminovo|novo|usado)\s*)?'
         r'(?:R\$\s*)?(\d[\d.,]*)',
@@ -112,14 +113,14 @@ def normalizar_pagamento(texto):
         t_sem_troca = t
 
     # Detectar apenas credito (sem pix/dinheiro) - parcelas
-    so_credito = re.match(r'^R?\$?\s*[\d.,]+\s*(?:em|credito|crédito|CRÉDITO|CREDITO|\d+x)', t_sem_troca, re.IGNORECASE)
+    so_credito = rx.match(r'^R?\$?\s*[\d.,]+\s*(?:em|credito|crédito|CRÉDITO|CREDITO|\d+x)', t_sem_troca, re.IGNORECASE)
 
     # Extrair valores de PIX
-    pix_vals = re.findall(r'(?:pix\s*(?:de\s*)?R?\$?\s*|R?\$\s*[\d.,]+\s*(?:no\s*)?pix)'
+    pix_vals = rx.findall(r'(?:pix\s*(?:de\s*)?R?\$?\s*|R?\$\s*[\d.,]+\s*(?:no\s*)?pix)'
                           r'|(?:PIX[:\s]*R?\$?\s*)([\d.,]+)', t_sem_troca, re.IGNORECASE)
 
     # Abordagem mais simples: extrair todos os numeros e categorizar pelo contexto
-    partes = re.split(r'\s*/\s*|\s*\+\s*', t_sem_troca)
+    partes = rx.split(r'\s*/\s*|\s*\+\s*', t_sem_troca)
     formas_detectadas = set()
 
     for parte in partes:
@@ -128,7 +129,7 @@ def normalizar_pagamento(texto):
         p_upper = parte.upper()
 
         # Extrair valor monetario da parte
-        val_match = re.search(r'R?\$?\s*([\d.,]+)', parte)
+        val_match = rx.search(r'R?\$?\s*([\d.,]+)', parte)
         val = 0.0
         if val_match:
             raw = val_match.group(1).replace('.', '').replace(',', '.')
@@ -144,7 +145,7 @@ def normalizar_pagamento(texto):
         elif 'DEBITO' in p_upper or 'DÉBITO' in p_upper:
             resultado['cartao_debito'] += val
             formas_detectadas.add('cartao_debito')
-        elif re.search(r'CREDITO|CRÉDITO|CARTAO|CARTÃO|\d+[Xx]', p_upper):
+        elif rx.search(r'CREDITO|CRÉDITO|CARTAO|CARTÃO|\d+[Xx]', p_upper):
             resultado['cartao_credito'] += val
             formas_detectadas.add('cartao_credito')
         elif resultado['troca'] > 0 and 'ENTRADA' in p_upper:
@@ -177,9 +178,7 @@ def normalizar_pagamento(texto):
 
 
 # ── Ler CSV ──────────────────────────────────────────────────────────────────
-with open(INPUT, 'r', encoding='utf-8-sig') as f:
-    reader = csv.DictReader(f)
-    rows = list(reader)
+rows = ler_vendas(INPUT)
 
 print(f'Total de linhas lidas: {len(rows)}')
 print()
@@ -193,17 +192,17 @@ resultados = []
 
 for idx, row in enumerate(rows, start=2):
     linha_num = idx
-    data = row.get('DATA', '').strip()
-    modelo = row.get('MODELO', '').strip()
-    imei_raw = row.get('IMEI', '').strip()
-    imei = re.sub(r'\s+', '', imei_raw)
-    valor_venda = parse_brl(row.get('VALOR DE VENDA', ''))
-    brinde = parse_brl(row.get('BRINDE', ''))
-    custo = parse_brl(row.get('CUSTO APARELHO', ''))
-    lucro = parse_brl(row.get('LUCRO', ''))
-    forma_orig = row.get('FORMA DE PAGAMENTO', '').strip()
-    vendedor = row.get('VENDEDOR', '').strip()
-    loja = row.get('LOJA', '').strip().upper()
+    data = row.data
+    modelo = row.modelo
+    imei_raw = row.imei
+    imei = rx.sub(r'\s+', '', imei_raw)
+    valor_venda = parse_brl(row.valor_venda)
+    brinde = parse_brl(row.brinde)
+    custo = parse_brl(row.custo)
+    lucro = parse_brl(row.lucro)
+    forma_orig = row.forma
+    vendedor = row.vendedor
+    loja = LOJA.normalizar(row.loja, str.upper)
 
     issues = []
 
@@ -245,36 +244,36 @@ for idx, row in enumerate(rows, start=2):
     estado = detectar_estado(modelo)
     marca = extract_brand(modelo)
 
-    registro = {
-        'orig_linha': linha_num,
-        'data': data,
-        'data_iso': data_iso or '',
-        'modelo': modelo,
-        'marca': marca,
-        'imei': imei,
-        'imei_dup': 'SIM' if imei_dup else '',
-        'valor_venda': valor_venda,
-        'brinde': brinde,
-        'custo': custo,
-        'lucro': lucro,
-        'forma_orig': forma_orig,
-        'formas_norm': pgto['formas'],
-        'pix': pgto['pix'],
-        'dinheiro': pgto['dinheiro'],
-        'cartao_credito': pgto['cartao_credito'],
-        'cartao_debito': pgto['cartao_debito'],
-        'troca_aparelho': pgto['troca'],
-        'modelo_troca': pgto['modelo_troca'],
-        'soma_pgto': round(pgto['pix'] + pgto['dinheiro'] + pgto['cartao_credito'] + pgto['cartao_debito'] + pgto['troca'], 2),
-        'precisa_revisao': pgto['precisa_revisao'],
-        'motivo_revisao': pgto.get('motivo', ''),
-        'estado': estado,
-        'vendedor': vendedor,
-        'vendedor_id': vendedor_id,
-        'loja': loja,
-        'loja_id': loja_id,
-        'issues': ' | '.join(issues) if issues else '',
-    }
+    registro = VendaNormalizada(
+        orig_linha=linha_num,
+        data=data,
+        data_iso=data_iso or '',
+        modelo=modelo,
+        marca=marca,
+        imei=imei,
+        imei_dup='SIM' if imei_dup else '',
+        valor_venda=valor_venda,
+        brinde=brinde,
+        custo=custo,
+        lucro=lucro,
+        forma_orig=forma_orig,
+        formas_norm=pgto['formas'],
+        pix=pgto['pix'],
+        dinheiro=pgto['dinheiro'],
+        cartao_credito=pgto['cartao_credito'],
+        cartao_debito=pgto['cartao_debito'],
+        troca_aparelho=pgto['troca'],
+        modelo_troca=pgto['modelo_troca'],
+        soma_pgto=round(pgto['pix'] + pgto['dinheiro'] + pgto['cartao_credito'] + pgto['cartao_debito'] + pgto['troca'], 2),
+        precisa_revisao=pgto['precisa_revisao'],
+        motivo_revisao=pgto.get('motivo', ''),
+        estado=estado,
+        vendedor=vendedor,
+        vendedor_id=vendedor_id,
+        loja=loja,
+        loja_id=loja_id,
+        issues=' | '.join(issues) if issues else '',
+    )
 
     if issues:
         for iss in issues:
@@ -287,51 +286,55 @@ print('='*70)
 print('RESUMO DA NORMALIZAÇÃO')
 print('='*70)
 print(f'Total de linhas:          {len(resultados)}')
-print(f'Com IMEI:                 {sum(1 for r in resultados if r["imei"])}')
-print(f'Sem IMEI:                 {sum(1 for r in resultados if not r["imei"])}')
-print(f'IMEI duplicado no CSV:    {sum(1 for r in resultados if r["imei_dup"]=="SIM")}')
-print(f'Precisa revisão (pgto):   {sum(1 for r in resultados if r["precisa_revisao"]=="SIM")}')
-print(f'Prontos para importar:    {sum(1 for r in resultados if r["precisa_revisao"]=="NAO" and r["vendedor_id"] and r["loja_id"] and r["data_iso"])}')
+print(f'Com IMEI:                 {sum(1 for r in resultados if r.imei)}')
+print(f'Sem IMEI:                 {sum(1 for r in resultados if not r.imei)}')
+print(f'IMEI duplicado no CSV:    {sum(1 for r in resultados if r.imei_dup=="SIM")}')
+print(f'Precisa revisão (pgto):   {sum(1 for r in resultados if r.precisa_revisao=="SIM")}')
+print(f'Prontos para importar:    {sum(1 for r in resultados if r.precisa_revisao=="NAO" and r.vendedor_id and r.loja_id and r.data_iso)}')
 print()
 
+# contagens por codigo da categoria (uma passada), nao uma varredura por nome
+qtd_vendedor = VENDEDOR.contar(VendaNormalizada.codigos(resultados, 'vendedor'))
+qtd_loja = LOJA.contar(VendaNormalizada.codigos(resultados, 'loja'))
+
 if vendedores_sem_id:
     print(f'⚠️  VENDEDORES SEM UUID (precisam ser cadastrados):')
     for v in sorted(vendedores_sem_id):
-        cnt = sum(1 for r in resultados if r['vendedor'] == v)
+        cnt = qtd_vendedor[VENDEDOR.codigo(v)]
         print(f'   - "{v}" ({cnt} vendas)')
     print()
 
 if lojas_sem_map:
     print(f'⚠️  LOJAS SEM MAPEAMENTO:')
     for l in sorted(lojas_sem_map):
-        cnt = sum(1 for r in resultados if r['loja'] == l)
+        cnt = qtd_loja[LOJA.codigo(l)]
         print(f'   - "{l}" ({cnt} vendas)')
     print()
 
 print('FORMAS DE PAGAMENTO NORMALIZADAS:')
-formas_count = Counter(r['formas_norm'] for r in resultados)
+formas_count = Counter(r.formas_norm for r in resultados)
 for f, c in sorted(formas_count.items(), key=lambda x: -x[1]):
     marker = ' ⚠️  (precisa revisão)' if 'outro' in f or 'secundario' in f or 'garantia' in f or 'nao_informado' in f else ''
     print(f'  {c:3}x {f}{marker}')
 print()
 
 print('LOJAS:')
-loja_count = Counter(f'{r["loja"]} (id={r["loja_id"]})' for r in resultados)
+loja_count = Counter(f'{r.loja} (id={r.loja_id})' for r in resultados)
 for l, c in sorted(loja_count.items(), key=lambda x: -x[1]):
     print(f'  {c:3}x {l}')
 print()
 
 print('VENDEDORES:')
-vend_count = Counter(f'{r["vendedor"]}' for r in resultados)
+vend_count = Counter(f'{r.vendedor}' for r in resultados)
 for v, c in sorted(vend_count.items(), key=lambda x: -x[1]):
     vid = VENDEDOR_MAP.get(v, '❌ SEM UUID')
     print(f'  {c:3}x {v:<20} {vid}')
 print()
 
 print('LINHAS QUE PRECISAM DE REVISÃO MANUAL:')
-revisao = [r for r in resultados if r['precisa_revisao'] == 'SIM']
+revisao = [r for r in resultados if r.precisa_revisao == 'SIM']
 for r in revisao:
-    print(f'  Linha {r["orig_linha"]:3}: {r["modelo"][:45]:<45} | {r["motivo_revisao"]}')
+    print(f'  Linha {r.orig_linha:3}: {r.modelo[:45]:<45} | {r.motivo_revisao}')
 print(f'  Total: {len(revisao)}')
 print()
 
@@ -344,17 +347,7 @@ if problemas:
         print()
 
 # ── Gravar CSV normalizado ────────────────────────────────────────────────────
-campos = ['orig_linha','data','data_iso','modelo','marca','imei','imei_dup',
-          'valor_venda','brinde','custo','lucro',
-          'forma_orig','formas_norm','pix','dinheiro','cartao_credito','cartao_debito',
-          'troca_aparelho','modelo_troca','soma_pgto',
-          'precisa_revisao','motivo_revisao',
-          'estado','vendedor','vendedor_id','loja','loja_id','issues']
-
-with open(OUTPUT_PREVIEW, 'w', newline='', encoding='utf-8') as f:
-    writer = csv.DictWriter(f, fieldnames=campos, extrasaction='ignore')
-    writer.writeheader()
-    writer.writerows(resultados)
+gravar_csv(OUTPUT_PREVIEW, resultados, VendaNormalizada.CAMPOS)
 
 print(f'CSV normalizado salvo em: {OUTPUT_PREVIEW}')
 print()
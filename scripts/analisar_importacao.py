@@ -2,14 +2,28 @@
 """
 Analisa venda_aparelhos.csv e prepara tudo para importacao.
 Gera previews, mapeamentos e SQL (sem executar nada no banco).
+
+Rodado direto grava os previews (fonte: venda_aparelhos.csv ou o .csv/.xlsx
+passado como argumento); importado nao faz nada alem de definir a API:
+
+  carregar() -> normalizar() -> analisar() -> relatorio() / gravar_previews()
+
+  from analisar_importacao import vendas
+  for v in vendas():          # Venda normalizada, parse unico por processo
+      ...
 """
-import csv, re, json, os
-from collections import Counter, defaultdict
+import csv, json, os
+from collections import Counter, namedtuple
+from functools import lru_cache
+from registros_venda import LOJA, VENDEDOR, TrocaDetectada, TrocaRevisao, VendaAnalisada, gravar_csv
+from importacao_cli import args_posicionais
+from leitor_csv import ler_vendas
+import perfilador
+import regex_seguro as rx
 
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 INPUT = os.path.join(ROOT, 'venda_aparelhos.csv')
 OUTPUT_DIR = os.path.join(ROOT, 'scripts', 'importacao_preview')
-os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 # ====================================================================
 # MAPEAMENTOS (extraidos de gerar-vendas-lote.ts)
@@ -51,7 +65,7 @@ def parse_brl(v):
     if not v or not v.strip(): return 0.0
     v = v.strip()
     if v.upper() in ('GARANTIA', 'TROCA', 'DEPOSITO'): return None  # nao e valor monetario
-    v = re.sub(r'^R\$\s*', '', v)
+    v = rx.sub(r'^R\$\s*', '', v)
     v = v.replace('.', '').replace(',', '.')
     try: return float(v)
     except: return 0.0
@@ -60,7 +74,7 @@ def to_date(datestr):
     """Converte '01/05/2026' para '2026-05-01'"""
     if not datestr: return None
     datestr = datestr.strip()
-    match = re.match(r'(\d{2})/(\d{2})/(\d{4})', datestr)
+    match = rx.match(r'(\d{2})/(\d{2})/(\d{4})', datestr)
     if match: return f'{match.group(3)}-{match.group(2)}-{match.group(1)}'
     return None
 
@@ -87,7 +101,7 @@ def extrair_troca(texto):
     texto_original = texto
     t = texto.upper()
     t = limpar_acentos(t)
-    t = re.sub(r'\s+', ' ', t).strip()
+    t = rx.sub(r'\s+', ' ', t).strip()
     
     trocas = []
     
@@ -95,7 +109,7 @@ def extrair_troca(texto):
     # ENTRADA IPH 15 PRO MAX 256GB NATURAL R$ 3.200,00
     # ENTRADA IPH 14 PRO MAX ROXO 256GB R$ 3.000
     # ENTRADA IPH 13 1.550,00
-    matches = list(re.finditer(
+    matches = list(rx.finditer(
         r'ENTRADA\s+(.+?)\s+R?\$?\s*([\d]+\s*[.,]\s*[\d]+)',
         t
     ))
@@ -103,13 +117,13 @@ def extrair_troca(texto):
         modelo = m.group(1).strip()
         valor_str = m.group(2).strip().replace(' ', '').replace('.', '').replace(',', '.')
         try:
-            valor = float(re.sub(r'[^0-9.]', '', valor_str))
+            valor = float(rx.sub(r'[^0-9.]', '', valor_str))
         except:
             continue
         # Limpar palavras residuais do modelo
         for word in ['R$', 'REAL', 'REAIS']:
             modelo = modelo.replace(word, '')
-        modelo = re.sub(r'\s+', ' ', modelo).strip()
+        modelo = rx.sub(r'\s+', ' ', modelo).strip()
         if len(modelo) >= 3 and valor > 0:
             trocas.append({'modelo': modelo, 'valor': valor})
     
@@ -118,13 +132,13 @@ def extrair_troca(texto):
     
     # --- PADRAO 2: "entrou <modelo> na troca por <valor>" ---
     # "entrou 14 128 lilas seminovo na troca por 1800,00"
-    m = re.search(r'ENTROU\s+(.+?)\s+(SEMINOVO|NOVO|USADO)?\s*NA\s+TROCA\s+POR\s+R?\$?\s*([\d.,]+)', t)
+    m = rx.search(r'ENTROU\s+(.+?)\s+(SEMINOVO|NOVO|USADO)?\s*NA\s+TROCA\s+POR\s+R?\$?\s*([\d.,]+)', t)
     if m:
         modelo = m.group(1).strip()
         if m.group(2): modelo += ' ' + m.group(2)
         valor_str = m.group(3).strip().replace('.', '').replace(',', '.')
         try:
-            valor = float(re.sub(r'[^0-9.]', '', valor_str))
+            valor = float(rx.sub(r'[^0-9.]', '', valor_str))
         except:
             valor = 0
         if len(modelo) >= 3 and valor > 0:
@@ -132,11 +146,12 @@ def extrair_troca(texto):
             return trocas
     
     # --- PADRAO 3: "<modelo> de entrada no valor de R$ <valor>" ---
-    m = re.search(r'(.+?)\s+DE\s+ENTRADA\s+NO\s+VALOR\s+DE\s+R?\$?\s*([\d.,]+)', t)
+    # o sufixo primeiro: '(.+?)' na frente era tentado a partir de cada posicao
+    m = rx.search(r'\s+DE\s+ENTRADA\s+NO\s+VALOR\s+DE\s+R?\$?\s*([\d.,]+)', t)
     if m:
-        modelo = m.group(1).strip()
-        valor_str = m.group(2).strip().replace('.', '').replace(',', '.')
-        try: valor = float(re.sub(r'[^0-9.]', '', valor_str))
+        modelo = t[:m.start()].strip()
+        valor_str = m.group(1).strip().replace('.', '').replace(',', '.')
+        try: valor = float(rx.sub(r'[^0-9.]', '', valor_str))
         except: valor = 0
         # Limpar: "iphone 12 Pro Max 128GB"
         if len(modelo) >= 3 and valor > 0:
@@ -144,25 +159,25 @@ def extrair_troca(texto):
             return trocas
     
     # --- PADRAO 4: "a entrada de um <modelo>" (ex: "1600,00 a entrada de um 13 seminovo") ---
-    m = re.search(r'ENTRADA\s+(?:DE\s+)?(?:UM\s+)?(.+?)\s+(?:POR\s+)?R?\$?\s*([\d.,]+)', t)
+    m = rx.search(r'ENTRADA\s+(?:DE\s+)?(?:UM\s+)?(.+?)\s+(?:POR\s+)?R?\$?\s*([\d.,]+)', t)
     if m:
         modelo = m.group(1).strip()
         valor_str = m.group(2).strip().replace('.', '').replace(',', '.')
-        try: valor = float(re.sub(r'[^0-9.]', '', valor_str))
+        try: valor = float(rx.sub(r'[^0-9.]', '', valor_str))
         except: valor = 0
         for word in ['R$', 'REAL', 'REAIS']:
             modelo = modelo.replace(word, '')
-        modelo = re.sub(r'\s+', ' ', modelo).strip()
+        modelo = rx.sub(r'\s+', ' ', modelo).strip()
         if len(modelo) >= 3 and valor > 0:
             trocas.append({'modelo': modelo, 'valor': valor})
             return trocas
     
     # --- PADRAO 5: "pegando na troca um <modelo> por <valor>" ---
-    m = re.search(r'PEGANDO\s+(?:NA\s+TROCA\s+)?(?:UM\s+)?(.+?)\s+POR\s+R?\$?\s*([\d.,]+)', t)
+    m = rx.search(r'PEGANDO\s+(?:NA\s+TROCA\s+)?(?:UM\s+)?(.+?)\s+POR\s+R?\$?\s*([\d.,]+)', t)
     if m:
         modelo = m.group(1).strip()
         valor_str = m.group(2).strip().replace('.', '').replace(',', '.')
-        try: valor = float(re.sub(r'[^0-9.]', '', valor_str))
+        try: valor = float(rx.sub(r'[^0-9.]', '', valor_str))
         except: valor = 0
         if len(modelo) >= 3 and valor > 0:
             trocas.append({'modelo': modelo, 'valor': valor})
@@ -170,33 +185,33 @@ def extrair_troca(texto):
     
     # --- PADRAO 6: "um aparelho na troca, <modelo> por <valor>" ---
     # "$2300 no pix / e um aparelho na troca, iphone 13 preto, 128g por $1650"
-    m = re.search(r'(?:UM\s+)?APARELHO\s+(?:NA\s+)?TROCA[.,;: ]+(.+?)\s+POR\s+R?\$?\s*([\d.,]+)', t)
+    m = rx.search(r'(?:UM\s+)?APARELHO\s+(?:NA\s+)?TROCA[.,;: ]+(.+?)\s+POR\s+R?\$?\s*([\d.,]+)', t)
     if m:
         modelo = m.group(1).strip()
         valor_str = m.group(2).strip().replace('.', '').replace(',', '.')
-        try: valor = float(re.sub(r'[^0-9.]', '', valor_str))
+        try: valor = float(rx.sub(r'[^0-9.]', '', valor_str))
         except: valor = 0
         if len(modelo) >= 3 and valor > 0:
             trocas.append({'modelo': modelo, 'valor': valor})
             return trocas
     
     # --- PADRAO 7: "Downgrade / <modelo> R$ <valor>" ---
-    m = re.search(r'DOWNGRADE\s*[/\-]?\s*(.+?)\s+R?\$?\s*([\d.,]+)', t)
+    m = rx.search(r'DOWNGRADE\s*[/\-]?\s*(.+?)\s+R?\$?\s*([\d.,]+)', t)
     if m:
         modelo = m.group(1).strip()
         valor_str = m.group(2).strip().replace('.', '').replace(',', '.')
-        try: valor = float(re.sub(r'[^0-9.]', '', valor_str))
+        try: valor = float(rx.sub(r'[^0-9.]', '', valor_str))
         except: valor = 0
         if len(modelo) >= 3 and valor > 0:
             trocas.append({'modelo': modelo, 'valor': valor})
             return trocas
     
     # --- PADRAO 8: "ENTRADA: <modelo> : <valor>" (ex: "ENTRADA: IPHONE X 256 GB PRETO : 0,00") ---
-    m = re.search(r'ENTRADA[:\s]+(.+?)\s*:\s*R?\$?\s*([\d.,]+)', t)
+    m = rx.search(r'ENTRADA[:\s]+(.+?)\s*:\s*R?\$?\s*([\d.,]+)', t)
     if m:
         modelo = m.group(1).strip()
         valor_str = m.group(2).strip().replace('.', '').replace(',', '.')
-        try: valor = float(re.sub(r'[^0-9.]', '', valor_str))
+        try: valor = float(rx.sub(r'[^0-9.]', '', valor_str))
         except: valor = 0
         if len(modelo) >= 3 and valor > 0:
             trocas.append({'modelo': modelo, 'valor': valor})
@@ -206,10 +221,10 @@ def extrair_troca(texto):
     # Ex: "5000,00 referente a entrada do 16 pro Max seminovo"
     # Ex: "1600,00 a entrada de um 13 seminovo"
     # Ex: "300,00 restante a entrada de um xs Max seminovo"
-    m = re.search(r'([\d.,]+)\s+(?:RESTANTE\s+)?(?:A\s+)?(?:REFERENTE\s+A\s+)?(?:DE\s+)?ENTRADA\s+(?:DE\s+)?(?:UM\s+)?(?:DO\s+)?(.+?)$', t)
+    m = rx.search(r'(?<![\d.,])([\d.,]+)\s+(?:RESTANTE\s+)?(?:A\s+)?(?:REFERENTE\s+A\s+)?(?:DE\s+)?ENTRADA\s+(?:DE\s+)?(?:UM\s+)?(?:DO\s+)?(.+?)$', t)
     if m:
         valor_str = m.group(1).strip().replace('.', '').replace(',', '.')
-        try: valor = float(re.sub(r'[^0-9.]', '', valor_str))
+        try: valor = float(rx.sub(r'[^0-9.]', '', valor_str))
         except: valor = 0
         modelo = m.group(2).strip()
         if len(modelo) >= 3 and valor > 0:
@@ -218,25 +233,25 @@ def extrair_troca(texto):
     
     # --- PADRAO 10: "PEGANDO <modelo> PRO <valor>" (typo: PRO instead of POR) ---
     # "PEGANDO IPHONE 16 PRO 128GB PRO 4.350,00/R$950,00 PIX"
-    m = re.search(r'PEGANDO\s+(.+?)\s+PRO\s+R?\$?\s*([\d.,]+)', t)
+    m = rx.search(r'PEGANDO\s+(.+?)\s+PRO\s+R?\$?\s*([\d.,]+)', t)
     if m:
         modelo = m.group(1).strip()
         valor_str = m.group(2).strip().replace('.', '').replace(',', '.')
-        try: valor = float(re.sub(r'[^0-9.]', '', valor_str))
+        try: valor = float(rx.sub(r'[^0-9.]', '', valor_str))
         except: valor = 0
         if len(modelo) >= 3 and valor > 0:
             trocas.append({'modelo': modelo, 'valor': valor})
             return trocas
     
     # --- PADRAO 11: "Entrou <modelo> de volta" (return/exchange) ---
-    m = re.search(r'ENTROU\s+(?:O\s+)?(.+?)\s+DE\s+VOLTA', t)
+    m = rx.search(r'ENTROU\s+(?:O\s+)?(.+?)\s+DE\s+VOLTA', t)
     if m:
         modelo = m.group(1).strip()
         # Buscar valor de diferença pago
-        m2 = re.search(r'PAGOU\s+R?\$?\s*([\d.,]+)', t)
+        m2 = rx.search(r'PAGOU\s+R?\$?\s*([\d.,]+)', t)
         if m2:
             valor_str = m2.group(1).strip().replace('.', '').replace(',', '.')
-            try: valor = float(re.sub(r'[^0-9.]', '', valor_str))
+            try: valor = float(rx.sub(r'[^0-9.]', '', valor_str))
             except: valor = 0
         else:
             valor = 0
@@ -250,8 +265,8 @@ def extrair_troca(texto):
 def normalizar_forma(texto):
     if not texto or not texto.strip(): return []
     t = limpar_acentos(texto.upper())
-    t = re.sub(r'[^A-Z0-9 /]', ' ', t)
-    t = re.sub(r'\s+', ' ', t).strip()
+    t = rx.sub(r'[^A-Z0-9 /]', ' ', t)
+    t = rx.sub(r'\s+', ' ', t).strip()
     
     f = []
     if 'PIX' in t: f.append('pix')
@@ -276,12 +291,12 @@ def extrair_valor_pagamentos(texto, formas):
     valores = {}
     
     # Encontrar to dos valores no texto
-    nums = re.findall(r'R?\$?\s*([\d]+\s*[.,]\s*[\d]+)', t)
+    nums = rx.findall(r'R?\$?\s*([\d]+\s*[.,]\s*[\d]+)', t)
     valores_parseados = []
     for n in nums:
         v = n.strip().replace(' ', '').replace('.', '').replace(',', '.')
         try:
-            valores_parseados.append(float(re.sub(r'[^0-9.]', '', v)))
+            valores_parseados.append(float(rx.sub(r'[^0-9.]', '', v)))
         except:
             pass
     
@@ -289,26 +304,26 @@ def extrair_valor_pagamentos(texto, formas):
     if 'pix' in formas and 'cartao_credito' in formas:
         # Procurar valor depois de "PIX" ou "PIX R$"
         pix_vals = []
-        for m in re.finditer(r'PIX\s+R?\$?\s*([\d.,]+)', t):
+        for m in rx.finditer(r'PIX\s+R?\$?\s*([\d.,]+)', t):
             try:
                 v = m.group(1).strip().replace('.', '').replace(',', '.')
-                pix_vals.append(float(re.sub(r'[^0-9.]', '', v)))
+                pix_vals.append(float(rx.sub(r'[^0-9.]', '', v)))
             except: pass
         if pix_vals:
             valores['pix'] = sum(pix_vals)
         
         cred_vals = []
-        for m in re.finditer(r'(?:CREDITO|CARTAO|CRED)\s+(?:EM\s+\d+X\s+)?R?\$?\s*([\d.,]+)', t):
+        for m in rx.finditer(r'(?:CREDITO|CARTAO|CRED)\s+(?:EM\s+\d+X\s+)?R?\$?\s*([\d.,]+)', t):
             try:
                 v = m.group(1).strip().replace('.', '').replace(',', '.')
-                cred_vals.append(float(re.sub(r'[^0-9.]', '', v)))
+                cred_vals.append(float(rx.sub(r'[^0-9.]', '', v)))
             except: pass
         # Also look for numbers near "x" (installments)
         if not cred_vals:
-            for m in re.finditer(r'R?\$?\s*([\d.,]+)\s+EM\s+\d+X', t):
+            for m in rx.finditer(r'R?\$?\s*([\d.,]+)\s+EM\s+\d+X', t):
                 try:
                     v = m.group(1).strip().replace('.', '').replace(',', '.')
-                    cred_vals.append(float(re.sub(r'[^0-9.]', '', v)))
+                    cred_vals.append(float(rx.sub(r'[^0-9.]', '', v)))
                 except: pass
         if cred_vals:
             valores['cartao_credito'] = sum(cred_vals)
@@ -317,266 +332,324 @@ def extrair_valor_pagamentos(texto, formas):
 
 
 # ====================================================================
-# 1. LER CSV
+# API: carregar -> normalizar -> analisar -> relatorio / gravar_previews
 # ====================================================================
-with open(INPUT, 'r', encoding='utf-8') as f:
-    reader = csv.DictReader(f)
-    linhas = list(reader)
 
-print(f'Total de linhas no CSV: {len(linhas)}')
-print()
+# Linha da planilha ja interpretada (comum a previews, planilha, SQL e pagamentos).
+# valor_venda None = venda nao monetaria (GARANTIA/TROCA/DEPOSITO).
+Venda = namedtuple('Venda', (
+    'data data_iso modelo imei valor_orig valor_venda brinde custo lucro forma_orig '
+    'formas tem_troca trocas vendedor_nome vendedor_id loja_nome loja_id'
+))
 
-# ====================================================================
-# 2. PROCESSAR
-# ====================================================================
-registros = []
-stats_formas = Counter()
-stats_trocas = {'detectadas': 0, 'nao_detectadas': 0, 'sem_troca': 0}
-trocas_detectadas = []
-trocas_nao_detectadas = []
-vendedores = set()
-vendedores_sem_id = set()
-lojas = set()
-lojas_sem_id = set()
-problemas = []
-
-for row in linhas:
-    data = row.get('DATA', '').strip()
-    vendedor_nome = row.get('VENDEDOR', '').strip().title()
-    loja_nome = row.get('LOJA', '').strip().upper() or 'CELL'
-    modelo = row.get('MODELO', '').strip()
-    imei = row.get('IMEI', '').strip().replace(' ', '')
-    valor_venda = parse_brl(row.get('VALOR DE VENDA', ''))
-    brinde = parse_brl(row.get('BRINDE', ''))
-    custo = parse_brl(row.get('CUSTO APARELHO', ''))
-    lucro = parse_brl(row.get('LUCRO', ''))
-    forma_orig = row.get('FORMA DE PAGAMENTO', '').strip()
-    
-    # Normalizar formas
-    formas = normalizar_forma(forma_orig)
-    for f in formas:
-        stats_formas[f] += 1
-    
-    # Loja mapping
-    loja_id = LOJA_MAP.get(loja_nome)
-    if loja_id is None:
-        lojas_sem_id.add(loja_nome)
-    
-    # Vendedor mapping
-    vendedor_key = vendedor_nome.upper()
-    vendedor_id = VENDEDOR_MAP.get(vendedor_key)
-    if vendedor_id is None and vendedor_nome:
-        vendedores_sem_id.add(vendedor_nome)
-    
-    vendedores.add(vendedor_nome)
-    lojas.add(loja_nome)
-    
-    # Trocas
-    tem_troca = 'troca_aparelho' in formas
-    trocas_encontradas = []
-    if tem_troca:
-        trocas_encontradas = extrair_troca(forma_orig)
-        if trocas_encontradas:
-            stats_trocas['detectadas'] += 1
-            for t in trocas_encontradas:
-                trocas_detectadas.append({
-                    'modelo_vendido': modelo,
-                    'valor_venda': valor_venda,
-                    'modelo_troca': t['modelo'],
-                    'valor_troca': t['valor'],
-                    'vendedor': vendedor_nome,
-                    'data': data,
-                    'data_iso': to_date(data),
-                    'loja': loja_nome,
-                    'loja_id': loja_id,
-                    'forma_orig': forma_orig[:80],
-                })
+Analise = namedtuple('Analise', (
+    'linhas_lidas registros stats_formas stats_trocas trocas_detectadas '
+    'trocas_nao_detectadas vendedores vendedores_sem_id lojas lojas_sem_id problemas'
+))
+
+
+def carregar(caminho=INPUT):
+    """Planilha crua -> [LinhaVenda] (ver leitor_csv)."""
+    return ler_vendas(caminho)
+
+
+def _loja(texto):
+    return texto.upper() or 'CELL'
+
+
+@lru_cache(maxsize=None)
+def _vendedor_id(nome):
+    return VENDEDOR_MAP.get(nome.upper())
+
+
+def normalizar(linhas):
+    """LinhaVenda -> Venda (iterador; nada e descartado aqui)."""
+    for row in linhas:
+        # uma normalizacao por texto distinto; a string sai da tabela compartilhada
+        vendedor_nome = VENDEDOR.normalizar(row.vendedor, str.title)
+        loja_nome = LOJA.normalizar(row.loja, _loja)
+        forma_orig = row.forma
+        formas = normalizar_forma(forma_orig)
+        tem_troca = 'troca_aparelho' in formas
+        trocas = []
+        if tem_troca:
+            try:
+                with rx.prazo(forma_orig):
+                    trocas = extrair_troca(forma_orig)
+            except rx.PrazoEsgotado:
+                pass  # troca nao extraida -> trocas_revisao_manual
+        yield Venda(
+            data=row.data,
+            data_iso=to_date(row.data),
+            modelo=row.modelo,
+            imei=row.imei.replace(' ', ''),
+            valor_orig=row.valor_venda,
+            valor_venda=parse_brl(row.valor_venda),
+            brinde=parse_brl(row.brinde),
+            custo=parse_brl(row.custo),
+            lucro=parse_brl(row.lucro),
+            forma_orig=forma_orig,
+            formas=formas,
+            tem_troca=tem_troca,
+            trocas=trocas,
+            vendedor_nome=vendedor_nome,
+            vendedor_id=_vendedor_id(vendedor_nome),
+            loja_nome=loja_nome,
+            loja_id=LOJA_MAP.get(loja_nome),
+        )
+
+
+@lru_cache(maxsize=None)
+def _vendas(caminho):
+    return tuple(normalizar(carregar(caminho)))
+
+
+def vendas(caminho=INPUT):
+    """
+    Vendas normalizadas de `caminho`, lidas uma vez por processo: planilha,
+    SQL e pagamentos rodando juntos compartilham o mesmo parse.
+    """
+    return _vendas(os.path.abspath(caminho))
+
+
+def analisar(vendas_norm):
+    """Vendas normalizadas -> Analise (registros validos, trocas, problemas, estatisticas)."""
+    a = Analise(0, [], Counter(), {'detectadas': 0, 'nao_detectadas': 0, 'sem_troca': 0},
+                [], [], set(), set(), set(), set(), [])
+    n = 0
+    for v in vendas_norm:
+        n += 1
+        data, modelo, valor_venda = v.data, v.modelo, v.valor_venda
+        a.stats_formas.update(v.formas)
+        if v.loja_id is None:
+            a.lojas_sem_id.add(v.loja_nome)
+        if v.vendedor_id is None and v.vendedor_nome:
+            a.vendedores_sem_id.add(v.vendedor_nome)
+        a.vendedores.add(v.vendedor_nome)
+        a.lojas.add(v.loja_nome)
+
+        # Trocas
+        if v.tem_troca:
+            if v.trocas:
+                a.stats_trocas['detectadas'] += 1
+                for t in v.trocas:
+                    a.trocas_detectadas.append(TrocaDetectada(
+                        modelo_vendido=modelo,
+                        valor_venda=valor_venda,
+                        modelo_troca=t['modelo'],
+                        valor_troca=t['valor'],
+                        vendedor=v.vendedor_nome,
+                        data=data,
+                        data_iso=v.data_iso,
+                        loja=v.loja_nome,
+                        loja_id=v.loja_id,
+                        forma_orig=v.forma_orig[:80],
+                    ))
+            else:
+                a.stats_trocas['nao_detectadas'] += 1
+                a.trocas_nao_detectadas.append(TrocaRevisao(
+                    modelo_vendido=modelo,
+                    valor_venda=valor_venda,
+                    vendedor=v.vendedor_nome,
+                    data=data,
+                    loja=v.loja_nome,
+                    loja_id=v.loja_id,
+                    forma_orig=v.forma_orig[:120],
+                ))
         else:
-            stats_trocas['nao_detectadas'] += 1
-            trocas_nao_detectadas.append({
-                'modelo_vendido': modelo,
-                'valor_venda': valor_venda,
-                'vendedor': vendedor_nome,
-                'data': data,
-                'loja': loja_nome,
-                'loja_id': loja_id,
-                'forma_orig': forma_orig[:120],
-            })
-    else:
-        stats_trocas['sem_troca'] += 1
-    
-    # Extrair valores de pagamento
-    valores_pagto = extrair_valor_pagamentos(forma_orig, formas)
-    
-    # Validacoes
-    if valor_venda is None:
-        problemas.append(f'VENDA NAO MONETARIA (GARANTIA/TROCA): {modelo} ({data}) - sera ignorado')
-        continue
-    if not modelo:
-        problemas.append(f'Linha sem modelo: {data}')
-    if not imei:
-        problemas.append(f'Sem IMEI: {modelo} ({data})')
-    if valor_venda <= 0:
-        problemas.append(f'Valor venda zero/invalido: {modelo} ({data})')
-    
-    # Data invalida
-    if not to_date(data):
-        problemas.append(f'Data invalida: {data} ({modelo})')
-    
-    registros.append({
-        'data_iso': to_date(data),
-        'data': data,
-        'modelo': modelo,
-        'imei': imei,
-        'valor_venda': valor_venda,
-        'brinde': brinde,
-        'custo': custo,
-        'lucro': lucro,
-        'formas': formas,
-        'valores_pagto': valores_pagto,
-        'tem_troca': tem_troca,
-        'trocas': trocas_encontradas,
-        'vendedor_nome': vendedor_nome,
-        'vendedor_id': vendedor_id,
-        'loja_nome': loja_nome,
-        'loja_id': loja_id,
-    })
+            a.stats_trocas['sem_troca'] += 1
 
-# ====================================================================
-# 3. RELATORIO
-# ====================================================================
-print('='*60)
-print('RELATORIO DE ANALISE DO CSV')
-print('='*60)
-print()
-
-print(f'Total de registros: {len(registros)}')
-print()
-
-print('--- FORMAS DE PAGAMENTO ---')
-for f, qtd in sorted(stats_formas.items(), key=lambda x: -x[1]):
-    print(f'  {qtd:4}x: {f}')
-
-print()
-print('--- TROCAS ---')
-print(f'  Detectadas:       {stats_trocas["detectadas"]}')
-print(f'  Nao detectadas:   {stats_trocas["nao_detectadas"]}')
-print(f'  Sem troca:        {stats_trocas["sem_troca"]}')
-total_com_troca = stats_trocas['detectadas'] + stats_trocas['nao_detectadas']
-pct = stats_trocas['detectadas'] / max(total_com_troca, 1) * 100
-print(f'  Taxa de extracao: {pct:.0f}% ({stats_trocas["detectadas"]}/{total_com_troca})')
-
-print()
-print('--- VENDEDORES ---')
-for v in sorted(vendedores):
-    key = v.upper()
-    vid = VENDEDOR_MAP.get(key)
-    status = '✓' if vid else '⚠ SEM ID'
-    print(f'  {status} {v}')
-
-if vendedores_sem_id:
-    print(f'\n⚠ Vendedores sem ID no mapeamento:')
-    for v in sorted(vendedores_sem_id):
-        print(f'  - {v}')
-
-print()
-print('--- LOJAS ---')
-for l in sorted(lojas):
-    lid = LOJA_MAP.get(l)
-    status = f'loja_id={lid}' if lid else '⚠ SEM ID'
-    print(f'  {status}: {l}')
-
-print()
-print('--- VALORES TOTAIS ---')
-total_venda = sum(r['valor_venda'] for r in registros)
-total_custo = sum(r['custo'] for r in registros)
-total_lucro = sum(r['lucro'] for r in registros)
-total_brinde = sum(r['brinde'] for r in registros)
-print(f'  Total VENDA:    R$ {total_venda:,.2f}')
-print(f'  Total CUSTO:    R$ {total_custo:,.2f}')
-print(f'  Total BRINDE:   R$ {total_brinde:,.2f}')
-print(f'  Total LUCRO:    R$ {total_lucro:,.2f}')
-print(f'  Margem media:   {(total_lucro/total_venda*100):.1f}%')
-
-print()
-print('--- PROBLEMAS ENCONTRADOS ---')
-if problemas:
-    for p in problemas[:20]:
-        print(f'  ⚠ {p}')
-    if len(problemas) > 20:
-        print(f'  ... e mais {len(problemas)-20} problemas')
-else:
-    print('  Nenhum problema encontrado')
-
-print()
-print('--- RESUMO POR LOJA ---')
-for loja_nome in sorted(lojas):
-    lid = LOJA_MAP.get(loja_nome)
-    recs = [r for r in registros if r['loja_nome'] == loja_nome]
-    total = sum(r['valor_venda'] for r in recs)
-    trocas = sum(1 for r in recs if r['tem_troca'])
-    print(f'  loja_id={lid or "?"} {loja_nome:12s}: {len(recs):3d} registros, R$ {total:>8,.2f}, {trocas} trocas')
+        # Validacoes
+        if valor_venda is None:
+            a.problemas.append(f'VENDA NAO MONETARIA (GARANTIA/TROCA): {modelo} ({data}) - sera ignorado')
+            continue
+        if not modelo:
+            a.problemas.append(f'Linha sem modelo: {data}')
+        if not v.imei:
+            a.problemas.append(f'Sem IMEI: {modelo} ({data})')
+        if valor_venda <= 0:
+            a.problemas.append(f'Valor venda zero/invalido: {modelo} ({data})')
+        if not v.data_iso:
+            a.problemas.append(f'Data invalida: {data} ({modelo})')
+        try:
+            with rx.prazo(v.forma_orig):
+                valores_pagto = extrair_valor_pagamentos(v.forma_orig, v.formas)
+        except rx.PrazoEsgotado as e:
+            valores_pagto = {}
+            a.problemas.append(f'Pagamento nao analisado ({e}): {modelo} ({data})')
+
+        a.registros.append(VendaAnalisada(
+            data_iso=v.data_iso,
+            data=data,
+            modelo=modelo,
+            imei=v.imei,
+            valor_venda=valor_venda,
+            brinde=v.brinde,
+            custo=v.custo,
+            lucro=v.lucro,
+            formas=v.formas,
+            valores_pagto=valores_pagto,
+            tem_troca=v.tem_troca,
+            trocas=v.trocas,
+            vendedor_nome=v.vendedor_nome,
+            vendedor_id=v.vendedor_id,
+            loja_nome=v.loja_nome,
+            loja_id=v.loja_id,
+        ))
+    return a._replace(linhas_lidas=n)
+
+
+def taxa_extracao(a):
+    total_com_troca = a.stats_trocas['detectadas'] + a.stats_trocas['nao_detectadas']
+    return total_com_troca, a.stats_trocas['detectadas'] / max(total_com_troca, 1) * 100
+
+
+def totais(a):
+    """{'venda','custo','brinde','lucro'} somados sobre os registros validos."""
+    return {k: sum(getattr(r, k) for r in a.registros) for k in ('valor_venda', 'custo', 'brinde', 'lucro')}
+
+
+def relatorio(a):
+    print('='*60)
+    print('RELATORIO DE ANALISE DO CSV')
+    print('='*60)
+    print()
+
+    print(f'Total de registros: {len(a.registros)}')
+    print()
+
+    print('--- FORMAS DE PAGAMENTO ---')
+    for f, qtd in sorted(a.stats_formas.items(), key=lambda x: -x[1]):
+        print(f'  {qtd:4}x: {f}')
+
+    st = a.stats_trocas
+    total_com_troca, pct = taxa_extracao(a)
+    print()
+    print('--- TROCAS ---')
+    print(f'  Detectadas:       {st["detectadas"]}')
+    print(f'  Nao detectadas:   {st["nao_detectadas"]}')
+    print(f'  Sem troca:        {st["sem_troca"]}')
+    print(f'  Taxa de extracao: {pct:.0f}% ({st["detectadas"]}/{total_com_troca})')
+
+    print()
+    print('--- VENDEDORES ---')
+    for v in sorted(a.vendedores):
+        vid = VENDEDOR_MAP.get(v.upper())
+        status = '✓' if vid else '⚠ SEM ID'
+        print(f'  {status} {v}')
+
+    if a.vendedores_sem_id:
+        print(f'\n⚠ Vendedores sem ID no mapeamento:')
+        for v in sorted(a.vendedores_sem_id):
+            print(f'  - {v}')
+
+    print()
+    print('--- LOJAS ---')
+    for l in sorted(a.lojas):
+        lid = LOJA_MAP.get(l)
+        status = f'loja_id={lid}' if lid else '⚠ SEM ID'
+        print(f'  {status}: {l}')
+
+    t = totais(a)
+    print()
+    print('--- VALORES TOTAIS ---')
+    print(f'  Total VENDA:    R$ {t["valor_venda"]:,.2f}')
+    print(f'  Total CUSTO:    R$ {t["custo"]:,.2f}')
+    print(f'  Total BRINDE:   R$ {t["brinde"]:,.2f}')
+    print(f'  Total LUCRO:    R$ {t["lucro"]:,.2f}')
+    print(f'  Margem media:   {(t["lucro"]/t["valor_venda"]*100):.1f}%')
+
+    print()
+    print('--- PROBLEMAS ENCONTRADOS ---')
+    if a.problemas:
+        for p in a.problemas[:20]:
+            print(f'  ⚠ {p}')
+        if len(a.problemas) > 20:
+            print(f'  ... e mais {len(a.problemas)-20} problemas')
+    else:
+        print('  Nenhum problema encontrado')
+
+    print()
+    print('--- RESUMO POR LOJA ---')
+    cod = VendaAnalisada.codigos(a.registros, 'loja_nome')
+    qtd = LOJA.contar(cod)
+    total = LOJA.somar(cod, [r.valor_venda for r in a.registros])
+    trocas = LOJA.somar(cod, [1 if r.tem_troca else 0 for r in a.registros])
+    for loja_nome in sorted(a.lojas):
+        lid = LOJA_MAP.get(loja_nome)
+        c = LOJA.codigo(loja_nome)
+        print(f'  loja_id={lid or "?"} {loja_nome:12s}: {qtd[c]:3d} registros, R$ {total[c]:>8,.2f}, {trocas[c]} trocas')
+
+
+def resumo(a):
+    """Dict de resumo.json."""
+    t = totais(a)
+    registros = a.registros
+    cod_loja = VendaAnalisada.codigos(registros, 'loja_nome')
+    qtd_loja = LOJA.contar(cod_loja)
+    venda_loja = LOJA.somar(cod_loja, [r.valor_venda for r in registros])
+    qtd_vendedor = VENDEDOR.contar(VendaAnalisada.codigos(registros, 'vendedor_nome'))
+    return {
+        'total_registros': len(registros),
+        'total_venda': t['valor_venda'],
+        'total_custo': t['custo'],
+        'total_brinde': t['brinde'],
+        'total_lucro': t['lucro'],
+        'lojas': {l: {'id': LOJA_MAP.get(l), 'qtd': qtd_loja[LOJA.codigo(l)], 'total_venda': venda_loja[LOJA.codigo(l)]} for l in sorted(a.lojas)},
+        'vendedores': {v: {'id': _vendedor_id(v), 'qtd': qtd_vendedor[VENDEDOR.codigo(v)]} for v in sorted(a.vendedores)},
+        'trocas_detectadas': len(a.trocas_detectadas),
+        'trocas_nao_detectadas': len(a.trocas_nao_detectadas),
+        'taxa_extracao_trocas': round(taxa_extracao(a)[1], 0),
+        'problemas': len(a.problemas),
+        'vendedores_sem_id': sorted(a.vendedores_sem_id),
+    }
 
-# ====================================================================
-# 4. SALVAR PREVIEWS
-# ====================================================================
 
-# Trocas detectadas
-def _filtrar(dados, campos):
-    return [{k: r[k] for k in campos} for r in dados]
-
-with open(os.path.join(OUTPUT_DIR, 'trocas_detectadas.csv'), 'w', newline='', encoding='utf-8') as f:
-    fieldnames = ['modelo_vendido','valor_venda','modelo_troca','valor_troca','vendedor','data','loja','loja_id','forma_orig']
-    w = csv.DictWriter(f, fieldnames=fieldnames)
-    w.writeheader()
-    w.writerows(_filtrar(trocas_detectadas, fieldnames))
-
-# Trocas nao detectadas
-if trocas_nao_detectadas:
-    with open(os.path.join(OUTPUT_DIR, 'trocas_revisao_manual.csv'), 'w', newline='', encoding='utf-8') as f:
-        fieldnames = ['modelo_vendido','valor_venda','vendedor','data','loja','loja_id','forma_orig']
-        w = csv.DictWriter(f, fieldnames=fieldnames)
-        w.writeheader()
-        w.writerows(_filtrar(trocas_nao_detectadas, fieldnames))
-
-# Preview SQL-like (apenas para visualizacao, sem executar)
-with open(os.path.join(OUTPUT_DIR, 'preview_importacao.csv'), 'w', newline='', encoding='utf-8') as f:
-    fieldnames = [
-        'data','data_iso','modelo','imei','valor_venda','custo','brinde','lucro',
-        'formas','tem_troca','qtd_trocas','modelo_troca','valor_troca',
-        'vendedor_nome','vendedor_id','loja_nome','loja_id'
-    ]
-    w = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
-    w.writeheader()
-    for r in registros:
-        row = dict(r)
-        row['qtd_trocas'] = len(r.get('trocas', []))
-        row['modelo_troca'] = '; '.join(t['modelo'] for t in r.get('trocas', []))
-        row['valor_troca'] = sum(t['valor'] for t in r.get('trocas', []))
-        row['formas'] = '+'.join(r.get('formas', []))
-        w.writerow(row)
-
-# Resumo JSON
-resumo = {
-    'total_registros': len(registros),
-    'total_venda': total_venda,
-    'total_custo': total_custo,
-    'total_brinde': total_brinde,
-    'total_lucro': total_lucro,
-    'lojas': {l: {'id': LOJA_MAP.get(l), 'qtd': sum(1 for r in registros if r['loja_nome'] == l), 'total_venda': sum(r['valor_venda'] for r in registros if r['loja_nome'] == l)} for l in sorted(lojas)},
-    'vendedores': {v: {'id': VENDEDOR_MAP.get(v.upper()), 'qtd': sum(1 for r in registros if r['vendedor_nome'] == v)} for v in sorted(vendedores)},
-    'trocas_detectadas': len(trocas_detectadas),
-    'trocas_nao_detectadas': len(trocas_nao_detectadas),
-    'taxa_extracao_trocas': round(pct, 0),
-    'problemas': len(problemas),
-    'vendedores_sem_id': sorted(vendedores_sem_id),
-}
-with open(os.path.join(OUTPUT_DIR, 'resumo.json'), 'w', encoding='utf-8') as f:
-    json.dump(resumo, f, indent=2, ensure_ascii=False)
-
-print()
-print(f'Relatorios salvos em: {OUTPUT_DIR}/')
-print('  - trocas_detectadas.csv')
-print('  - trocas_revisao_manual.csv' if trocas_nao_detectadas else '')
-print('  - preview_importacao.csv')
-print('  - resumo.json')
+def gravar_previews(a, destino=OUTPUT_DIR):
+    """Escreve trocas_*.csv, preview_importacao.csv e resumo.json em `destino`."""
+    os.makedirs(destino, exist_ok=True)
+
+    gravar_csv(os.path.join(destino, 'trocas_detectadas.csv'), a.trocas_detectadas,
+               ['modelo_vendido','valor_venda','modelo_troca','valor_troca','vendedor','data','loja','loja_id','forma_orig'])
+
+    if a.trocas_nao_detectadas:
+        gravar_csv(os.path.join(destino, 'trocas_revisao_manual.csv'), a.trocas_nao_detectadas, TrocaRevisao.CAMPOS)
+
+    # Preview SQL-like (apenas para visualizacao, sem executar)
+    with open(os.path.join(destino, 'preview_importacao.csv'), 'w', newline='', encoding='utf-8') as f:
+        w = csv.writer(f)
+        w.writerow([
+            'data','data_iso','modelo','imei','valor_venda','custo','brinde','lucro',
+            'formas','tem_troca','qtd_trocas','modelo_troca','valor_troca',
+            'vendedor_nome','vendedor_id','loja_nome','loja_id'
+        ])
+        for r in a.registros:
+            w.writerow(r.linha(('data','data_iso','modelo','imei','valor_venda','custo','brinde','lucro')) + [
+                '+'.join(r.formas), r.tem_troca, len(r.trocas),
+                '; '.join(t['modelo'] for t in r.trocas), sum(t['valor'] for t in r.trocas),
+                r.vendedor_nome, r.vendedor_id, r.loja_nome, r.loja_id,
+            ])
+
+    with open(os.path.join(destino, 'resumo.json'), 'w', encoding='utf-8') as f:
+        json.dump(resumo(a), f, indent=2, ensure_ascii=False)
+
+    print()
+    print(f'Relatorios salvos em: {destino}/')
+    print('  - trocas_detectadas.csv')
+    print('  - trocas_revisao_manual.csv' if a.trocas_nao_detectadas else '')
+    print('  - preview_importacao.csv')
+    print('  - resumo.json')
+
+
+if __name__ == '__main__':
+    # python3 scripts/analisar_importacao.py [planilha.csv|planilha.xlsx]
+    perfilador.ativar()
+    perfilador.etapa('leitura')
+    linhas = carregar((args_posicionais() or [INPUT])[0])
+    print(f'Total de linhas no CSV: {len(linhas)}')
+    print()
+    perfilador.etapa('analise')
+    analise = analisar(normalizar(linhas))
+    relatorio(analise)
+    perfilador.etapa('gravacao')
+    gravar_previews(analise)
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Armazem local (SQLite) de tudo que os geradores de SQL ja mandaram: cada
+linha normalizada, o resultado do parse de pagamento, o que aconteceu com ela
+(importada / pulada + motivo) e o lote (importacao_id) em que saiu. Dedup
+entre lotes, analises e previews rodam aqui, sem consultar producao nem dar
+grep nos .sql.
+
+  scripts/_armazem.sqlite (ARMAZEM_DB para outro caminho; fora do git)
+
+  lotes  (importacao_id, script, fonte, gerado_em, linhas, importadas)
+  linhas (importacao_id, orig_linha, situacao, motivo, data_iso, modelo, imei,
+          valor_venda, custo, brinde, vendedor, vendedor_id, loja, loja_id,
+          forma_orig, pix, dinheiro, cartao_credito, cartao_debito,
+          troca_aparelho, modelo_troca, precisa_revisao, venda_id, aparelho_id,
+          origem)            origem = a linha do CSV inteira, em JSON
+  indices: imei, data_iso, loja_id, vendedor_id
+
+O armazem guarda o que foi GERADO (o .sql pode nao ter sido aplicado ainda);
+o estado do banco e do snapshot_banco.py / reverter_importacao.py. Regerar o
+mesmo --importacao substitui as linhas daquele lote. --sem-armazem nos
+geradores nao registra.
+
+Uso nos geradores:
+  lote = armazem.Lote(IMPORTACAO_ID, 'importar_vendas_aparelhos2', 'vendas_aparelhos2_final.csv')
+  lote.linha(orig_linha, row=row, pix=pix, venda_id=venda_id, aparelho_id=aparelho_id)
+  lote.linha(orig_linha, 'pulada', 'IMEI ja existe', row=row)
+  lote.gravar()
+  row = linha de *_final.csv / *_normalizado.csv (campos_csv); o resto sobrepoe.
+  As colunas de pagamento sao as que foram para o SQL (ex.: pix forcado na
+  revisao); o parse como saiu do normalizador fica em `origem`.
+
+Consultas:
+  python3 scripts/armazem.py lotes                    # lotes registrados
+  python3 scripts/armazem.py imei 3569... 3517...     # em que lote(s) saiu cada IMEI
+  python3 scripts/armazem.py duplicados               # IMEIs importados em mais de um lote
+  python3 scripts/armazem.py resumo [--lote ID]       # vendas e valor por loja e mes
+  python3 scripts/armazem.py sql "SELECT ..."         # consulta livre
+"""
+import json, os, sqlite3, sys
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+from importacao_cli import arg_valor, args_posicionais
+
+CAMINHO = os.environ.get('ARMAZEM_DB') or os.path.join(ROOT, 'scripts', '_armazem.sqlite')
+# geradores em paralelo (etapas.py) gravam no mesmo arquivo: quem chega depois
+# espera o lock em vez de perder o lote com "database is locked"
+ESPERA_LOCK = 120
+
+COLUNAS = (
+    'orig_linha', 'situacao', 'motivo', 'data_iso', 'modelo', 'imei',
+    'valor_venda', 'custo', 'brinde', 'vendedor', 'vendedor_id', 'loja', 'loja_id',
+    'forma_orig', 'pix', 'dinheiro', 'cartao_credito', 'cartao_debito',
+    'troca_aparelho', 'modelo_troca', 'precisa_revisao', 'venda_id', 'aparelho_id', 'origem',
+)
+
+SQL_TABELAS = """
+CREATE TABLE IF NOT EXISTS lotes (
+    importacao_id TEXT PRIMARY KEY,
+    script        TEXT NOT NULL,
+    fonte         TEXT,
+    gerado_em     TEXT NOT NULL,
+    linhas        INTEGER NOT NULL,
+    importadas    INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS linhas (
+    importacao_id   TEXT NOT NULL REFERENCES lotes(importacao_id) ON DELETE CASCADE,
+    orig_linha      TEXT,
+    situacao        TEXT NOT NULL,
+    motivo          TEXT,
+    data_iso        TEXT,
+    modelo          TEXT,
+    imei            TEXT,
+    valor_venda     REAL,
+    custo           REAL,
+    brinde          REAL,
+    vendedor        TEXT,
+    vendedor_id     TEXT,
+    loja            TEXT,
+    loja_id         INTEGER,
+    forma_orig      TEXT,
+    pix             REAL,
+    dinheiro        REAL,
+    cartao_credito  REAL,
+    cartao_debito   REAL,
+    troca_aparelho  REAL,
+    modelo_troca    TEXT,
+    precisa_revisao TEXT,
+    venda_id        TEXT,
+    aparelho_id     TEXT,
+    origem          TEXT
+);
+CREATE INDEX IF NOT EXISTS linhas_lote_idx ON linhas (importacao_id);
+CREATE INDEX IF NOT EXISTS linhas_imei_idx ON linhas (imei) WHERE imei IS NOT NULL;
+CREATE INDEX IF NOT EXISTS linhas_data_idx ON linhas (data_iso);
+CREATE INDEX IF NOT EXISTS linhas_loja_idx ON linhas (loja_id, data_iso);
+CREATE INDEX IF NOT EXISTS linhas_vendedor_idx ON linhas (vendedor_id, data_iso);
+"""
+
+
+def conectar(caminho=None):
+    conn = sqlite3.connect(caminho or CAMINHO, timeout=ESPERA_LOCK)
+    conn.execute('PRAGMA foreign_keys = ON')
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.executescript(SQL_TABELAS)
+    return conn
+
+
+def _data_iso(v):
+    v = (v or '').strip()
+    if len(v) == 10 and v[2] == '/' and v[5] == '/':
+        return f'{v[6:]}-{v[3:5]}-{v[:2]}'
+    return v[:10] or None
+
+
+def _num(v):
+    try:
+        return float(str(v).replace('R$', '').strip())
+    except ValueError:
+        return None
+
+
+def campos_csv(row):
+    """Colunas do armazem de uma linha de *_final.csv / *_normalizado.csv."""
+    c = {k: row.get(k, '').strip() for k in ('modelo', 'vendedor', 'vendedor_id', 'loja', 'modelo_troca', 'precisa_revisao')}
+    c.update({k: _num(row[k]) for k in ('valor_venda', 'custo', 'brinde', 'pix', 'dinheiro', 'cartao_credito',
+                                        'cartao_debito', 'troca_aparelho') if row.get(k) not in (None, '')})
+    c['imei'] = row.get('imei', '').replace(' ', '')
+    c['data_iso'] = _data_iso(row.get('data_iso') or row.get('data'))
+    c['loja_id'] = row.get('loja_id', '').strip()
+    c['forma_orig'] = row.get('forma_orig') or row.get('formas_pgto')
+    c['origem'] = row
+    return c
+
+
+def _valor(v):
+    if v is None or v == '':
+        return None
+    if isinstance(v, (dict, list, tuple)):
+        return json.dumps(v, ensure_ascii=False, default=str)
+    return v
+
+
+class Lote:
+    """Linhas de uma execucao de gerador; gravar() substitui o lote no armazem."""
+
+    def __init__(self, importacao_id, script, fonte=''):
+        self.importacao_id, self.script, self.fonte = importacao_id, script, fonte
+        self.linhas = []
+        self.ativo = '--sem-armazem' not in sys.argv
+
+    def linha(self, orig_linha, situacao='importada', motivo='', row=None, **campos):
+        """Uma linha do CSV. campos: nomes de COLUNAS (origem = a linha crua, dict ou lista)."""
+        if row is not None:
+            campos = {**campos_csv(row), **campos}
+        desconhecidos = set(campos) - set(COLUNAS)
+        if desconhecidos:
+            raise TypeError(f'colunas desconhecidas no armazem: {sorted(desconhecidos)}')
+        campos.update(orig_linha=None if orig_linha is None else str(orig_linha),
+                      situacao=situacao, motivo=motivo)
+        if campos.get('imei') is not None:
+            campos['imei'] = str(campos['imei']).strip() or None
+        self.linhas.append(tuple(_valor(campos.get(c)) for c in COLUNAS))
+
+    def gravar(self, caminho=None):
+        """Grava o lote (uma transacao). Retorna o caminho, ou None se desligado/falhou."""
+        if not self.ativo:
+            return None
+        caminho = caminho or CAMINHO
+        importadas = sum(1 for l in self.linhas if l[1] == 'importada')
+        try:
+            conn = conectar(caminho)
+            with conn:
+                conn.execute('DELETE FROM lotes WHERE importacao_id = ?', (self.importacao_id,))
+                conn.execute('INSERT INTO lotes VALUES (?, ?, ?, ?, ?, ?)',
+                             (self.importacao_id, self.script, self.fonte,
+                              datetime.now().isoformat(timespec='seconds'), len(self.linhas), importadas))
+                conn.executemany(
+                    f'INSERT INTO linhas (importacao_id, {", ".join(COLUNAS)}) '
+                    f'VALUES (?, {", ".join("?" * len(COLUNAS))})',
+                    ((self.importacao_id,) + l for l in self.linhas))
+            conn.close()
+        except sqlite3.Error as e:
+            # o armazem e auxiliar: nao derruba a geracao do SQL
+            print(f'  AVISO: armazem nao gravado ({caminho}): {e}', file=sys.stderr)
+            return None
+        print(f'Armazem: {importadas} importadas / {len(self.linhas)} linhas do lote '
+              f'{self.importacao_id} em {os.path.relpath(caminho, ROOT)}')
+        return caminho
+
+
+def consultar(sql, parametros=(), caminho=None):
+    """(colunas, linhas) de uma consulta no armazem."""
+    conn = conectar(caminho)
+    try:
+        cur = conn.execute(sql, parametros)
+        return [d[0] for d in cur.description or ()], cur.fetchall()
+    finally:
+        conn.close()
+
+
+def imeis_importados(script=None, caminho=None):
+    """{imei: importacao_id mais recente} das linhas importadas (opcional: so de um script)."""
+    sql = ("SELECT l.imei, l.importacao_id FROM linhas l JOIN lotes o USING (importacao_id) "
+           "WHERE l.situacao = 'importada' AND l.imei IS NOT NULL")
+    parametros = ()
+    if script:
+        sql += ' AND o.script = ?'
+        parametros = (script,)
+    _, linhas = consultar(sql + ' ORDER BY o.gerado_em', parametros, caminho)
+    return dict(linhas)
+
+
+CONSULTAS = {
+    'lotes': ("SELECT importacao_id, script, fonte, gerado_em, linhas, importadas "
+              "FROM lotes ORDER BY gerado_em"),
+    'duplicados': ("SELECT imei, count(DISTINCT importacao_id) AS lotes, group_concat(importacao_id || ':' || orig_linha, ' ') AS onde "
+                   "FROM linhas WHERE situacao = 'importada' AND imei IS NOT NULL "
+                   "GROUP BY imei HAVING count(DISTINCT importacao_id) > 1 ORDER BY imei"),
+}
+
+
+def imprimir(colunas, linhas, limite=200):
+    larguras = [max([len(str(c))] + [len(str(l[i])) for l in linhas[:limite]]) for i, c in enumerate(colunas)]
+    larguras = [min(w, 60) for w in larguras]
+    print('  '.join(str(c).ljust(w) for c, w in zip(colunas, larguras)))
+    for l in linhas[:limite]:
+        print('  '.join(('' if v is None else str(v))[:w].ljust(w) for v, w in zip(l, larguras)))
+    if len(linhas) > limite:
+        print(f'... (+{len(linhas) - limite} linhas)')
+    print(f'({len(linhas)} linhas)')
+
+
+if __name__ == '__main__':
+    args = args_posicionais(com_valor=('--lote',))
+    if not args:
+        sys.exit(__doc__)
+    if not os.path.exists(CAMINHO):
+        sys.exit(f'Armazem vazio: {CAMINHO} (rode um gerador de SQL)')
+    comando, resto = args[0], args[1:]
+    if comando in CONSULTAS:
+        imprimir(*consultar(CONSULTAS[comando]))
+    elif comando == 'imei' and resto:
+        imprimir(*consultar(
+            'SELECT imei, importacao_id, orig_linha, situacao, motivo, data_iso, modelo, valor_venda, loja_id, vendedor_id '
+            f'FROM linhas WHERE imei IN ({", ".join("?" * len(resto))}) ORDER BY imei, importacao_id', resto))
+    elif comando == 'resumo':
+        lote = arg_valor('--lote')
+        imprimir(*consultar(
+            "SELECT loja_id, substr(data_iso, 1, 7) AS mes, count(*) AS vendas, round(sum(valor_venda), 2) AS valor, "
+            "round(sum(pix), 2) AS pix, round(sum(dinheiro), 2) AS dinheiro, round(sum(cartao_credito), 2) AS credito, "
+            "round(sum(cartao_debito), 2) AS debito, round(sum(troca_aparelho), 2) AS troca "
+            "FROM linhas WHERE situacao = 'importada'" + (' AND importacao_id = ?' if lote else '') +
+            " GROUP BY 1, 2 ORDER BY 1, 2", (lote,) if lote else ()))
+    elif comando == 'sql' and resto:
+        imprimir(*consultar(resto[0]))
+    else:
+        sys.exit(__doc__)
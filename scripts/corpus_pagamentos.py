@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Corpus dourado dos parsers de pagamento: texto -> pix / dinheiro / credito /
+debito / troca ja revisados, e o placar de cada parser contra ele.
+
+Corpus (scripts/corpus_pagamentos.csv, versionado): linhas das planilhas
+revisadas (<planilha>_com_revisao.csv + scripts/<planilha>_final.csv) que
+fecharam sem revisao - precisa_revisao NAO, fora de pagamento junto, diferenca
+zero. Fica congelado: regerar as planilhas com um parser novo nao muda a verdade.
+
+Cada parser so extrai valores do texto; o resto e igual para todos (formas por
+gerar_csv_final.extrair_forma_pgto, fechamento por alocar_pagamentos: forma
+unica sem valor, taxa do credito, arredondamento). O placar mede so a extracao:
+
+  acerto    linhas com os 5 valores iguais ao corpus (+-0,01)
+  revisao   linhas que iriam para revisao (sobra diferenca ou o parser pediu)
+  linhas/s  so a chamada do parser, melhor de --repeticoes passadas
+
+Base (scripts/corpus_pagamentos_base.json): linhas que cada parser acerta.
+Sem opcoes, compara com a base e sai com 1 se alguma linha que acertava
+passou a errar (linha nova acertada so aparece no placar).
+
+Uso:
+  python3 scripts/corpus_pagamentos.py                 # placar + regressao
+  python3 scripts/corpus_pagamentos.py --gerar-corpus  # recria o corpus das planilhas
+  python3 scripts/corpus_pagamentos.py --gravar-base   # aceita o placar atual como base
+  python3 scripts/corpus_pagamentos.py --parser csv_final --mostrar-erros
+  --repeticoes N (padrao 5)
+"""
+import ast, csv, json, os, sys, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+from importacao_cli import arg_valor
+from leitor_csv import linhas_brutas
+from registros_venda import VendaFinal
+
+CORPUS = os.path.join(ROOT, 'scripts', 'corpus_pagamentos.csv')
+BASE = os.path.join(ROOT, 'scripts', 'corpus_pagamentos_base.json')
+
+# (planilha revisada, saida final) - orig_linha da final = linha na revisada
+FONTES = [
+    ('venda_aparelhos_com_revisao.csv', 'scripts/vendas_final.csv'),
+    ('vendas_aparelhos2_com_revisao.csv', 'scripts/vendas_aparelhos2_final.csv'),
+    ('vendas_aparelhos3_com_revisao.csv', 'scripts/vendas_aparelhos3_final.csv'),
+]
+CAMPOS = ('pix', 'dinheiro', 'cartao_credito', 'cartao_debito', 'troca_aparelho')
+COLUNAS_CORPUS = ('fonte', 'orig_linha', 'texto', 'valor_venda') + CAMPOS
+
+
+def definicoes(rel):
+    """
+    Namespace com imports, funcoes, classes e CONSTANTES de um script, sem
+    rodar o corpo (varios scripts fazem o trabalho todo ao serem importados).
+    """
+    caminho = os.path.join(ROOT, rel)
+    with open(caminho, encoding='utf-8') as f:
+        arvore = ast.parse(f.read(), caminho)
+
+    def fica(no):
+        if isinstance(no, (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.ClassDef, ast.Assert)):
+            return True
+        return isinstance(no, ast.Assign) and all(isinstance(t, ast.Name) and t.id.isupper() for t in no.targets)
+
+    arvore.body = [no for no in arvore.body if fica(no)]
+    ns = {'__name__': '_corpus_' + os.path.splitext(os.path.basename(rel))[0], '__file__': caminho}
+    exec(compile(arvore, caminho, 'exec'), ns)
+    return ns
+
+
+def _de_dict(d):
+    return {c: d.get(c, 0) or 0 for c in CAMPOS}, False
+
+
+def _de_normalizar(d):
+    v = {c: d.get(c, 0) or 0 for c in CAMPOS[:4]}
+    v['troca_aparelho'] = d.get('troca', 0) or 0
+    return v, d.get('precisa_revisao') == 'SIM'
+
+
+# nome -> (script, funcao texto -> resultado, resultado -> ({campo: valor}, pediu revisao))
+PARSERS = {
+    'csv_final':  ('scripts/gerar_csv_final.py', 'extrair_pagamentos_simples', _de_dict),
+    'pagamentos': ('scripts/extrair_pagamentos.py', 'extrair_valores_individuais', _de_dict),
+    'vendas2':    ('normalizar_vendas2.py', 'normalizar_pagamento', _de_normalizar),
+    'vendas3':    ('scripts/importar_vendas_aparelhos3.py', 'normalizar_pagamento', _de_normalizar),
+}
+
+
+def _num(v):
+    return float(v) if v not in ('', None) else 0.0
+
+
+def gerar_corpus(destino=CORPUS):
+    """Corpus a partir das planilhas revisadas. Retorna {fonte: (usadas, total)}."""
+    st = {}
+    with open(destino, 'w', newline='', encoding='utf-8') as f:
+        w = csv.writer(f)
+        w.writerow(COLUNAS_CORPUS)
+        for revisada, final in FONTES:
+            brutas = list(linhas_brutas(os.path.join(ROOT, revisada)))
+            cab = brutas[0]
+            i_forma, i_modelo = cab.index('FORMA DE PAGAMENTO'), cab.index('MODELO')
+            usadas = total = 0
+            with open(os.path.join(ROOT, final), encoding='utf-8-sig', newline='') as fin:
+                for r in csv.DictReader(fin):
+                    total += 1
+                    if (r['precisa_revisao'] != 'NAO' or r['pagto_junto'] != 'NAO'
+                            or abs(_num(r['diferenca'])) > 0.01 or _num(r['valor_venda']) <= 0):
+                        continue
+                    orig = brutas[int(r['orig_linha']) - 1]
+                    if orig[i_modelo].strip() != r['modelo']:
+                        sys.exit(f'{revisada}:{r["orig_linha"]} nao bate com {final} ({orig[i_modelo]!r})')
+                    w.writerow([revisada, r['orig_linha'], orig[i_forma], r['valor_venda']]
+                               + [_num(r[c]) for c in CAMPOS])
+                    usadas += 1
+            st[revisada] = (usadas, total)
+    return st
+
+
+def ler_corpus(caminho=CORPUS):
+    with open(caminho, encoding='utf-8', newline='') as f:
+        return [{**r, 'valor_venda': float(r['valor_venda']), **{c: float(r[c]) for c in CAMPOS}}
+                for r in csv.DictReader(f)]
+
+
+def placar(nome, corpus, repeticoes=5):
+    """{'acertos': [chaves], 'erros': [(linha, obtido)], 'revisao': n, 'linhas_s': x}."""
+    script, funcao, adaptar = PARSERS[nome]
+    ns = definicoes(script)
+    parser = ns[funcao]
+    csv_final = definicoes('scripts/gerar_csv_final.py') if nome != 'csv_final' else ns
+    formas_de, alocar = csv_final['extrair_forma_pgto'], csv_final['alocar_pagamentos']
+
+    textos = [l['texto'] for l in corpus]
+    melhor = float('inf')
+    for _ in range(max(repeticoes, 1)):
+        t0 = time.perf_counter()
+        resultados = [parser(t) for t in textos]
+        melhor = min(melhor, time.perf_counter() - t0)
+
+    acertos, erros, revisao = [], [], 0
+    for linha, res in zip(corpus, resultados):
+        valores, pediu = adaptar(res)
+        r = VendaFinal(valor_venda=linha['valor_venda'], troca_aparelho=valores['troca_aparelho'])
+        alocar(r, valores, formas_de(linha['texto']), linha['texto'], linha['valor_venda'])
+        if pediu or abs(r.diferenca) > 0.01:
+            revisao += 1
+        obtido = {c: float(getattr(r, c)) for c in CAMPOS}
+        if all(abs(obtido[c] - linha[c]) <= 0.01 for c in CAMPOS):
+            acertos.append(f'{linha["fonte"]}:{linha["orig_linha"]}')
+        else:
+            erros.append((linha, obtido))
+    return {'acertos': acertos, 'erros': erros, 'revisao': revisao,
+            'linhas_s': len(textos) / melhor if melhor > 0 else float('inf')}
+
+
+def _fmt(v):
+    return ' '.join(f'{c[:5]}={v[c]:g}' for c in CAMPOS if v[c])
+
+
+if __name__ == '__main__':
+    if '--gerar-corpus' in sys.argv:
+        for fonte, (usadas, total) in gerar_corpus().items():
+            print(f'  {fonte:36s} {usadas:4d} de {total} linhas')
+        print(f'Corpus: {CORPUS}')
+        sys.exit(0)
+
+    corpus = ler_corpus()
+    nomes = [arg_valor('--parser')] if arg_valor('--parser') else list(PARSERS)
+    base = {}
+    if os.path.exists(BASE):
+        with open(BASE, encoding='utf-8') as f:
+            base = json.load(f)
+
+    print(f'Corpus: {len(corpus)} linhas ({CORPUS})\n')
+    print(f'  {"parser":12s} {"acerto":>14s} {"revisao":>14s} {"linhas/s":>10s}  regressoes')
+    regressoes, nova_base = {}, dict(base)
+    for nome in nomes:
+        p = placar(nome, corpus, arg_valor('--repeticoes', 5, int))
+        n, a = len(corpus), len(p['acertos'])
+        perdidas = sorted(set(base.get(nome, [])) - set(p['acertos']))
+        regressoes[nome] = perdidas
+        nova_base[nome] = sorted(p['acertos'])
+        print(f'  {nome:12s} {a:5d} ({a / n:6.1%}) {p["revisao"]:5d} ({p["revisao"] / n:6.1%}) '
+              f'{p["linhas_s"]:10.0f}  {len(perdidas) if nome in base else "-"}')
+        if '--mostrar-erros' in sys.argv:
+            for linha, obtido in p['erros']:
+                print(f'      {linha["fonte"]}:{linha["orig_linha"]}  {linha["texto"][:70]!r}')
+                print(f'          esperado {_fmt(linha)} | obtido {_fmt(obtido)}')
+
+    if '--gravar-base' in sys.argv:
+        with open(BASE, 'w', encoding='utf-8') as f:
+            json.dump(nova_base, f, indent=1)
+        print(f'\nBase gravada: {BASE}')
+        sys.exit(0)
+    falhas = {n: r for n, r in regressoes.items() if r}
+    for nome, perdidas in falhas.items():
+        print(f'\nREGRESSAO {nome}: {len(perdidas)} linhas que acertava agora erram:')
+        por_chave = {f'{l["fonte"]}:{l["orig_linha"]}': l for l in corpus}
+        for chave in perdidas:
+            print(f'  {chave}  {por_chave[chave]["texto"][:80]!r}' if chave in por_chave else f'  {chave} (fora do corpus)')
+    sys.exit(1 if falhas else 0)
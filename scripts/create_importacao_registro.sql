@@ -0,0 +1,59 @@
+-- Tabelas de controle das importacoes de planilha (importacao_registro.py,
+-- reverter_importacao.py, reconciliar.py, carregador.py). Ficam no schema
+-- `importacao`, que o PostgREST nao expoe (so public/graphql_public), e com
+-- RLS ligado sem policy: nem anon nem authenticated leem ou gravam; os
+-- scripts conectam como postgres.
+-- Rodar UMA vez antes da primeira importacao (os geradores abortam sem ela).
+
+CREATE SCHEMA IF NOT EXISTS importacao;
+REVOKE ALL ON SCHEMA importacao FROM PUBLIC;
+REVOKE ALL ON SCHEMA importacao FROM anon, authenticated;
+
+-- Versoes antigas dos geradores criavam as tabelas em public: move (com os dados).
+DO $$
+DECLARE
+  t TEXT;
+BEGIN
+  FOREACH t IN ARRAY ARRAY['importacoes', 'importacao_registros', 'importacao_checkpoints'] LOOP
+    IF to_regclass('public.' || t) IS NOT NULL AND to_regclass('importacao.' || t) IS NULL THEN
+      EXECUTE format('ALTER TABLE public.%I SET SCHEMA importacao', t);
+    END IF;
+  END LOOP;
+END $$;
+
+-- ============================================================
+-- importacoes: uma linha por execucao de gerador (--importacao ID)
+-- ============================================================
+CREATE TABLE IF NOT EXISTS importacao.importacoes (
+  id            TEXT PRIMARY KEY,
+  script        TEXT NOT NULL,
+  fonte         TEXT,
+  criado_em     TIMESTAMPTZ NOT NULL DEFAULT now(),
+  revertida_em  TIMESTAMPTZ
+);
+
+-- ============================================================
+-- importacao_registros: cada linha gravada, com a importacao que a CRIOU
+-- ============================================================
+CREATE TABLE IF NOT EXISTS importacao.importacao_registros (
+  importacao_id TEXT NOT NULL REFERENCES importacao.importacoes(id),
+  tabela        TEXT NOT NULL,
+  registro_id   UUID NOT NULL,
+  PRIMARY KEY (tabela, registro_id)
+);
+CREATE INDEX IF NOT EXISTS importacao_registros_importacao_idx
+  ON importacao.importacao_registros (importacao_id, tabela);
+
+-- ============================================================
+-- importacao_checkpoints: ultimo bloco confirmado de cada carga (--retomar)
+-- ============================================================
+CREATE TABLE IF NOT EXISTS importacao.importacao_checkpoints (
+  nome          TEXT PRIMARY KEY,
+  indice        INT NOT NULL,
+  ultima_chave  TEXT,
+  atualizado_em TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+ALTER TABLE importacao.importacoes ENABLE ROW LEVEL SECURITY;
+ALTER TABLE importacao.importacao_registros ENABLE ROW LEVEL SECURITY;
+ALTER TABLE importacao.importacao_checkpoints ENABLE ROW LEVEL SECURITY;
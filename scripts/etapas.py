@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Roda a cadeia de scripts de importacao como um DAG com cache por hash:
+
+  venda_aparelhos.csv -> csv_final (gerar_csv_final) -> vendas_final.csv
+                              -> sql_completo (importar_tudo)
+                              -> sql_vendas (importar_vendas_final)
+                      -> saidas (gerar_saidas: previews + xlsx + importacao.sql, um parse so)
+                      -> pagamentos
+  estoque_2026-06-10.xlsx -> estoque (importar_estoque) -> importar_estoque.sql
+
+Cada etapa declara entradas e saidas. O hash da etapa e sha256 de: conteudo
+das entradas + o script + os modulos locais que ele importa (transitivo, lido
+com ast) + argumentos + as correcoes manuais de _catalogo_modelos.json (se usa
+modelos.py). O hash e tirado ANTES de rodar: entrada alterada durante a
+execucao faz a etapa rodar de novo na proxima vez. Se bate com
+_etapas_estado.json e as saidas existem (e o _armazem.sqlite, se a etapa grava
+nele), a etapa e pulada; senao roda. Entrada que e saida de outra etapa = dependencia (espera
+ela terminar, e o hash ja pega a saida nova). Etapas independentes rodam em
+paralelo (um subprocesso cada).
+
+Uso:
+  python3 scripts/etapas.py                  # recalcula so o que mudou
+  python3 scripts/etapas.py sql_completo     # so essa (+ dependencias)
+  python3 scripts/etapas.py --forcar         # ignora o cache
+  python3 scripts/etapas.py --listar         # estado de cada etapa
+  python3 scripts/etapas.py --profile        # roda tudo (sem cache) com --profile, um diretorio so
+  --trabalhadores N (padrao: nucleos)
+"""
+import ast, hashlib, json, os, subprocess, sys, time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS = os.path.join(ROOT, 'scripts')
+sys.path.insert(0, SCRIPTS)
+from importacao_cli import arg_valor, args_posicionais
+import armazem, modelos, perfilador
+
+ESTADO = os.path.join(SCRIPTS, '_etapas_estado.json')
+
+# entradas/saidas relativas a ROOT. `depois`: ordem sem troca de arquivo
+# (etapas que escrevem o mesmo arquivo como efeito colateral nao podem rodar juntas)
+Etapa = namedtuple('Etapa', 'nome script entradas saidas args depois')
+Etapa.__new__.__defaults__ = ((), ())
+
+ETAPAS = [
+    Etapa('csv_final', 'scripts/gerar_csv_final.py', ['venda_aparelhos.csv'],
+          ['scripts/vendas_final.csv', 'venda_aparelhos_com_revisao.csv']),
+    Etapa('sql_completo', 'scripts/importar_tudo.py', ['scripts/vendas_final.csv'],
+          ['scripts/importacao_completa.sql']),
+    Etapa('sql_vendas', 'scripts/importar_vendas_final.py', ['scripts/vendas_final.csv'],
+          ['scripts/importar_vendas.sql']),
+    Etapa('saidas', 'scripts/gerar_saidas.py', ['venda_aparelhos.csv'],
+          ['scripts/importacao_preview/preview_importacao.csv', 'scripts/importacao_preview/resumo.json',
+           'scripts/vendas_normalizadas.xlsx', 'scripts/importacao.sql']),
+    Etapa('pagamentos', 'scripts/extrair_pagamentos.py', ['venda_aparelhos.csv'],
+          ['scripts/vendas_pagamentos_detalhados.csv']),
+    Etapa('estoque', 'scripts/importar_estoque.py', ['scripts/estoque_2026-06-10.xlsx'],
+          ['scripts/importar_estoque.sql']),
+]
+
+
+
+def _sha(caminho, h):
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloco)
+
+
+def modulos_locais(script, vistos=None):
+    """Script + modulos de scripts/ que ele importa (transitivo), ordenados."""
+    vistos = set() if vistos is None else vistos
+    if script in vistos:
+        return vistos
+    vistos.add(script)
+    with open(os.path.join(ROOT, script), encoding='utf-8') as f:
+        arvore = ast.parse(f.read(), script)
+    for no in ast.walk(arvore):   # inclui imports dentro de funcoes (lazy)
+        if isinstance(no, ast.Import):
+            nomes = [a.name for a in no.names]
+        elif isinstance(no, ast.ImportFrom) and not no.level and no.module:
+            nomes = [no.module]
+        else:
+            continue
+        for nome in nomes:
+            rel = f'scripts/{nome.split(".")[0]}.py'
+            if os.path.exists(os.path.join(ROOT, rel)):
+                modulos_locais(rel, vistos)
+    return vistos
+
+
+def _correcoes_catalogo(h):
+    """Entradas "manual" do catalogo mudam a saida; as automaticas vem do modelos.py (ja no hash)."""
+    try:
+        with open(modelos.CATALOGO, encoding='utf-8') as f:
+            dados = json.load(f)
+    except (OSError, ValueError):
+        return
+    manuais = {t: c for t, c in dados.get('modelos', {}).items() if c.get('manual')}
+    h.update(json.dumps(manuais, sort_keys=True).encode())
+
+
+def hash_etapa(e):
+    h = hashlib.sha256()
+    h.update(repr((e.nome, e.args)).encode())
+    mods = sorted(modulos_locais(e.script))
+    for rel in mods + list(e.entradas):
+        h.update(rel.encode())
+        caminho = os.path.join(ROOT, rel)
+        if os.path.exists(caminho):
+            _sha(caminho, h)
+    if 'scripts/modelos.py' in mods:
+        _correcoes_catalogo(h)
+    return h.hexdigest()
+
+
+def grava_armazem(e):
+    return 'scripts/armazem.py' in modulos_locais(e.script) and '--sem-armazem' not in e.args
+
+
+def dependencias(etapas):
+    """{nome: {nomes das etapas que precisam terminar antes}}."""
+    produtor = {s: e.nome for e in etapas for s in e.saidas}
+    nomes = {e.nome for e in etapas}
+    return {e.nome: ({produtor[i] for i in e.entradas if i in produtor} | set(e.depois)) & nomes - {e.nome}
+            for e in etapas}
+
+
+def selecionar(alvos):
+    """Etapas pedidas + tudo de que dependem (na ordem de ETAPAS)."""
+    if not alvos:
+        return list(ETAPAS)
+    por_nome = {e.nome: e for e in ETAPAS}
+    faltam = [a for a in alvos if a not in por_nome]
+    if faltam:
+        sys.exit(f'Etapa desconhecida: {", ".join(faltam)} (use --listar)')
+    deps = dependencias(ETAPAS)
+    quero, pilha = set(), list(alvos)
+    while pilha:
+        n = pilha.pop()
+        if n not in quero:
+            quero.add(n)
+            pilha.extend(deps[n])
+    return [e for e in ETAPAS if e.nome in quero]
+
+
+def ler_estado():
+    if os.path.exists(ESTADO):
+        with open(ESTADO, encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def gravar_estado(estado):
+    tmp = ESTADO + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(estado, f, indent=1, sort_keys=True)
+    os.replace(tmp, ESTADO)
+
+
+def atualizada(e, estado, h=None):
+    return (estado.get(e.nome) == (h or hash_etapa(e))
+            and all(os.path.exists(os.path.join(ROOT, s)) for s in e.saidas)
+            and (not grava_armazem(e) or os.path.exists(armazem.CAMINHO)))
+
+
+def _rodar(e, perfil=None):
+    t0 = time.perf_counter()
+    extra = [f'--profile={perfil}'] if perfil else []
+    p = subprocess.run([sys.executable, os.path.join(ROOT, e.script), *e.args, *extra], cwd=ROOT,
+                       capture_output=True, text=True)
+    return p.returncode, p.stdout + p.stderr, time.perf_counter() - t0
+
+
+def executar(etapas, forcar=False, trabalhadores=None, perfil=None):
+    """
+    Roda as etapas respeitando dependencias. Retorna {nome: 'rodou'|'cache'|'falhou'|'bloqueada'}.
+    perfil: diretorio do --profile (todas as etapas gravam nele; implica forcar).
+    """
+    forcar = forcar or bool(perfil)
+    estado = ler_estado()
+    deps = dependencias(etapas)
+    por_nome = {e.nome: e for e in etapas}
+    resultado, rodando, hashes = {}, {}, {}
+    with ThreadPoolExecutor(trabalhadores or os.cpu_count() or 2) as pool:
+        while len(resultado) < len(etapas):
+            antes = len(resultado) + len(rodando)
+            for e in etapas:
+                if e.nome in resultado or e.nome in rodando:
+                    continue
+                if any(resultado.get(d) in ('falhou', 'bloqueada') for d in deps[e.nome]):
+                    resultado[e.nome] = 'bloqueada'
+                    print(f'  {e.nome:15s} BLOQUEADA (dependencia falhou)')
+                    continue
+                if not all(d in resultado for d in deps[e.nome]):
+                    continue
+                # hash so agora (as saidas das dependencias ja estao no disco) e antes
+                # de rodar: e o das entradas que a etapa leu
+                hashes[e.nome] = hash_etapa(e)
+                if not forcar and atualizada(e, estado, hashes[e.nome]):
+                    resultado[e.nome] = 'cache'
+                    print(f'  {e.nome:15s} em cache')
+                    continue
+                rodando[e.nome] = pool.submit(_rodar, e, perfil)
+                print(f'  {e.nome:15s} rodando...')
+            if not rodando:
+                if len(resultado) == antes:
+                    sys.exit(f'Ciclo nas dependencias: {sorted(set(por_nome) - set(resultado))}')
+                continue
+            feitos, _ = wait(rodando.values(), return_when=FIRST_COMPLETED)
+            for nome in [n for n, f in rodando.items() if f in feitos]:
+                cod, saida, segundos = rodando.pop(nome).result()
+                if cod == 0:
+                    resultado[nome] = 'rodou'
+                    estado[nome] = hashes[nome]
+                    gravar_estado(estado)
+                    print(f'  {nome:15s} ok em {segundos:.1f}s')
+                else:
+                    resultado[nome] = 'falhou'
+                    print(f'  {nome:15s} FALHOU (codigo {cod}):')
+                    print('    ' + '\n    '.join(saida.strip().splitlines()[-15:]))
+    return resultado
+
+
+if __name__ == '__main__':
+    etapas = selecionar(args_posicionais(com_valor=('--trabalhadores',)))
+    if '--listar' in sys.argv:
+        estado, deps = ler_estado(), dependencias(ETAPAS)
+        for e in etapas:
+            st = 'em dia' if atualizada(e, estado) else 'desatualizada'
+            print(f'{e.nome:15s} {st:14s} {e.script}  <- {", ".join(sorted(deps[e.nome])) or "-"}')
+        sys.exit(0)
+    t0 = time.perf_counter()
+    perfil = perfilador.destino_padrao() if perfilador.pedido() else None
+    res = executar(etapas, '--forcar' in sys.argv, arg_valor('--trabalhadores', None, int), perfil)
+    n = {k: sum(1 for v in res.values() if v == k) for k in ('rodou', 'cache', 'falhou', 'bloqueada')}
+    print(f'{n["rodou"]} rodaram, {n["cache"]} em cache, {n["falhou"]} falharam, '
+          f'{n["bloqueada"]} bloqueadas ({time.perf_counter() - t0:.1f}s)')
+    if perfil:
+        print(f'Perfil: {perfil} (comparar: scripts/perfilador.py comparar DIR_A DIR_B)')
+    sys.exit(1 if n['falhou'] else 0)
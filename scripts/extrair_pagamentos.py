@@ -3,15 +3,15 @@
 Extrai valores individuais de cada forma de pagamento do texto descritivo.
 Gera CSV com colunas separadas para cada tipo de pagamento.
 """
-import csv, re, os, sys
+import csv, os, sys
 from collections import defaultdict
 
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, os.path.join(ROOT, 'scripts'))
-from analisar_importacao import (
-    parse_brl, to_date, normalizar_forma, extrair_troca,
-    LOJA_MAP, VENDEDOR_MAP, limpar_acentos
-)
+import regex_seguro as rx
+import perfilador
+perfilador.ativar()
+from analisar_importacao import vendas, extrair_troca, limpar_acentos
 
 def parse_real(v):
     """Converte string monetaria brasileira para float, robusto."""
@@ -39,7 +39,7 @@ def extrair_valores_individuais(texto):
     t = texto.upper()
     t = limpar_acentos(t)
     t = t.replace('R$', 'R$')
-    t = re.sub(r'\s+', ' ', t).strip()
+    t = rx.sub(r'\s+', ' ', t).strip()
     
     valores = defaultdict(float)
     
@@ -52,24 +52,24 @@ def extrair_valores_individuais(texto):
     # Remover trechos de ENTRADA/TROCA do texto para nao confundir
     t_clean = t
     # Remover "ENTRADA ... R$ valor" 
-    t_clean = re.sub(r'ENTRADA\s+.+?R?\$?\s*[\d]+\s*[.,]\s*[\d]+', '', t_clean)
+    t_clean = rx.sub(r'ENTRADA\s+.+?R?\$?\s*[\d]+\s*[.,]\s*[\d]+', '', t_clean)
     # Remover "entrou ... na troca por valor"
-    t_clean = re.sub(r'ENTROU\s+.+?NA\s+TROCA\s+POR\s+R?\$?\s*[\d.,]+', '', t_clean)
+    t_clean = rx.sub(r'ENTROU\s+.+?NA\s+TROCA\s+POR\s+R?\$?\s*[\d.,]+', '', t_clean)
     # Remover "PEGANDO ... PRO valor"
-    t_clean = re.sub(r'PEGANDO\s+.+?\s+PRO\s+R?\$?\s*[\d.,]+', '', t_clean)
+    t_clean = rx.sub(r'PEGANDO\s+.+?\s+PRO\s+R?\$?\s*[\d.,]+', '', t_clean)
     # Remover "valor (referente a|de) entrada ... modelo"
-    t_clean = re.sub(r'[\d.,]+\s+(?:RESTANTE\s+)?(?:A\s+)?(?:REFERENTE\s+A\s+)?(?:DE\s+)?ENTRADA\s+.+?$', '', t_clean)
+    t_clean = rx.sub(r'(?<![\d.,])[\d.,]+\s+(?:RESTANTE\s+)?(?:A\s+)?(?:REFERENTE\s+A\s+)?(?:DE\s+)?ENTRADA\s+.+?$', '', t_clean)
     # Remover "um aparelho na troca ... por valor"
-    t_clean = re.sub(r'(?:UM\s+)?APARELHO\s+(?:NA\s+)?TROCA[.,;: ]+.+?POR\s+R?\$?\s*[\d.,]+', '', t_clean)
-    t_clean = re.sub(r'\s+', ' ', t_clean).strip()
+    t_clean = rx.sub(r'(?:UM\s+)?APARELHO\s+(?:NA\s+)?TROCA[.,;: ]+.+?POR\s+R?\$?\s*[\d.,]+', '', t_clean)
+    t_clean = rx.sub(r'\s+', ' ', t_clean).strip()
     
     # --- ESTRATEGIA 2: ENCONTRAR PIX ---
     # Padroes: "PIX R$ 2500", "2500 PIX", "2500,00 pix", "R$ 2500 PIX"
     # Tambem: "PIX: 2500", "2500 no pix"
-    pix_matches = list(re.finditer(
+    pix_matches = list(rx.finditer(
         r'(?:PIX\s*(?::)?\s*R?\$?\s*([\d.,]+)|'  # "PIX R$ 2500" ou "PIX: 2500"
-        r'([\d.,]+)\s*(?:DE\s+)?PIX|'              # "2500 PIX" ou "2500 no pix"
-        r'R?\$?\s*([\d.,]+)\s*(?:NO\s+)?PIX)',      # "R$ 2500 PIX"
+        r'(?<![\d.,])([\d.,]+)\s*(?:DE\s+)?PIX|'              # "2500 PIX" ou "2500 no pix"
+        r'R?\$?\s*(?<![\d.,])([\d.,]+)\s*(?:NO\s+)?PIX)',      # "R$ 2500 PIX"
         t_clean
     ))
     for m in pix_matches:
@@ -80,9 +80,9 @@ def extrair_valores_individuais(texto):
             t_clean = t_clean.replace(m.group(0), '', 1)
     
     # --- ESTRATEGIA 3: DINHEIRO ---
-    dinheiro_matches = list(re.finditer(
+    dinheiro_matches = list(rx.finditer(
         r'(?:DINHEIRO\s*(?::)?\s*R?\$?\s*([\d.,]+)|'  # "DINHEIRO R$ 2500"
-        r'([\d.,]+)\s*(?:DE\s+)?DINHEIRO)',            # "2500 dinheiro"
+        r'(?<![\d.,])([\d.,]+)\s*(?:DE\s+)?DINHEIRO)',            # "2500 dinheiro"
         t_clean
     ))
     for m in dinheiro_matches:
@@ -94,9 +94,9 @@ def extrair_valores_individuais(texto):
     
     # --- ESTRATEGIA 4: CARTAO CREDITO ---
     # Padroes: "CREDITO R$ 3000", "3000 CREDITO", "R$ 3000 em 10x", "3000 no cartao em 3x"
-    cred_matches = list(re.finditer(
+    cred_matches = list(rx.finditer(
         r'(?:(?:CREDITO|CRED|CARTAO(?:[^A-Z]|$))(?::)?\s*(?:EM\s+\d+X\s+)?R?\$?\s*([\d.,]+)|'  # "CREDITO R$ 3000" ou "CARTAO: 3000"
-        r'([\d.,]+)\s*(?:EM\s+\d+X\s+)?(?:NO\s+)?(?:CREDITO|CARTAO(?:[^A-Z]|$)))',               # "3000 credito" ou "3000 em 12x no cartao"
+        r'(?<![\d.,])([\d.,]+)\s*(?:EM\s+\d+X\s+)?(?:NO\s+)?(?:CREDITO|CARTAO(?:[^A-Z]|$)))',               # "3000 credito" ou "3000 em 12x no cartao"
         t_clean
     ))
     for m in cred_matches:
@@ -107,9 +107,9 @@ def extrair_valores_individuais(texto):
             t_clean = t_clean.replace(m.group(0), '', 1)
     
     # --- ESTRATEGIA 5: CARTAO DEBITO ---
-    deb_matches = list(re.finditer(
+    deb_matches = list(rx.finditer(
         r'(?:DEBITO\s*(?::)?\s*R?\$?\s*([\d.,]+)|'
-        r'([\d.,]+)\s*(?:DE\s+)?DEBITO)',
+        r'(?<![\d.,])([\d.,]+)\s*(?:DE\s+)?DEBITO)',
         t_clean
     ))
     for m in deb_matches:
@@ -132,9 +132,7 @@ def extrair_valores_individuais(texto):
 INPUT = os.path.join(ROOT, 'venda_aparelhos.csv')
 OUTPUT = os.path.join(ROOT, 'scripts', 'vendas_pagamentos_detalhados.csv')
 
-with open(INPUT, 'r', encoding='utf-8') as f:
-    reader = csv.DictReader(f)
-    linhas = list(reader)
+linhas = vendas(INPUT)
 
 fieldnames = [
     'data', 'data_iso', 'modelo', 'imei',
@@ -148,29 +146,35 @@ fieldnames = [
 
 rows = []
 problemas_soma = []
+nao_analisados = 0
 
-for row in linhas:
-    data = row.get('DATA', '').strip()
-    data_iso = to_date(data)
-    modelo = row.get('MODELO', '').strip()
-    imei = row.get('IMEI', '').strip().replace(' ', '')
-    valor_venda = parse_brl(row.get('VALOR DE VENDA', ''))
-    brinde = parse_brl(row.get('BRINDE', ''))
-    custo = parse_brl(row.get('CUSTO APARELHO', ''))
-    lucro = parse_brl(row.get('LUCRO', ''))
-    vendedor = row.get('VENDEDOR', '').strip().title()
-    loja = row.get('LOJA', '').strip().upper() or 'CELL'
-    forma_orig = row.get('FORMA DE PAGAMENTO', '').strip()
-    loja_id = LOJA_MAP.get(loja)
+for venda in linhas:
+    data = venda.data
+    data_iso = venda.data_iso
+    modelo = venda.modelo
+    imei = venda.imei
+    valor_venda = venda.valor_venda
+    brinde = venda.brinde
+    custo = venda.custo
+    lucro = venda.lucro
+    vendedor = venda.vendedor_nome
+    loja = venda.loja_nome
+    forma_orig = venda.forma_orig
+    loja_id = venda.loja_id
     
     if valor_venda is None:
         continue
     
-    # Extrair valores individuais
-    valores = extrair_valores_individuais(forma_orig)
+    # Extrair valores individuais (com prazo: texto patologico nao trava o lote)
+    try:
+        with rx.prazo(forma_orig):
+            valores = extrair_valores_individuais(forma_orig)
+    except rx.PrazoEsgotado:
+        valores = {}
+        nao_analisados += 1
     
     # Trocas
-    trocas = extrair_troca(forma_orig) if 'troca_aparelho' in normalizar_forma(forma_orig) else []
+    trocas = venda.trocas
     modelo_troca = '; '.join(t['modelo'] for t in trocas)
     valor_troca = sum(t['valor'] for t in trocas)
     
@@ -215,6 +219,8 @@ with open(OUTPUT, 'w', newline='', encoding='utf-8-sig') as f:
     w.writerows(rows)
 
 print(f'CSV salvo: {OUTPUT} ({len(rows)} linhas)')
+if nao_analisados:
+    print(f'Pagamento nao analisado (prazo/tamanho, regex {rx.MOTOR}): {nao_analisados}')
 print()
 
 # Estatisticas
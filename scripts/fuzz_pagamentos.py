@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Fuzz de latencia dos parsers de pagamento: o pior caso por linha, nao a media.
+
+Gera textos hostis a partir da gramatica das planilhas (PIX, ENTRADA ... NO
+VALOR DE, EM 12X, R$ 1.234,56, modelos) e de mutacoes do corpus
+(corpus_pagamentos.csv):
+
+  longo        dezenas a centenas de tokens colados
+  separadores  '/', '+', ':', espacos e virgulas repetidos
+  numeros      muitos valores em formatos misturados
+  acentos      palavras-chave com acento/cedilha e caixa trocada
+  mutacao      texto real com trechos duplicados, trocados e cortados
+
+Cada chamada e cronometrada; por alvo sai p50 / p99 / p99.9 / max. Texto
+acima de --limite (ms) ou que levante excecao e falha: os MAX_CASOS piores
+por alvo vao para scripts/fuzz_pagamentos_casos.json, que e sempre rodado
+primeiro nas proximas execucoes (regressao). Sai com 1 se houve falha.
+
+Tamanho maximo do texto = regex_seguro.TAMANHO_MAX (acima disso o pipeline
+nem tenta o parse).
+
+Uso:
+  python3 scripts/fuzz_pagamentos.py                  # 3000 textos por alvo
+  python3 scripts/fuzz_pagamentos.py --n 20000 --semente 7 --limite 20
+  python3 scripts/fuzz_pagamentos.py --alvo extrair_troca
+  python3 scripts/fuzz_pagamentos.py --so-casos       # so a regressao salva
+"""
+import json, os, random, sys, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+from corpus_pagamentos import CORPUS, definicoes, ler_corpus
+from importacao_cli import arg_valor
+import regex_seguro as rx
+
+CASOS = os.path.join(ROOT, 'scripts', 'fuzz_pagamentos_casos.json')
+LIMITE_MS = 100.0   # 1/5 do prazo por linha de producao (regex_seguro.PRAZO_LINHA)
+MAX_CASOS = 10      # casos salvos por alvo (os mais lentos)
+
+# nome -> (script, funcao)
+ALVOS = {
+    'extrair_valores_individuais': ('scripts/extrair_pagamentos.py', 'extrair_valores_individuais'),
+    'extrair_pagamentos_simples':  ('scripts/gerar_csv_final.py', 'extrair_pagamentos_simples'),
+    'extrair_troca':               ('scripts/gerar_csv_final.py', 'extrair_troca'),
+    'extrair_troca_analise':       ('scripts/analisar_importacao.py', 'extrair_troca'),
+    'normalizar_pagamento':        ('normalizar_vendas2.py', 'normalizar_pagamento'),
+    'normalizar_pagamento_lote3':  ('scripts/importar_vendas_aparelhos3.py', 'normalizar_pagamento'),
+}
+
+PALAVRAS = ['PIX', 'pix', 'DINHEIRO', 'CREDITO', 'CRED', 'CARTAO', 'DEBITO', 'ENTRADA', 'ENTROU',
+            'NA TROCA POR', 'DE ENTRADA NO VALOR DE', 'PEGANDO', 'POR', 'PRO', 'DE', 'NO', 'EM 12X',
+            'EM 3X', '10x', 'RESTANTE', 'REFERENTE A', 'UM APARELHO NA TROCA', 'DOWNGRADE',
+            'PAGAMENTO JUNTO', 'APARELHO 2', 'GARANTIA', 'SEMINOVO', 'NOVO', 'USADO', 'REAIS', 'R$', 'R4']
+MODELOS = ['iphone 14 pro max 256GB', 'IPHONE 13', 'iPhone 16 PRO 256GB PRETO', 'samsung s23',
+           'redmi note 13', 'realme c55', '15 PRO', 'IPAD 11 128GB']
+SEPARADORES = ['/', ' / ', '+', ' + ', ':', ',', ';', '  ', ' ', '.', '-', '\t']
+ACENTOS = {'A': 'ÁÃÂ', 'E': 'ÉÊ', 'I': 'Í', 'O': 'ÓÕÔ', 'U': 'Ú', 'C': 'Ç'}
+
+
+def numero(rnd):
+    v = rnd.choice([rnd.randint(0, 99), rnd.randint(100, 9999), rnd.randint(10000, 999999)])
+    c = rnd.randint(0, 99)
+    return rnd.choice([
+        f'{v}', f'{v},{c:02d}', f'{v}.{c:02d}', f'{v:,}'.replace(',', '.') + f',{c:02d}',
+        f'R$ {v}', f'R${v},{c:02d}', f'{v} ,{c:02d}', f'{v}.{v}.{v}', '0,00',
+    ])
+
+
+def token(rnd):
+    return rnd.choice([rnd.choice(PALAVRAS), rnd.choice(MODELOS), numero(rnd), numero(rnd)])
+
+
+def acentuar(rnd, texto):
+    saida = []
+    for ch in texto:
+        alt = ACENTOS.get(ch.upper())
+        if alt and rnd.random() < 0.3:
+            ch = rnd.choice(alt)
+        saida.append(ch.lower() if rnd.random() < 0.2 else ch)
+    return ''.join(saida)
+
+
+def _longo(rnd, corpus):
+    return ' '.join(token(rnd) for _ in range(rnd.randint(30, 300)))
+
+
+def _separadores(rnd, corpus):
+    sep = rnd.choice(SEPARADORES)
+    partes = [token(rnd) for _ in range(rnd.randint(2, 10))]
+    return (sep * rnd.randint(5, 200)).join(partes) + sep * rnd.randint(0, 300)
+
+
+def _numeros(rnd, corpus):
+    return rnd.choice(SEPARADORES).join(numero(rnd) for _ in range(rnd.randint(20, 250)))
+
+
+def _acentos(rnd, corpus):
+    return acentuar(rnd, ' '.join(token(rnd) for _ in range(rnd.randint(3, 60))))
+
+
+def _mutacao(rnd, corpus):
+    t = rnd.choice(corpus) if corpus else _longo(rnd, corpus)
+    for _ in range(rnd.randint(1, 8)):
+        if not t:
+            break
+        i, j = sorted(rnd.randrange(len(t) + 1) for _ in range(2))
+        op = rnd.random()
+        if op < 0.4:
+            t = t[:j] + t[i:j] * rnd.randint(2, 30) + t[j:]      # duplica trecho
+        elif op < 0.6:
+            t = t[:i] + t[j:]                                     # corta
+        elif op < 0.8:
+            t = t[:i] + token(rnd) + t[i:]                        # insere token
+        else:
+            t = t[:i] + rnd.choice(SEPARADORES) * rnd.randint(1, 50) + t[i:]
+    return t
+
+
+GERADORES = {'longo': _longo, 'separadores': _separadores, 'numeros': _numeros,
+             'acentos': _acentos, 'mutacao': _mutacao}
+
+
+def textos(n, semente=0, corpus=()):
+    """(estrategia, texto) deterministico pela semente; corta em TAMANHO_MAX."""
+    rnd = random.Random(semente)
+    nomes = list(GERADORES)
+    for i in range(n):
+        nome = nomes[i % len(nomes)]
+        yield nome, GERADORES[nome](rnd, corpus)[:rx.TAMANHO_MAX]
+
+
+def percentil(ordenados, p):
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, int(p * len(ordenados)))]
+
+
+def medir(funcao, entradas, limite_ms):
+    """Cronometra cada texto. Retorna (tempos_ms ordenados, pior (ms, estrategia, texto), falhas)."""
+    tempos, pior, falhas = [], (0.0, '', ''), []
+    for estrategia, texto in entradas:
+        erro = None
+        t0 = time.perf_counter()
+        try:
+            funcao(texto)
+        except Exception as e:
+            erro = f'{type(e).__name__}: {e}'
+        ms = (time.perf_counter() - t0) * 1000
+        tempos.append(ms)
+        if ms > pior[0]:
+            pior = (ms, estrategia, texto)
+        if erro or ms > limite_ms:
+            falhas.append({'texto': texto, 'estrategia': estrategia, 'ms': round(ms, 2), 'erro': erro})
+    return sorted(tempos), pior, falhas
+
+
+def ler_casos():
+    if os.path.exists(CASOS):
+        with open(CASOS, encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def gravar_casos(casos):
+    with open(CASOS, 'w', encoding='utf-8') as f:
+        json.dump(casos, f, indent=1, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    n = arg_valor('--n', 3000, int)
+    semente = arg_valor('--semente', 0, int)
+    limite = arg_valor('--limite', LIMITE_MS, float)
+    nomes = [arg_valor('--alvo')] if arg_valor('--alvo') else list(ALVOS)
+    corpus = [l['texto'] for l in ler_corpus()] if os.path.exists(CORPUS) else []
+    casos = ler_casos()
+    modulos = {}
+
+    so_casos = '--so-casos' in sys.argv
+    origem = 'so os casos salvos' if so_casos else f'{n} textos por alvo (semente {semente}) + casos salvos'
+    print(f'Fuzz: {origem}, limite {limite:g} ms/linha, regex {rx.MOTOR}\n')
+    print(f'  {"alvo":28s} {"n":>6s} {"p50":>7s} {"p99":>7s} {"p99.9":>7s} {"max":>8s}  pior')
+    total_falhas = 0
+    for nome in nomes:
+        script, funcao = ALVOS[nome]
+        if script not in modulos:
+            modulos[script] = definicoes(script)
+        f = modulos[script][funcao]
+        salvos = [(c.get('estrategia', 'caso'), c['texto']) for c in casos.get(nome, [])]
+        entradas = salvos if so_casos else salvos + list(textos(n, semente, corpus))
+        tempos, pior, falhas = medir(f, entradas, limite)
+        if not tempos:
+            print(f'  {nome:28s} {0:6d}  -')
+            continue
+        print(f'  {nome:28s} {len(tempos):6d} {percentil(tempos, .5):7.3f} {percentil(tempos, .99):7.3f} '
+              f'{percentil(tempos, .999):7.3f} {pior[0]:8.3f}  {pior[1]} ({len(pior[2])} car.)')
+        if falhas:
+            total_falhas += len(falhas)
+            ja = {c['texto'] for c in casos.get(nome, [])}
+            vaga = max(MAX_CASOS - len(ja), 0)
+            novos = sorted((c for c in falhas if c['texto'] not in ja), key=lambda c: -c['ms'])[:vaga]
+            casos.setdefault(nome, []).extend(novos)
+            for c in sorted(falhas, key=lambda c: -c['ms'])[:5]:
+                print(f'      FALHA {c["ms"]:.1f} ms {c["erro"] or ""} [{c["estrategia"]}] {c["texto"][:60]!r}...')
+            if novos:
+                print(f'      {len(novos)} casos novos salvos em {CASOS}')
+    if total_falhas:
+        gravar_casos(casos)
+        sys.exit(f'\n{total_falhas} textos acima de {limite:g} ms ou com erro')
@@ -1,5 +1,19 @@
 #!/usr/bin/env python3
-import csv, uuid, re
+import csv, os, re, sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from importacao_ids import GeradorIds
+from importacao_cli import arg_valor
+from importacao_registro import id_importacao, sql_abrir, sql_marcar_venda
+from modelos import extract_brand
+import armazem
+import perfilador
+perfilador.ativar()
+
+# --ids tempo: UUIDv7 pela data da venda (ver importacao_ids.py)
+ids = GeradorIds(arg_valor('--ids', 'aleatorio'))
+# --importacao ID: desfazer com scripts/reverter_importacao.py ID
+IMPORTACAO_ID = id_importacao('gerar_angel_sql', arg_valor('--importacao'))
+LOTE = armazem.Lote(IMPORTACAO_ID, 'gerar_angel_sql', 'vendas_aparelhos2_final.csv')
 
 ANGEL_UUID = '4549c96e-5c53-4cd6-b738-9d798f82a740'
 
@@ -15,12 +29,6 @@ def to_date(d):
     m2 = re.match(r'(\d{4})-(\d{2})-(\d{2})', d)
     if m2: return d
     return None
-def extract_brand(modelo):
-    m = modelo.upper()
-    if any(m.startswith(p) for p in ('IPHONE','IPAD','MAC','APPLE','FONTE')): return 'Apple'
-    if m.startswith('SAMSUNG'): return 'Samsung'
-    if m.startswith('POCO') or m.startswith('XIAOMI') or m.startswith('REDMI'): return 'Xiaomi'
-    return 'Outros'
 def condicao(estado):
     e = estado.lower()
     if e == 'novo': return 'perfeito'
@@ -49,6 +57,7 @@ lines.append('    END IF;')
 lines.append("    PERFORM set_config('importacao.cliente_id', v_cliente_id::text, true);")
 lines.append('END;')
 lines.append('$body$;')
+lines.append(sql_abrir(IMPORTACAO_ID, 'gerar_angel_sql', 'vendas_aparelhos2_final.csv'))
 lines.append('')
 
 for row in angel_rows:
@@ -74,14 +83,15 @@ for row in angel_rows:
     soma = pix + dinheiro + cartao_credito + cartao_debito + troca
     diferenca = round(valor_venda - soma, 2)
 
-    if precisa_revisao == 'SIM' and abs(diferenca) > 0.01:
+    forcado = precisa_revisao == 'SIM' and abs(diferenca) > 0.01
+    if forcado:
         pix = valor_venda
         dinheiro = cartao_credito = cartao_debito = troca = 0
         soma = valor_venda
         observacao = (observacao + '; ' if observacao else '') + 'pgto forcado pix'
 
-    aparelho_id = str(uuid.uuid4())
-    venda_id = str(uuid.uuid4())
+    aparelho_id = ids.gerar('aparelhos', data=data_iso)
+    venda_id = ids.gerar('vendas', data=data_iso)
     numero_venda += 1
     marca = extract_brand(modelo)
     cond = condicao(estado)
@@ -95,21 +105,26 @@ for row in angel_rows:
     lines.append(f"UPDATE aparelhos SET venda_id = '{venda_id}' WHERE id = '{aparelho_id}';")
     for tipo, valor in [('pix',pix),('dinheiro',dinheiro),('cartao_credito',cartao_credito),('cartao_debito',cartao_debito)]:
         if valor > 0:
-            pid = str(uuid.uuid4())
+            pid = ids.gerar('pagamentos_venda', data=data_iso)
             lines.append(f"INSERT INTO pagamentos_venda (id, venda_id, tipo_pagamento, valor, data_pagamento, criado_por, parcelas, criado_em) VALUES ('{pid}', '{venda_id}', '{tipo}', {round(valor,2)}, '{data_iso}', {vd}, 1, {ts});")
     if troca > 0:
-        pid = str(uuid.uuid4())
+        pid = ids.gerar('pagamentos_venda', data=data_iso)
         obs_t = esc(f'Troca: {modelo_troca}') if modelo_troca else 'Troca de aparelho'
         lines.append(f"INSERT INTO pagamentos_venda (id, venda_id, tipo_pagamento, valor, data_pagamento, criado_por, observacao, parcelas, criado_em) VALUES ('{pid}', '{venda_id}', 'troca_aparelho', {round(troca,2)}, '{data_iso}', {vd}, '{obs_t}', 1, {ts});")
     if brinde > 0:
-        bid = str(uuid.uuid4())
+        bid = ids.gerar('brindes_aparelhos', data=data_iso)
         lines.append(f"INSERT INTO brindes_aparelhos (id, loja_id, venda_id, descricao, valor_custo, data_ocorrencia, criado_por, criado_em) VALUES ('{bid}', {loja_id}, '{venda_id}', 'Brinde', {round(brinde,2)}, '{data_iso}', {vd}, {ts});")
+    lines.append(sql_marcar_venda(IMPORTACAO_ID, aparelho_id))
     lines.append('')
+    LOTE.linha(linha, motivo='pgto forcado pix' if forcado else '', row=row, data_iso=data_iso,
+               vendedor_id=ANGEL_UUID, pix=pix, dinheiro=dinheiro, cartao_credito=cartao_credito,
+               cartao_debito=cartao_debito, troca_aparelho=troca, venda_id=venda_id, aparelho_id=aparelho_id)
 
 lines.append('COMMIT;')
 
 with open('scripts/importar_angel.sql', 'w', encoding='utf-8') as f:
     f.write('\n'.join(lines))
+LOTE.gravar()
 
 print(f'SQL gerado: scripts/importar_angel.sql')
 print(f'Ultimo numero_venda: {numero_venda}')
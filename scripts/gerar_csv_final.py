@@ -6,11 +6,18 @@ Gera CSV final com todos os dados normalizados e corrigidos:
 - IMEI vazio: mantido como vazio
 - Troca R$ 0: registrada
 """
-import csv, re, os, sys
+import csv, os, sys
 from collections import defaultdict
+from functools import lru_cache
 
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+from modelos import detectar_estado
+from registros_venda import LOJA, VENDEDOR, VendaFinal, gravar_csv
+from leitor_csv import ler_vendas
+import regex_seguro as rx
+import perfilador
+perfilador.ativar()
 
 # Inline necessarias para evitar importar o modulo analisar_importacao
 # (que executa o codigo principal ao ser importado)
@@ -48,7 +55,7 @@ TAXAS_ELO = {
 def extrair_parcelas(texto):
     """Extrai numero de parcelas do texto (1 se nao encontrar)."""
     if not texto: return 1
-    m = re.search(r'(\d+)\s*[Xx]', texto)
+    m = rx.search(r'(\d+)\s*[Xx]', texto)
     return int(m.group(1)) if m else 1
 
 def aplicar_taxa_credito(valor_bruto, texto, venda, outros_pagtos):
@@ -74,7 +81,7 @@ def aplicar_taxa_credito(valor_bruto, texto, venda, outros_pagtos):
 def to_date(datestr):
     if not datestr: return None
     datestr = datestr.strip()
-    match = re.match(r'(\d{2})/(\d{2})/(\d{4})', datestr)
+    match = rx.match(r'(\d{2})/(\d{2})/(\d{4})', datestr)
     if match: return f'{match.group(3)}-{match.group(2)}-{match.group(1)}'
     return None
 
@@ -83,49 +90,55 @@ def extrair_troca(texto):
     if not texto: return []
     t = texto.upper()
     t = limpar_acentos(t)
-    t = re.sub(r'\s+', ' ', t).strip()
+    t = rx.sub(r'\s+', ' ', t).strip()
     trocas = []
     
     # PADRAO 1: ENTRADA <modelo> R$ <valor> (exclui "DE ENTRADA" e "ENTRADA NO VALOR DE")
-    for m in re.finditer(r'ENTRADA\s+(?!DE\s|NO\s+VALOR)([\w\s]+?)\s+R?[$]?\s*([\d]+\s*[.,]\s*[\d]+)', t):
+    for m in rx.finditer(r'ENTRADA\s+(?!DE\s|NO\s+VALOR)([\w\s]+?)\s+R?[$]?\s*([\d]+\s*[.,]\s*[\d]+)', t):
         modelo = m.group(1).strip()
         valor_str = m.group(2).strip().replace(' ', '').replace('.', '').replace(',', '.')
-        try: valor = float(re.sub(r'[^0-9.]', '', valor_str))
+        try: valor = float(rx.sub(r'[^0-9.]', '', valor_str))
         except: continue
         for word in ['R$', 'REAL', 'REAIS']: modelo = modelo.replace(word, '')
-        modelo = re.sub(r'\s+', ' ', modelo).strip()
+        modelo = rx.sub(r'\s+', ' ', modelo).strip()
         if len(modelo) >= 3 and valor > 0:
             trocas.append({'modelo': modelo, 'valor': valor})
     
     # PADRAO 2: entrou <modelo> na troca por <valor>
-    for m in re.finditer(r'ENTROU\s+(.+?)\s+(SEMINOVO|NOVO|USADO)?\s*NA\s+TROCA\s+POR\s+R?[$]?\s*([\d.,]+)', t):
+    for m in rx.finditer(r'ENTROU\s+(.+?)\s+(SEMINOVO|NOVO|USADO)?\s*NA\s+TROCA\s+POR\s+R?[$]?\s*([\d.,]+)', t):
         modelo = m.group(1).strip()
         if m.group(2): modelo += ' ' + m.group(2)
         valor = parse_real(m.group(3)) or 0
         if len(modelo) >= 3 and valor > 0: trocas.append({'modelo': modelo, 'valor': valor})
     
     # PADRAO 3: <modelo> de entrada no valor de R$ <valor>
-    for m in re.finditer(r'([\w\s]+?)\s+DE\s+ENTRADA\s+NO\s+VALOR\s+DE\s+R?[$]?\s*([\d.,]+)', t):
-        modelo = m.group(1).strip(); valor = parse_real(m.group(2)) or 0
+    # Sufixo primeiro; o modelo e o trecho [\w\s] colado antes dele, lido de tras
+    # para frente ('([\w\s]+?)\s+DE...' era tentado de cada posicao: quadratico)
+    inicio = 0
+    for m in rx.finditer(r'\s+DE\s+ENTRADA\s+NO\s+VALOR\s+DE\s+R?[$]?\s*([\d.,]+)', t):
+        modelo = rx.match(r'[\w\s]*', t[inicio:m.start()][::-1]).group()[::-1]
+        if not modelo: continue
+        inicio = m.end()
+        modelo = modelo.strip(); valor = parse_real(m.group(1)) or 0
         if len(modelo) >= 3 and valor > 0: trocas.append({'modelo': modelo, 'valor': valor})
     
     # PADRAO 4: <valor> (restante|a|referente a|de) entrada (de um|do) <modelo>
-    for m in re.finditer(r'([\d.,]+)\s+(?:RESTANTE\s+)?(?:A\s+)?(?:REFERENTE\s+A\s+)?(?:DE\s+)?ENTRADA\s+(?:DE\s+)?(?:UM\s+)?(?:DO\s+)?(.+?)$', t):
+    for m in rx.finditer(r'(?<![\d.,])([\d.,]+)\s+(?:RESTANTE\s+)?(?:A\s+)?(?:REFERENTE\s+A\s+)?(?:DE\s+)?ENTRADA\s+(?:DE\s+)?(?:UM\s+)?(?:DO\s+)?(.+?)$', t):
         valor = parse_real(m.group(1)) or 0; modelo = m.group(2).strip()
         if len(modelo) >= 3 and valor > 0: trocas.append({'modelo': modelo, 'valor': valor})
     
     # PADRAO 5: removido (PRO e ambíguo - confunde com modelo "14 PRO")
     
     # PADRAO 6: PEGANDO <modelo> POR <valor>
-    for m in re.finditer(r'PEGANDO\s+(?:NA\s+TROCA\s+)?(?:UM\s+)?([\w\s]+?)\s+POR\s+R?[$]?\s*([\d.,]+)', t):
+    for m in rx.finditer(r'PEGANDO\s+(?:NA\s+TROCA\s+)?(?:UM\s+)?([\w\s]+?)\s+POR\s+R?[$]?\s*([\d.,]+)', t):
         modelo = m.group(1).strip(); valor = parse_real(m.group(2)) or 0
         if len(modelo) >= 3 and valor > 0: trocas.append({'modelo': modelo, 'valor': valor})
     
     # PADRAO 7: "/ <modelo> R$ <valor>" (ex: "/ iPhone 16 PRO R$ 4.450,00")
     # Exige separador decimal/milhar no valor para evitar "256GB"
-    for m in re.finditer(r'/\s*([A-Z][\w\s]+?)\s+R?[$]?\s*(\d+(?:[.,]\d+)+)', t):
+    for m in rx.finditer(r'/\s*([A-Z][\w\s]+?)\s+R?[$]?\s*(\d+(?:[.,]\d+)+)', t):
         modelo = m.group(1).strip().upper()
-        modelo = re.sub(r'\s+', ' ', modelo).strip()
+        modelo = rx.sub(r'\s+', ' ', modelo).strip()
         valor = parse_real(m.group(2)) or 0
         palavras_chave = ['PIX', 'CREDITO', 'CARTAO', 'DEBITO', 'DINHEIRO', 'TROCA', 'ENTRADA', 'BOLETO', 'PEGANDO', 'DOWNGRADE']
         if (len(modelo) >= 5 and valor > 0 and 
@@ -160,6 +173,16 @@ VENDEDOR_MAP = {
     'YASMIN': 'e07d4d35-1381-4d4d-914d-8382a7456fdd',
 }
 
+
+def loja_planilha(texto):
+    return texto.upper() or 'CELL'
+
+
+@lru_cache(maxsize=None)
+def vendedor_id_de(vendedor):
+    return VENDEDOR_MAP.get(vendedor.upper(), '')
+
+
 # ====================================================================
 # FUNCOES
 # ====================================================================
@@ -168,7 +191,7 @@ def parse_real(v):
     if not v: return None
     v = v.strip()
     if v.upper() in ('GARANTIA', 'TROCA', 'DEPOSITO'): return None
-    v = re.sub(r'^R[$]\s*', '', v)
+    v = rx.sub(r'^R[$]\s*', '', v)
     v = v.strip()
     if not v: return None
     
@@ -215,8 +238,8 @@ def extrair_forma_pgto(texto):
     """Retorna lista de formas normalizadas"""
     if not texto: return []
     t = limpar_acentos(texto.upper())
-    t = re.sub(r'[^A-Z0-9 /]', ' ', t)
-    t = re.sub(r'\s+', ' ', t).strip()
+    t = rx.sub(r'[^A-Z0-9 /]', ' ', t)
+    t = rx.sub(r'\s+', ' ', t).strip()
     f = []
     if 'PIX' in t: f.append('pix')
     if 'DINHEIRO' in t: f.append('dinheiro')
@@ -246,7 +269,7 @@ def extrair_pagamentos_simples(texto):
     
     t = texto.upper()
     t = limpar_acentos(t)
-    t = re.sub(r'\s+', ' ', t).strip()
+    t = rx.sub(r'\s+', ' ', t).strip()
     
     vals = defaultdict(float)
     
@@ -258,47 +281,47 @@ def extrair_pagamentos_simples(texto):
     # Remove trechos de troca - versao simplificada sem lacos complexos
     t_clean = t
     # ENTRADA <texto> VALOR
-    t_clean = re.sub(r'ENTRADA\s+[\w\s]+R?[$]?[\d]+\s*[.,]\s*[\d]+', ' ', t_clean)
+    t_clean = rx.sub(r'ENTRADA\s+[\w\s]+R?[$]?[\d]+\s*[.,]\s*[\d]+', ' ', t_clean)
     # ENTRADA: <texto> : VALOR
-    t_clean = re.sub(r'ENTRADA[:\s]+[\w\s]+:?\s*R?[$]?[\d.,]+', ' ', t_clean)
+    t_clean = rx.sub(r'ENTRADA[:\s]+[\w\s]+:?\s*R?[$]?[\d.,]+', ' ', t_clean)
     # entrou <texto> na troca por VALOR
-    t_clean = re.sub(r'ENTROU\s+[\w\s]+NA\s+TROCA\s+POR\s+R?[$]?[\d.,]+', ' ', t_clean)
+    t_clean = rx.sub(r'ENTROU\s+[\w\s]+NA\s+TROCA\s+POR\s+R?[$]?[\d.,]+', ' ', t_clean)
     # PEGANDO <texto> (POR|PRO) VALOR
-    t_clean = re.sub(r'PEGANDO\s+[\w\s]+\s+(?:POR|PRO)\s+R?[$]?[\d.,]+', ' ', t_clean)
+    t_clean = rx.sub(r'PEGANDO\s+[\w\s]+\s+(?:POR|PRO)\s+R?[$]?[\d.,]+', ' ', t_clean)
     # VALOR restante/a/referente a entrada de <texto>
-    t_clean = re.sub(r'[\d.,]+\s+(?:RESTANTE\s+)?(?:A\s+)?(?:REFERENTE\s+A\s+)?(?:DE\s+)?ENTRADA\s+[\w\s]+', ' ', t_clean)
+    t_clean = rx.sub(r'(?<![\d.,])[\d.,]+\s+(?:RESTANTE\s+)?(?:A\s+)?(?:REFERENTE\s+A\s+)?(?:DE\s+)?ENTRADA\s+[\w\s]+', ' ', t_clean)
     # um aparelho na troca <texto> por VALOR
-    t_clean = re.sub(r'(?:UM\s+)?APARELHO\s+(?:NA\s+)?TROCA[.,;: ]+[\w\s]+POR\s+R?[$]?[\d.,]+', ' ', t_clean)
+    t_clean = rx.sub(r'(?:UM\s+)?APARELHO\s+(?:NA\s+)?TROCA[.,;: ]+[\w\s]+POR\s+R?[$]?[\d.,]+', ' ', t_clean)
     # Downgrade / <texto> VALOR
-    t_clean = re.sub(r'DOWNGRADE\s*[/\-]?\s*[\w\s]+\s+R?[$]?[\d.,]+', ' ', t_clean)
-    t_clean = re.sub(r'/\s*[A-Z][\w\s]+\s+R?[$]?[\d.,]+', ' ', t_clean)  # remove "/ Modelo R$ valor"
+    t_clean = rx.sub(r'DOWNGRADE\s*[/\-]?\s*[\w\s]+\s+R?[$]?[\d.,]+', ' ', t_clean)
+    t_clean = rx.sub(r'/\s*[A-Z][\w\s]+\s+R?[$]?[\d.,]+', ' ', t_clean)  # remove "/ Modelo R$ valor"
     
-    t_clean = re.sub(r'\s+', ' ', t_clean).strip()
+    t_clean = rx.sub(r'\s+', ' ', t_clean).strip()
     
     # PIX (com suporte a "PIX DE", "PIX NO", "R4" como R$)
     t_clean = t_clean.replace('R4', 'R$')  # typo comum
-    for m in re.finditer(r'(?:PIX\s*(?::)?\s*(?:DE\s+)?R?[$]?\s*(\d+(?:[.,]\d+)*)|(\d+(?:[.,]\d+)*)\s*(?:DE\s+)?PIX|R?[$]?\s*(\d+(?:[.,]\d+)*)\s+(?:DE|NO)?\s*PIX)', t_clean):
+    for m in rx.finditer(r'(?:PIX\s*(?::)?\s*(?:DE\s+)?R?[$]?\s*(\d+(?:[.,]\d+)*)|(?<!\d)(?<!\d[.,])(\d+(?:[.,]\d+)*)\s*(?:DE\s+)?PIX|R?[$]?\s*(?<!\d)(?<!\d[.,])(\d+(?:[.,]\d+)*)\s+(?:DE|NO)?\s*PIX)', t_clean):
         val_str = next((g for g in m.groups() if g), None)
         if val_str:
             v = parse_real(val_str)
             if v: vals['pix'] += v
     
     # DINHEIRO
-    for m in re.finditer(r'(?:DINHEIRO\s*(?::)?\s*R?[$]?\s*(\d+(?:[.,]\d+)*)|(\d+(?:[.,]\d+)*)\s*(?:DE\s+)?DINHEIRO)', t_clean):
+    for m in rx.finditer(r'(?:DINHEIRO\s*(?::)?\s*R?[$]?\s*(\d+(?:[.,]\d+)*)|(?<!\d)(?<!\d[.,])(\d+(?:[.,]\d+)*)\s*(?:DE\s+)?DINHEIRO)', t_clean):
         val_str = next((g for g in m.groups() if g), None)
         if val_str:
             v = parse_real(val_str)
             if v: vals['dinheiro'] += v
     
     # CREDITO: valor antes ou depois do tipo, com \b para evitar "1X" como valor
-    for m in re.finditer(r'(?:CREDITO|CRED|CARTAO)\s*(?::)?\s*(?:EM\s+\d+X\s+)?R?[$]?\s*(\d+(?:[.,]\d+)*)(?!\S?X)|(\d+(?:[.,]\d+)*)\b\s*(?:EM\s+\d+X\s+)?(?:NO\s+)?(?:CREDITO|CARTAO)', t_clean):
+    for m in rx.finditer(r'(?:CREDITO|CRED|CARTAO)\s*(?::)?\s*(?:EM\s+\d+X\s+)?R?[$]?\s*(\d+(?:[.,]\d+)*)(?!\S?X)|(?<!\d)(?<!\d[.,])(\d+(?:[.,]\d+)*)\b\s*(?:EM\s+\d+X\s+)?(?:NO\s+)?(?:CREDITO|CARTAO)', t_clean):
         val_str = next((g for g in m.groups() if g), None)
         if val_str:
             v = parse_real(val_str)
             if v: vals['cartao_credito'] += v
     
     # DEBITO
-    for m in re.finditer(r'(?:DEBITO\s*(?::)?\s*R?[$]?\s*(\d+(?:[.,]\d+)*)|(\d+(?:[.,]\d+)*)\s*(?:DE\s+)?DEBITO)', t_clean):
+    for m in rx.finditer(r'(?:DEBITO\s*(?::)?\s*R?[$]?\s*(\d+(?:[.,]\d+)*)|(?<!\d)(?<!\d[.,])(\d+(?:[.,]\d+)*)\s*(?:DE\s+)?DEBITO)', t_clean):
         val_str = next((g for g in m.groups() if g), None)
         if val_str:
             v = parse_real(val_str)
@@ -307,7 +330,7 @@ def extrair_pagamentos_simples(texto):
     # PARCELAS sem credito explicito: "<valor> em <N>x" = cartao_credito
     # (evita dupla contagem: NAO aplica se ja extraiu algo no credito)
     if vals.get('cartao_credito', 0) == 0:
-        for m in re.finditer(r'(\d+(?:[.,]\d+)*)\s+EM\s+\d+X', t_clean):
+        for m in rx.finditer(r'(?<!\d)(?<!\d[.,])(\d+(?:[.,]\d+)*)\s+EM\s+\d+X', t_clean):
             v = parse_real(m.group(1))
             if v and v > 0:
                 vals['cartao_credito'] += v
@@ -315,6 +338,109 @@ def extrair_pagamentos_simples(texto):
     return dict(vals)
 
 
+def alocar_pagamentos(r, pagtos, formas, forma_orig, valor_venda):
+    """
+    Venda normal: valores extraidos do texto -> campos de pagamento de `r`,
+    com fallback de forma unica sem valor, taxa do credito e arredondamento.
+    Preenche soma_pagamentos e diferenca.
+    """
+    r.pix = pagtos.get('pix', 0)
+    r.dinheiro = pagtos.get('dinheiro', 0)
+    r.cartao_credito = pagtos.get('cartao_credito', 0)
+    r.cartao_debito = pagtos.get('cartao_debito', 0)
+    
+    soma = r.pix + r.dinheiro + r.cartao_credito + r.cartao_debito + r.troca_aparelho
+    
+    # Fallback: quando uma unica forma de pagamento e mencionada sem valor,
+    # usar o valor total da venda
+    if soma == 0 and formas:
+        # Apenas formas que implicam pagamento (excluir troca que ja foi extraida)
+        formas_pagto = [f for f in formas if f not in ('troca_aparelho', 'pagamento_junto', 'garantia', 'outros')]
+        if len(formas_pagto) == 1:
+            f = formas_pagto[0]
+            if f == 'pix':
+                r.pix = valor_venda
+            elif f == 'dinheiro':
+                r.dinheiro = valor_venda
+            elif f in ('cartao_credito',):
+                r.cartao_credito = valor_venda
+            elif f in ('cartao_debito',):
+                r.cartao_debito = valor_venda
+            soma = valor_venda
+        elif not formas_pagto and len(formas) == 1 and formas[0] == 'outros':
+            # "outros" sem valor: assumir PIX
+            r.pix = valor_venda
+            soma = valor_venda
+    
+    # Aplicar taxa de cartao quando credito > venda
+    cred = float(r.cartao_credito)
+    if cred > 0 and abs(valor_venda - soma) > 0.01:
+        outros = soma - cred
+        taxa_result = aplicar_taxa_credito(cred, forma_orig, valor_venda, outros)
+        if taxa_result:
+            liquido, parcelas, bandeira, taxa_pct, arred = taxa_result
+            # Ajustar o liquido para absorver arredondamento < R$ 1
+            total_com_liquido = round(liquido + outros, 2)
+            diff_apos_taxa = round(valor_venda - total_com_liquido, 2)
+            if abs(diff_apos_taxa) < 1:
+                liquido = round(liquido + diff_apos_taxa, 2)
+                arred = 0
+            r.cartao_credito = liquido
+            r.taxa_aplicada = f'{bandeira} {parcelas}x (taxa {taxa_pct:.1f}%)'
+            if abs(arred) > 0:
+                r.arredondamento = arred
+            soma = round(liquido + outros, 2)
+    
+    # Arredondamento geral: se diff < R$ 2, ajustar no maior pagamento
+    diff_atual = round(valor_venda - soma, 2)
+    if 0.01 < abs(diff_atual) < 2:
+        maiores = [
+            ('cartao_credito', float(r.cartao_credito)),
+            ('pix', float(r.pix)),
+            ('dinheiro', float(r.dinheiro)),
+            ('cartao_debito', float(r.cartao_debito)),
+            ('troca_aparelho', float(r.troca_aparelho)),
+        ]
+        maior_campo, maior_valor = max(maiores, key=lambda x: x[1])
+        if maior_valor > 0:
+            setattr(r, maior_campo, round(maior_valor + diff_atual, 2))
+            r.arredondamento = diff_atual
+            soma = round(soma + diff_atual, 2)
+    
+    r.soma_pagamentos = round(soma, 2)
+    r.diferenca = round(valor_venda - soma, 2)
+
+
+# ====================================================================
+# CAMINHO RAPIDO: TEXTOS DE PAGAMENTO SEM VALOR
+# ====================================================================
+# ~1/3 das linhas tem so o nome da forma ('PIX', 'Dinheiro', 'Cartao de credito').
+# Sem digito nao ha troca nem valor a extrair: formas saem do dicionario e a
+# linha nem passa pelo regex. Texto fora da tabela segue o caminho normal.
+
+TEXTOS_SEM_VALOR = [
+    '', 'PIX', 'DINHEIRO', 'CARTAO', 'CREDITO', 'DEBITO', 'GARANTIA',
+    'CARTAO DE CREDITO', 'CARTAO DE DEBITO', 'CARTAO CREDITO', 'CARTAO DEBITO',
+    'CREDITO A VISTA', 'DEBITO A VISTA', 'PIX NA LOJA', 'PIX NA CONTA',
+    'PIX / DINHEIRO', 'PIX E DINHEIRO', 'PIX / CARTAO', 'PIX E CARTAO',
+    'PIX / CREDITO', 'PIX E CREDITO', 'PIX / DEBITO', 'PIX E DEBITO',
+    'DINHEIRO / CARTAO', 'DINHEIRO E CARTAO', 'DINHEIRO / CREDITO', 'DINHEIRO / DEBITO',
+]
+CHAVE_MAX = 40  # texto maior nunca esta na tabela
+
+
+def chave_pagto(texto):
+    """'Pix.' / ' pix ' / 'PÍX' -> 'PIX' (sem regex); None se comprido demais."""
+    if len(texto) > CHAVE_MAX:
+        return None
+    t = limpar_acentos(texto.upper())
+    return ' '.join(''.join(c if c.isalnum() else ' ' for c in t).split())
+
+
+FORMAS_SEM_VALOR = {chave_pagto(t): tuple(extrair_forma_pgto(t)) for t in TEXTOS_SEM_VALOR}
+assert not any(c.isdigit() for k in FORMAS_SEM_VALOR for c in k)
+
+
 # ====================================================================
 # IDENTIFICAR GRUPOS DE PAGAMENTO JUNTO
 # ====================================================================
@@ -329,15 +455,15 @@ def detectar_grupos_junto(rows):
     grupo_id = 0
     
     for i, row in enumerate(rows):
-        texto = row.get('FORMA DE PAGAMENTO', '').upper()
-        data = row.get('DATA', '').strip()
-        loja = row.get('LOJA', '').strip().upper() or 'CELL'
-        vendedor = row.get('VENDEDOR', '').strip().title()
-        valor = parse_real(row.get('VALOR DE VENDA', ''))
-        modelo = row.get('MODELO', '').strip()
+        texto = row.forma.upper()
+        data = row.data
+        loja = LOJA.normalizar(row.loja, loja_planilha)
+        vendedor = VENDEDOR.normalizar(row.vendedor, str.title)
+        valor = parse_real(row.valor_venda)
+        modelo = row.modelo
         
         # Detectar se faz parte de grupo
-        m_dev = re.search(r'APARELHO\s+(\d+)', texto)
+        m_dev = rx.search(r'APARELHO\s+(\d+)', texto)
         is_junto = 'PAGAMENTO JUNTO' in texto or 'PIX JUNTO' in texto or bool(m_dev)
         
         if is_junto and m_dev:
@@ -373,12 +499,12 @@ def detectar_grupos_junto(rows):
 INPUT = os.path.join(ROOT, 'venda_aparelhos.csv')
 OUTPUT = os.path.join(ROOT, 'scripts', 'vendas_final.csv')
 
-with open(INPUT, 'r', encoding='utf-8') as f:
-    reader = csv.DictReader(f)
-    rows = list(reader)
+perfilador.etapa('leitura')
+rows = ler_vendas(INPUT)
 
 print(f'Lendo {len(rows)} linhas...')
 
+perfilador.etapa('normalizacao')
 grupos = detectar_grupos_junto(rows)
 print(f'Grupos de pagamento junto detectados: {len(grupos)}')
 
@@ -388,36 +514,26 @@ for g in grupos:
     for d in g['devices']:
         grupo_por_idx[d['csv_idx']] = g
 
-fieldnames = [
-    'orig_linha', 'data', 'modelo', 'imei',
-    'valor_venda', 'brinde', 'custo', 'lucro',
-    'pix', 'dinheiro', 'cartao_credito', 'cartao_debito',
-    'troca_aparelho', 'soma_pagamentos', 'diferenca',
-    'formas_pgto', 'tem_troca', 'modelo_troca', 'valor_troca',
-    'pagto_junto', 'pagto_junto_grupo', 'pagto_junto_total', 'pagto_junto_restante',
-    'vendedor', 'vendedor_id', 'loja', 'loja_id', 'estado', 'observacao',
-    'precisa_revisao', 'motivo_revisao', 'entendimento',
-]
-
 estatisticas = {
     'total': 0, 'trocas': 0, 'junto': 0,
     'sem_imei': 0, 'sem_vendedor': 0,
-    'diferenca_total': 0, 'diferenca_count': 0,
+    'diferenca_total': 0, 'diferenca_count': 0, 'nao_analisado': 0,
+    'caminho_rapido': 0,
 }
 
 results = []
 
 for i, row in enumerate(rows):
-    data = row.get('DATA', '').strip()
-    modelo = row.get('MODELO', '').strip()
-    imei = row.get('IMEI', '').strip().replace(' ', '')
-    valor_venda = parse_real(row.get('VALOR DE VENDA', ''))
-    brinde = parse_real(row.get('BRINDE', '')) or 0
-    custo = parse_real(row.get('CUSTO APARELHO', '')) or 0
-    lucro = parse_real(row.get('LUCRO', '')) or 0
-    vendedor = row.get('VENDEDOR', '').strip().title()
-    loja = row.get('LOJA', '').strip().upper() or 'CELL'
-    forma_orig = row.get('FORMA DE PAGAMENTO', '').strip()
+    data = row.data
+    modelo = row.modelo
+    imei = row.imei.replace(' ', '')
+    valor_venda = parse_real(row.valor_venda)
+    brinde = parse_real(row.brinde) or 0
+    custo = parse_real(row.custo) or 0
+    lucro = parse_real(row.lucro) or 0
+    vendedor = VENDEDOR.normalizar(row.vendedor, str.title)   # uma vez por texto distinto
+    loja = LOJA.normalizar(row.loja, loja_planilha)
+    forma_orig = row.forma
     
     # Skip non-monetary
     if valor_venda is None:
@@ -427,31 +543,46 @@ for i, row in enumerate(rows):
     if not imei: estatisticas['sem_imei'] += 1
     
     loja_id = LOJA_MAP.get(loja)
-    vendedor_id = VENDEDOR_MAP.get(vendedor.upper(), '')
+    vendedor_id = vendedor_id_de(vendedor)
     if not vendedor_id:
         vendedor_id = '97f12885-87ad-426a-8bbb-656889d82e10'  # Ronald fallback
         estatisticas['sem_vendedor'] += 1
     
     # Estado
-    m_upper = modelo.upper()
-    if 'NOVO' in m_upper and 'SEMINOVO' not in m_upper and 'LACRADO' not in m_upper: estado = 'novo'
-    elif 'LACRADO' in m_upper: estado = 'novo'
-    elif 'USADO' in m_upper: estado = 'usado'
-    else: estado = 'seminovo'
-    
-    # Formas
-    formas = extrair_forma_pgto(forma_orig)
+    estado = detectar_estado(modelo)
+    
+    # Formas (texto conhecido sem valor: dicionario, sem regex)
+    rapido = FORMAS_SEM_VALOR.get(chave_pagto(forma_orig))
+    if rapido is not None:
+        formas = list(rapido)
+        estatisticas['caminho_rapido'] += 1
+    else:
+        formas = extrair_forma_pgto(forma_orig)
     tem_troca = 'troca_aparelho' in formas
     is_junto = 'pagamento_junto' in formas
     
-    # Trocas (sempre extrair, mesmo se R$ 0)
-    trocas = extrair_troca(forma_orig)
-    # Detectar troca R$ 0 separadamente (valor 0 nao retorna de extrair_troca)
-    tem_entrada_zero = bool(re.search(r'ENTRADA[:\s]+.+?:\s*0[.,]00', limpar_acentos(forma_orig.upper())))
-    if tem_entrada_zero:
-        m = re.search(r'ENTRADA[:\s]+(.+?)\s*:\s*0[.,]00', limpar_acentos(forma_orig.upper()))
-        modelo_troca_zero = m.group(1).strip() if m else '(sem modelo)'
-        trocas.append({'modelo': modelo_troca_zero + ' (R$ 0)', 'valor': 0})
+    # Parse do texto com prazo: texto patologico vai para revisao em vez de travar o lote
+    junto_grupo = is_junto and i in grupo_por_idx
+    nao_analisado = ''
+    try:
+        with rx.prazo(forma_orig):
+            if rapido is not None:
+                # sem digito no texto: nada de troca nem valor a extrair
+                trocas, pagtos = [], {}
+            else:
+                # Trocas (sempre extrair, mesmo se R$ 0)
+                trocas = extrair_troca(forma_orig)
+                # Detectar troca R$ 0 separadamente (valor 0 nao retorna de extrair_troca)
+                tem_entrada_zero = bool(rx.search(r'ENTRADA[:\s]+.+?:\s*0[.,]00', limpar_acentos(forma_orig.upper())))
+                if tem_entrada_zero:
+                    m = rx.search(r'ENTRADA[:\s]+(.+?)\s*:\s*0[.,]00', limpar_acentos(forma_orig.upper()))
+                    modelo_troca_zero = m.group(1).strip() if m else '(sem modelo)'
+                    trocas.append({'modelo': modelo_troca_zero + ' (R$ 0)', 'valor': 0})
+                pagtos = {} if junto_grupo else extrair_pagamentos_simples(forma_orig)
+    except rx.PrazoEsgotado as e:
+        trocas, pagtos = [], {}
+        nao_analisado = f'Texto de pagamento nao analisado ({e})'
+        estatisticas['nao_analisado'] += 1
     
     modelo_troca = '; '.join(t['modelo'] for t in trocas)
     valor_troca = sum(t['valor'] for t in trocas)
@@ -460,46 +591,37 @@ for i, row in enumerate(rows):
     # ================================================================
     # EXTRACAO DE PAGAMENTOS
     # ================================================================
-    r = {
-        'orig_linha': i + 2, 'data': data, 'modelo': modelo, 'imei': imei or '',
-        'valor_venda': valor_venda, 'brinde': brinde, 'custo': custo, 'lucro': lucro,
-        'pix': 0, 'dinheiro': 0, 'cartao_credito': 0, 'cartao_debito': 0,
-        'troca_aparelho': valor_troca,
-        'soma_pagamentos': 0, 'diferenca': 0,
-        'formas_pgto': '+'.join(formas),
-        'tem_troca': 'SIM' if trocas else 'NAO',
-        'modelo_troca': modelo_troca,
-        'valor_troca': valor_troca,
-        'pagto_junto': 'SIM' if is_junto else 'NAO',
-        'pagto_junto_grupo': '',
-        'pagto_junto_total': '',
-        'pagto_junto_restante': '',
-        'vendedor': vendedor, 'vendedor_id': vendedor_id,
-        'loja': loja, 'loja_id': loja_id or '',
-        'estado': estado,
-        'observacao': '',
-        'precisa_revisao': '',
-        'motivo_revisao': '',
-        'entendimento': '',
-    }
-    
-    if is_junto and i in grupo_por_idx:
+    r = VendaFinal(
+        orig_linha=i + 2, data=data, modelo=modelo, imei=imei or '',
+        valor_venda=valor_venda, brinde=brinde, custo=custo, lucro=lucro,
+        troca_aparelho=valor_troca,
+        formas_pgto='+'.join(formas),
+        tem_troca='SIM' if trocas else 'NAO',
+        modelo_troca=modelo_troca,
+        valor_troca=valor_troca,
+        pagto_junto='SIM' if is_junto else 'NAO',
+        vendedor=vendedor, vendedor_id=vendedor_id,
+        loja=loja, loja_id=loja_id or '',
+        estado=estado,
+    )
+    
+    if junto_grupo:
         # PAGAMENTO JUNTO: ratear o compartilhado pelo que falta em cada device
         estatisticas['junto'] += 1
         g = grupo_por_idx[i]
         dev = next((d for d in g['devices'] if d['csv_idx'] == i), None)
         dev_num = dev['dev_num'] if dev else 0
         
-        r['pagto_junto_grupo'] = g['grupo_id']
-        r['pagto_junto_total'] = g['total']
-        r['pagto_junto_restante'] = 0
+        r.pagto_junto_grupo = g['grupo_id']
+        r.pagto_junto_total = g['total']
+        r.pagto_junto_restante = 0
         
-        r['observacao'] = f'Pagto junto (Aparelho {dev_num}/{len(g["devices"])}, total grupo R$ {g["total"]:,.0f})'
+        r.observacao = f'Pagto junto (Aparelho {dev_num}/{len(g["devices"])}, total grupo R$ {g["total"]:,.0f})'
         
         # Determinar tipo de pagamento compartilhado
         tipo_shared = 'pix'
         for d in g['devices']:
-            texto = rows[d['csv_idx']].get('FORMA DE PAGAMENTO', '').upper()
+            texto = rows[d['csv_idx']].forma.upper()
             texto = limpar_acentos(texto)
             if 'CREDITO' in texto or 'CARTAO' in texto:
                 tipo_shared = 'cartao_credito'
@@ -512,114 +634,51 @@ for i, row in enumerate(rows):
         # Alocar ao device o que falta: venda - entrada
         falta = max(0, valor_venda - valor_troca)
         if falta > 0:
-            r[tipo_shared] = falta
+            setattr(r, tipo_shared, falta)
         
-        soma = r['pix'] + r['dinheiro'] + r['cartao_credito'] + r['cartao_debito'] + r['troca_aparelho']
-        r['soma_pagamentos'] = round(soma, 2)
-        r['diferenca'] = round(valor_venda - soma, 2)
+        soma = r.pix + r.dinheiro + r.cartao_credito + r.cartao_debito + r.troca_aparelho
+        r.soma_pagamentos = round(soma, 2)
+        r.diferenca = round(valor_venda - soma, 2)
         
     else:
         # VENDA NORMAL
-        pagtos = extrair_pagamentos_simples(forma_orig)
-        r['pix'] = pagtos.get('pix', 0)
-        r['dinheiro'] = pagtos.get('dinheiro', 0)
-        r['cartao_credito'] = pagtos.get('cartao_credito', 0)
-        r['cartao_debito'] = pagtos.get('cartao_debito', 0)
-        
-        soma = r['pix'] + r['dinheiro'] + r['cartao_credito'] + r['cartao_debito'] + r['troca_aparelho']
-        
-        # Fallback: quando uma unica forma de pagamento e mencionada sem valor,
-        # usar o valor total da venda
-        if soma == 0 and formas:
-            # Apenas formas que implicam pagamento (excluir troca que ja foi extraida)
-            formas_pagto = [f for f in formas if f not in ('troca_aparelho', 'pagamento_junto', 'garantia', 'outros')]
-            if len(formas_pagto) == 1:
-                f = formas_pagto[0]
-                if f == 'pix':
-                    r['pix'] = valor_venda
-                elif f == 'dinheiro':
-                    r['dinheiro'] = valor_venda
-                elif f in ('cartao_credito',):
-                    r['cartao_credito'] = valor_venda
-                elif f in ('cartao_debito',):
-                    r['cartao_debito'] = valor_venda
-                soma = valor_venda
-            elif not formas_pagto and len(formas) == 1 and formas[0] == 'outros':
-                # "outros" sem valor: assumir PIX
-                r['pix'] = valor_venda
-                soma = valor_venda
-        
-        # Aplicar taxa de cartao quando credito > venda
-        cred = float(r['cartao_credito'])
-        if cred > 0 and abs(valor_venda - soma) > 0.01:
-            outros = soma - cred
-            taxa_result = aplicar_taxa_credito(cred, forma_orig, valor_venda, outros)
-            if taxa_result:
-                liquido, parcelas, bandeira, taxa_pct, arred = taxa_result
-                # Ajustar o liquido para absorver arredondamento < R$ 1
-                total_com_liquido = round(liquido + outros, 2)
-                diff_apos_taxa = round(valor_venda - total_com_liquido, 2)
-                if abs(diff_apos_taxa) < 1:
-                    liquido = round(liquido + diff_apos_taxa, 2)
-                    arred = 0
-                r['cartao_credito'] = liquido
-                r['_taxa_aplicada'] = f'{bandeira} {parcelas}x (taxa {taxa_pct:.1f}%)'
-                if abs(arred) > 0:
-                    r['_arredondamento'] = arred
-                soma = round(liquido + outros, 2)
-        
-        # Arredondamento geral: se diff < R$ 2, ajustar no maior pagamento
-        diff_atual = round(valor_venda - soma, 2)
-        if 0.01 < abs(diff_atual) < 2:
-            maiores = [
-                ('cartao_credito', float(r['cartao_credito'])),
-                ('pix', float(r['pix'])),
-                ('dinheiro', float(r['dinheiro'])),
-                ('cartao_debito', float(r['cartao_debito'])),
-                ('troca_aparelho', float(r['troca_aparelho'])),
-            ]
-            maior_campo, maior_valor = max(maiores, key=lambda x: x[1])
-            if maior_valor > 0:
-                r[maior_campo] = round(maior_valor + diff_atual, 2)
-                r['_arredondamento'] = diff_atual
-                soma = round(soma + diff_atual, 2)
-        
-        r['soma_pagamentos'] = round(soma, 2)
-        r['diferenca'] = round(valor_venda - soma, 2)
+        alocar_pagamentos(r, pagtos, formas, forma_orig, valor_venda)
     
-    estatisticas['diferenca_total'] += abs(r['diferenca'])
-    if abs(r['diferenca']) > 0.01: estatisticas['diferenca_count'] += 1
+    estatisticas['diferenca_total'] += abs(r.diferenca)
+    if abs(r.diferenca) > 0.01: estatisticas['diferenca_count'] += 1
     
     # Observacao para angel
     if vendedor.upper() == 'ANGEL':
-        r['observacao'] = (r['observacao'] + '; ' if r['observacao'] else '') + 'Vendedor Angel - pendente ID real'
+        r.observacao = (r.observacao + '; ' if r.observacao else '') + 'Vendedor Angel - pendente ID real'
     if not imei:
-        r['observacao'] = (r['observacao'] + '; ' if r['observacao'] else '') + 'Sem IMEI'
+        r.observacao = (r.observacao + '; ' if r.observacao else '') + 'Sem IMEI'
     if trocas and valor_troca == 0:
-        r['observacao'] = (r['observacao'] + '; ' if r['observacao'] else '') + 'Troca R$ 0'
+        r.observacao = (r.observacao + '; ' if r.observacao else '') + 'Troca R$ 0'
+    if nao_analisado:
+        r.observacao = (r.observacao + '; ' if r.observacao else '') + nao_analisado
     
     # Determinar se precisa revisao
     motivos = []
-    diff = float(r['diferenca'])
+    diff = float(r.diferenca)
     if abs(diff) > 0.01:
         # Montar descricao do que foi extraido
         def fmt(v):
             f = float(v)
             return f'{f:.0f}' if f == int(f) else f'{f:.2f}'
         partes_extraidas = []
-        if float(r['pix']) > 0: partes_extraidas.append(f'{fmt(r["pix"])} pix')
-        if float(r['dinheiro']) > 0: partes_extraidas.append(f'{fmt(r["dinheiro"])} dinheiro')
-        if float(r['cartao_credito']) > 0: partes_extraidas.append(f'{fmt(r["cartao_credito"])} credito')
-        if float(r['cartao_debito']) > 0: partes_extraidas.append(f'{fmt(r["cartao_debito"])} debito')
-        if float(r['troca_aparelho']) > 0: partes_extraidas.append(f'{fmt(r["troca_aparelho"])} troca')
+        if float(r.pix) > 0: partes_extraidas.append(f'{fmt(r.pix)} pix')
+        if float(r.dinheiro) > 0: partes_extraidas.append(f'{fmt(r.dinheiro)} dinheiro')
+        if float(r.cartao_credito) > 0: partes_extraidas.append(f'{fmt(r.cartao_credito)} credito')
+        if float(r.cartao_debito) > 0: partes_extraidas.append(f'{fmt(r.cartao_debito)} debito')
+        if float(r.troca_aparelho) > 0: partes_extraidas.append(f'{fmt(r.troca_aparelho)} troca')
         
-        venda_val = float(r['valor_venda'])
-        soma_val = float(r['soma_pagamentos'])
+        venda_val = float(r.valor_venda)
+        soma_val = float(r.soma_pagamentos)
         
-        if r['pagto_junto'] == 'SIM':
-            gid = r['pagto_junto_grupo']
-            total_grupo = float(r['pagto_junto_total'] or 0)
-            restante = float(r['pagto_junto_restante'] or 0)
+        if r.pagto_junto == 'SIM':
+            gid = r.pagto_junto_grupo
+            total_grupo = float(r.pagto_junto_total or 0)
+            restante = float(r.pagto_junto_restante or 0)
             extraido = ' + '.join(partes_extraidas) if partes_extraidas else 'nada'
             motivos.append(
                 f'Pagto grupo {gid} (total R$ {total_grupo:.0f}): '
@@ -645,21 +704,21 @@ for i, row in enumerate(rows):
                     f'→ falta R$ {falta:.0f} sem valor explicito no texto'
                 )
             else:
-                formas = r['formas_pgto'].replace('+', ' + ')
+                formas = r.formas_pgto.replace('+', ' + ')
                 motivos.append(
                     f'Nada extraiu de {venda_val:.0f} '
                     f'→ formas "{formas}" sem valores no texto'
                 )
     
-    if r.get('observacao'):
-        for obs_item in r['observacao'].split('; '):
+    if r.observacao:
+        for obs_item in r.observacao.split('; '):
             obs_item = obs_item.strip()
             # Observacao de junto com diff=0 nao precisa revisao
             if obs_item and obs_item not in motivos and 'Pagto junto' not in obs_item:
                 motivos.append(obs_item)
     
-    r['precisa_revisao'] = 'SIM' if motivos else 'NAO'
-    r['motivo_revisao'] = '; '.join(motivos)
+    r.precisa_revisao = 'SIM' if motivos else 'NAO'
+    r.motivo_revisao = '; '.join(motivos)
     
     # Gerar entendimento
     def fmt(v):
@@ -667,57 +726,55 @@ for i, row in enumerate(rows):
         return f'{f:.0f}' if f == int(f) else f'{f:.2f}'
     
     partes = []
-    if float(r['pix']) > 0: partes.append(f'{fmt(r["pix"])} pix')
-    if float(r['dinheiro']) > 0: partes.append(f'{fmt(r["dinheiro"])} dinheiro')
-    if float(r['cartao_credito']) > 0:
-        cred_part = f'{fmt(r["cartao_credito"])} credito'
-        if r.get('_taxa_aplicada'):
-            cred_part += f' ({r["_taxa_aplicada"]})'
+    if float(r.pix) > 0: partes.append(f'{fmt(r.pix)} pix')
+    if float(r.dinheiro) > 0: partes.append(f'{fmt(r.dinheiro)} dinheiro')
+    if float(r.cartao_credito) > 0:
+        cred_part = f'{fmt(r.cartao_credito)} credito'
+        if r.taxa_aplicada:
+            cred_part += f' ({r.taxa_aplicada})'
         partes.append(cred_part)
-    if float(r['cartao_debito']) > 0: partes.append(f'{fmt(r["cartao_debito"])} debito')
-    if float(r['troca_aparelho']) > 0: partes.append(f'{fmt(r["troca_aparelho"])} troca')
+    if float(r.cartao_debito) > 0: partes.append(f'{fmt(r.cartao_debito)} debito')
+    if float(r.troca_aparelho) > 0: partes.append(f'{fmt(r.troca_aparelho)} troca')
     
-    if r['pagto_junto'] == 'SIM' and i in grupo_por_idx:
+    if r.pagto_junto == 'SIM' and i in grupo_por_idx:
         g = grupo_por_idx[i]
         linhas_grupo = sorted([d['csv_idx'] + 2 for d in g['devices']])
         linhas_str = ' e '.join(str(l) for l in linhas_grupo)
         total_grupo = float(g['total'])
         if partes:
             entendimento = (
-                f'grupo {g["grupo_id"]} ({linhas_str}): valor da venda = {float(r["valor_venda"]):.0f}'
+                f'grupo {g["grupo_id"]} ({linhas_str}): valor da venda = {float(r.valor_venda):.0f}'
                 f' | {" + ".join(partes)}'
-                f' = {float(r["soma_pagamentos"]):.0f}'
+                f' = {float(r.soma_pagamentos):.0f}'
                 f' | grupo R$ {total_grupo:.0f}'
             )
         else:
-            entrada = float(r['troca_aparelho'])
-            restante = float(r['pagto_junto_restante'] or 0)
+            entrada = float(r.troca_aparelho)
+            restante = float(r.pagto_junto_restante or 0)
             entendimento = (
                 f'grupo {g["grupo_id"]}: linhas {linhas_str}'
                 f' | total R$ {total_grupo:.0f}'
                 f' | entrada R$ {fmt(entrada)}'
                 f' | compartilhado R$ {fmt(restante)}'
             )
-    elif abs(float(r['diferenca'])) <= 0.01 and partes:
-        entendimento = f"valor da venda = {float(r['valor_venda']):.0f} | {' + '.join(partes)}"
-        if float(r['brinde']) > 0:
-            entendimento += f" | brinde {fmt(r['brinde'])}"
-        if r.get('_arredondamento'):
-            entendimento += f" | arredondamento R$ {fmt(r['_arredondamento'])}"
+    elif abs(float(r.diferenca)) <= 0.01 and partes:
+        entendimento = f"valor da venda = {float(r.valor_venda):.0f} | {' + '.join(partes)}"
+        if float(r.brinde) > 0:
+            entendimento += f" | brinde {fmt(r.brinde)}"
+        if r.arredondamento:
+            entendimento += f" | arredondamento R$ {fmt(r.arredondamento)}"
     else:
         entendimento = ''
     
-    r['entendimento'] = entendimento
+    r.entendimento = entendimento
     
     results.append(r)
 
 # ====================================================================
 # SALVAR CSV
 # ====================================================================
-with open(OUTPUT, 'w', newline='', encoding='utf-8-sig') as f:
-    w = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
-    w.writeheader()
-    w.writerows(results)
+perfilador.etapa('gravacao')
+gravar_csv(OUTPUT, results, VendaFinal.CAMPOS, encoding='utf-8-sig')
 
 print(f'\nCSV salvo: {OUTPUT}')
 print(f'  Registros: {estatisticas["total"]}')
@@ -727,18 +784,22 @@ print(f'  Sem IMEI: {estatisticas["sem_imei"]}')
 print(f'  Angel (fallback): {estatisticas["sem_vendedor"]}')
 print(f'  Com diferenca > R$ 0,01: {estatisticas["diferenca_count"]}/{estatisticas["total"]}')
 print(f'  Diferenca total acumulada: R$ {estatisticas["diferenca_total"]:,.2f}')
+print(f'  Pagamento pelo caminho rapido (sem regex): {estatisticas["caminho_rapido"]}/{estatisticas["total"]} '
+      f'({100 * estatisticas["caminho_rapido"] / max(estatisticas["total"], 1):.1f}%)')
+if estatisticas['nao_analisado']:
+    print(f'  Pagamento nao analisado (prazo/tamanho, regex {rx.MOTOR}): {estatisticas["nao_analisado"]}')
 print()
 
 # Resumo de pagamentos
 totals = defaultdict(float)
 for r in results:
     for k in ['pix', 'dinheiro', 'cartao_credito', 'cartao_debito', 'troca_aparelho']:
-        totals[k] += r[k]
+        totals[k] += getattr(r, k)
 print('--- SOMATORIO DOS PAGAMENTOS ---')
 for k, v in sorted(totals.items(), key=lambda x: -x[1]):
     print(f'  {k:20s}: R$ {v:>10,.2f}')
 total_pagtos = sum(totals.values())
-total_vendas = sum(r['valor_venda'] for r in results)
+total_vendas = sum(r.valor_venda for r in results)
 print(f'  {"TOTAL PAGAMENTOS":20s}: R$ {total_pagtos:>10,.2f}')
 print(f'  {"TOTAL VENDAS":20s}: R$ {total_vendas:>10,.2f}')
 print(f'  {"DIFERENCA":20s}: R$ {total_vendas - total_pagtos:>10,.2f} ({((total_vendas-total_pagtos)/total_vendas*100):.1f}%)')
@@ -747,34 +808,31 @@ print(f'  {"DIFERENCA":20s}: R$ {total_vendas - total_pagtos:>10,.2f} ({((total_
 # ATUALIZAR CSV ORIGINAL COM COLUNA DE REVISAO
 # ====================================================================
 ORIG_OUTPUT = os.path.join(ROOT, 'venda_aparelhos_com_revisao.csv')
-with open(INPUT, 'r', encoding='utf-8') as f:
-    orig_rows = list(csv.DictReader(f))
+with open(INPUT, 'r', encoding='utf-8', newline='') as f:
+    orig = csv.reader(f)
+    orig_cab = next(orig)
+    orig_rows = [row for row in orig if row]
 
 # Build index by orig_linha
 rev_by_linha = {}
 for r in results:
-    rev_by_linha[int(r['orig_linha'])] = r
-
-orig_fieldnames = list(orig_rows[0].keys()) + ['PRECISA_REVISAO', 'MOTIVO_REVISAO', 'ENTENDIMENTO']
+    rev_by_linha[int(r.orig_linha)] = r
 
+n_cols = len(orig_cab)
 with open(ORIG_OUTPUT, 'w', newline='', encoding='utf-8-sig') as f:
-    w = csv.DictWriter(f, fieldnames=orig_fieldnames, extrasaction='ignore')
-    w.writeheader()
+    w = csv.writer(f)
+    w.writerow(orig_cab + ['PRECISA_REVISAO', 'MOTIVO_REVISAO', 'ENTENDIMENTO'])
     for i, row in enumerate(orig_rows):
         linha = i + 2
+        row = row[:n_cols] + [''] * (n_cols - len(row))
         if linha in rev_by_linha:
             nr = rev_by_linha[linha]
-            row['PRECISA_REVISAO'] = nr['precisa_revisao']
-            row['MOTIVO_REVISAO'] = nr['motivo_revisao']
-            row['ENTENDIMENTO'] = nr['entendimento']
+            w.writerow(row + [nr.precisa_revisao, nr.motivo_revisao, nr.entendimento])
         else:
-            row['PRECISA_REVISAO'] = 'SIM'
-            row['MOTIVO_REVISAO'] = 'Linha ignorada (GARANTIA/TROCA)'
-            row['ENTENDIMENTO'] = 'Valor GARANTIA - ignorado'
-        w.writerow(row)
+            w.writerow(row + ['SIM', 'Linha ignorada (GARANTIA/TROCA)', 'Valor GARANTIA - ignorado'])
 
 print(f'Original c/ revisao: {ORIG_OUTPUT}')
 
 # Contagem
-revisao_count = sum(1 for r in results if r['precisa_revisao'] == 'SIM')
+revisao_count = sum(1 for r in results if r.precisa_revisao == 'SIM')
 print(f'  Precisa revisao: {revisao_count}/{len(results)}')
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Le e normaliza a planilha UMA vez e grava as saidas que dependem so dela:
+
+  importacao_preview/ (previews + resumo.json)   analisar_importacao.gravar_previews
+  vendas_normalizadas.xlsx                        gerar_planilha.gravar_planilha
+  importacao.sql                                  gerar_sql_importacao.gravar_sql
+
+Mesmo resultado que rodar os tres scripts, sem reler e reparsear o CSV em
+cada processo (etapas.py roda este como a etapa `saidas`).
+
+Uso:
+  python3 scripts/gerar_saidas.py [planilha.csv|planilha.xlsx]
+  --ids tempo / --importacao ID / --sem-armazem: como no gerar_sql_importacao
+"""
+import os, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+from importacao_cli import args_posicionais
+from analisar_importacao import INPUT, analisar, gravar_previews, relatorio, vendas
+from gerar_planilha import gravar_planilha
+from gerar_sql_importacao import gravar_sql
+import perfilador
+
+if __name__ == '__main__':
+    perfilador.ativar()
+    perfilador.etapa('leitura')
+    linhas = vendas((args_posicionais(com_valor=('--ids', '--importacao')) or [INPUT])[0])
+    print(f'Total de linhas no CSV: {len(linhas)}')
+    print()
+    perfilador.etapa('analise')
+    analise = analisar(linhas)
+    relatorio(analise)
+    perfilador.etapa('gravacao')
+    gravar_previews(analise)
+    print()
+    gravar_planilha(linhas)
+    print()
+    perfilador.etapa('sql')
+    gravar_sql(linhas)
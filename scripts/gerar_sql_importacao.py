@@ -2,8 +2,13 @@
 """
 Gera script SQL para importar venda_aparelhos.csv no banco.
 Nao executa nada — apenas gera o arquivo SQL para revisao.
+
+--ids tempo: UUIDv7 pela data da venda em vez de uuid4 (ver importacao_ids.py).
+--importacao ID: id da importacao (desfazer com scripts/reverter_importacao.py ID).
+
+Importado: gravar_sql(linhas) com as vendas() ja lidas (gerar_saidas.py).
 """
-import csv, re, json, os, uuid
+import os
 from datetime import datetime
 
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -17,10 +22,16 @@ import sys
 if sys_path not in sys.path:
     sys.path.insert(0, sys_path)
 
-from analisar_importacao import (
-    parse_brl, to_date, extrair_troca, normalizar_forma,
-    LOJA_MAP, VENDEDOR_MAP
-)
+from analisar_importacao import vendas
+from importacao_ids import GeradorIds
+from importacao_cli import arg_valor
+from importacao_registro import id_importacao, sql_abrir, sql_marcar, sql_marcar_venda
+from modelos import detectar_estado, limpar_modelo
+import armazem
+import perfilador
+
+ids = GeradorIds(arg_valor('--ids', 'aleatorio'))
+IMPORTACAO_ID = id_importacao('gerar_sql_importacao', arg_valor('--importacao'))
 
 # ====================================================================
 # CLIENTE PADRAO
@@ -33,33 +44,11 @@ CLIENTE_PADRAO_NOME = 'CLIENTE BALCAO'
 # GERAR SQL
 # ====================================================================
 
-def gerar_uuid():
-    return str(uuid.uuid4())
-
-def extrair_estado(modelo):
-    """Extrai estado do aparelho do nome do modelo."""
-    m = modelo.upper()
-    if 'NOVO' in m and 'SEMINOVO' not in m and 'LACRADO' not in m:
-        return 'novo'
-    if 'LACRADO' in m:
-        return 'novo'
-    if 'SEMINOVO' in m:
-        return 'seminovo'
-    if 'USADO' in m:
-        return 'usado'
-    return 'seminovo'
-
-def limpar_modelo(modelo):
-    """Remove sufixos de estado do nome do modelo para deixar apenas o modelo."""
-    for s in [' NOVO', ' SEMINOVO', ' USADO', ' LACRADO', ' - GARANTIA']:
-        if modelo.upper().endswith(s):
-            modelo = modelo[:-len(s)]
-    return modelo.strip()
+def gerar_uuid(tabela='', data_iso=None):
+    return ids.gerar(tabela, data=data_iso)
 
-def gerar_sql():
-    with open(INPUT, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        linhas = list(reader)
+def gerar_sql(linhas):
+    lote = armazem.Lote(IMPORTACAO_ID, 'gerar_sql_importacao', os.path.basename(INPUT))
     
     sql_lines = []
     sql_lines.append('-- ============================================')
@@ -90,6 +79,8 @@ END;
 $$;
 """.strip())
     sql_lines.append('')
+    sql_lines.append(sql_abrir(IMPORTACAO_ID, 'gerar_sql_importacao', 'venda_aparelhos.csv'))
+    sql_lines.append('')
     
     # --- INSTRUCOES PREVIAS ---
     sql_lines.append('-- ============================================')
@@ -104,29 +95,29 @@ $$;
         'sem_imei': 0,
     }
     
-    for idx, row in enumerate(linhas):
-        # Parse
-        data = row.get('DATA', '').strip()
-        data_iso = to_date(data)
-        modelo_orig = row.get('MODELO', '').strip()
-        imei = row.get('IMEI', '').strip().replace(' ', '')
-        valor_venda = parse_brl(row.get('VALOR DE VENDA', ''))
-        brinde = parse_brl(row.get('BRINDE', ''))
-        custo = parse_brl(row.get('CUSTO APARELHO', ''))
-        forma_orig = row.get('FORMA DE PAGAMENTO', '').strip()
-        vendedor_nome = row.get('VENDEDOR', '').strip().title()
-        loja_nome = row.get('LOJA', '').strip().upper() or 'CELL'
+    for idx, venda in enumerate(linhas):
+        data = venda.data
+        data_iso = venda.data_iso
+        modelo_orig = venda.modelo
+        imei = venda.imei
+        valor_venda = venda.valor_venda
+        brinde = venda.brinde
+        custo = venda.custo
+        forma_orig = venda.forma_orig
+        vendedor_nome = venda.vendedor_nome
+        loja_nome = venda.loja_nome
         
         # Skip non-monetary
         if valor_venda is None:
             sql_lines.append(f'-- IGNORADO (valor nao monetario): {modelo_orig}')
             sql_lines.append('')
+            lote.linha(idx + 1, 'pulada', 'valor nao monetario', origem=venda._asdict(), data_iso=data_iso,
+                       modelo=modelo_orig, imei=imei, forma_orig=forma_orig, vendedor=vendedor_nome, loja=loja_nome)
             continue
         
         # IDs
-        loja_id = LOJA_MAP.get(loja_nome, 1)
-        vendedor_key = vendedor_nome.upper()
-        vendedor_id = VENDEDOR_MAP.get(vendedor_key)
+        loja_id = venda.loja_id or 1
+        vendedor_id = venda.vendedor_id
         if not vendedor_id:
             # Fallback: usar Ronald como vendedor padrao (ajustar manualmente depois)
             vendedor_id = '97f12885-87ad-426a-8bbb-656889d82e10'
@@ -140,17 +131,16 @@ $$;
             data_iso = '2026-05-01'  # fallback
         
         # Estado e modelo limpo
-        estado = extrair_estado(modelo_orig)
+        estado = detectar_estado(modelo_orig)
         modelo_limpo = limpar_modelo(modelo_orig)
         
         # UUIDs
-        aparelho_id = gerar_uuid()
-        venda_id = gerar_uuid()
+        aparelho_id = gerar_uuid('aparelhos', data_iso)
+        venda_id = gerar_uuid('vendas', data_iso)
         
         # Trocas
-        formas = normalizar_forma(forma_orig)
-        tem_troca = 'troca_aparelho' in formas
-        trocas = extrair_troca(forma_orig) if tem_troca else []
+        formas = venda.formas
+        trocas = venda.trocas
         
         # Pagamentos simplificado: usar valor total como PIX
         # (melhorias futuras: extrair valores individuais do texto)
@@ -181,13 +171,13 @@ $$;
         sql_lines.append(f'UPDATE aparelhos SET venda_id = \'{venda_id}\' WHERE id = \'{aparelho_id}\';')
         
         # === PAGAMENTO ===
-        pagto_id = gerar_uuid()
+        pagto_id = gerar_uuid('pagamentos_venda', data_iso)
         sql_lines.append(f'INSERT INTO pagamentos_venda (id, venda_id, tipo_pagamento, valor, data_pagamento, criado_em)')
         sql_lines.append(f"VALUES ('{pagto_id}', '{venda_id}', '{tipo_pagto}', {valor_venda}, '{data_iso}', '{data_iso}');")
         
         # === TROCA (se houver) ===
         for troca in trocas:
-            troca_id = gerar_uuid()
+            troca_id = gerar_uuid('aparelhos', data_iso)
             modelo_troca = troca['modelo']
             valor_troca = troca['valor']
             estado_troca = 'usado'
@@ -198,10 +188,19 @@ $$;
             sql_lines.append(f'-- Troca: {modelo_troca} (R$ {valor_troca:.2f})')
             sql_lines.append(f'INSERT INTO aparelhos (id, modelo, valor_compra, loja_id, status, estado, observacoes, data_entrada, criado_em, atualizado_em)')
             sql_lines.append(f"VALUES ('{troca_id}', '{modelo_troca}', {valor_troca}, {loja_id}, 'disponivel', '{estado_troca}', 'Entrada por troca - venda {venda_id}', '{data_iso}', '{data_iso}', '{data_iso}');")
+            sql_lines.append(sql_marcar(IMPORTACAO_ID, 'aparelhos', [troca_id]))
             estatisticas['trocas'] += 1
         
+        sql_lines.append(sql_marcar_venda(IMPORTACAO_ID, aparelho_id))
         sql_lines.append('')
         estatisticas['vendas'] += 1
+        # venda inteira numa forma so (tipo_pagto); os valores extraidos ficam na origem
+        lote.linha(idx + 1, motivo='' if venda.vendedor_id else 'sem vendedor: Ronald por padrao',
+                   origem=venda._asdict(), data_iso=data_iso, modelo=modelo_orig, imei=imei,
+                   valor_venda=valor_venda, custo=custo, brinde=brinde, forma_orig=forma_orig,
+                   vendedor=vendedor_nome, vendedor_id=vendedor_id.strip("'"), loja=loja_nome, loja_id=loja_id,
+                   troca_aparelho=sum(t['valor'] for t in trocas), venda_id=venda_id, aparelho_id=aparelho_id,
+                   **{tipo_pagto: valor_venda})
     
     # Final
     sql_lines.append('COMMIT;')
@@ -214,18 +213,25 @@ $$;
     sql_lines.append(f'-- Aparelhos sem IMEI: {estatisticas["sem_imei"]}')
     sql_lines.append('-- ============================================')
     
+    lote.gravar()
     return '\n'.join(sql_lines), estatisticas
 
 
-if __name__ == '__main__':
-    sql, stats = gerar_sql()
+def gravar_sql(linhas, destino=SQL_OUTPUT):
+    """gerar_sql(linhas) gravado em `destino`, com o resumo."""
+    sql, stats = gerar_sql(linhas)
     
-    with open(SQL_OUTPUT, 'w', encoding='utf-8') as f:
+    with open(destino, 'w', encoding='utf-8') as f:
         f.write(sql)
     
-    print(f'SQL gerado: {SQL_OUTPUT}')
+    print(f'SQL gerado: {destino}')
     print(f'  Vendas:     {stats["vendas"]}')
     print(f'  Trocas:     {stats["trocas"]}')
     print(f'  Sem vend:   {stats["sem_vendedor"]}')
     print(f'  Sem IMEI:   {stats["sem_imei"]}')
-    print(f'Tamanho: {len(sql.splitlines())} linhas, {os.path.getsize(SQL_OUTPUT):,} bytes')
+    print(f'Tamanho: {len(sql.splitlines())} linhas, {os.path.getsize(destino):,} bytes')
+
+
+if __name__ == '__main__':
+    perfilador.ativar()
+    gravar_sql(vendas(INPUT))
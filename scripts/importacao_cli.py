@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Helpers de linha de comando compartilhados pelos scripts de importacao.
+
+Os scripts aceitam flags simples (`'--executar' in sys.argv`); aqui ficam so as
+opcoes com valor, no formato `--lote 200` ou `--lote=200`.
+"""
+import sys
+
+
+def arg_valor(nome, padrao=None, tipo=str, argv=None):
+    """Valor de `--nome X` / `--nome=X` em argv (padrao se ausente)."""
+    argv = sys.argv if argv is None else argv
+    for i, a in enumerate(argv):
+        if a == nome and i + 1 < len(argv):
+            return tipo(argv[i + 1])
+        if a.startswith(nome + '='):
+            return tipo(a.split('=', 1)[1])
+    return padrao
+
+
+def args_posicionais(com_valor=(), argv=None):
+    """Argumentos sem `--` (pulando o valor das opcoes em `com_valor`, ex.: ('--dsn',))."""
+    argv = (sys.argv if argv is None else argv)[1:]
+    posicionais, pular = [], False
+    for a in argv:
+        if pular:
+            pular = False
+        elif a.startswith('--'):
+            pular = a in com_valor
+        else:
+            posicionais.append(a)
+    return posicionais
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Geracao de ids (UUID) para os scripts de importacao.
+
+Estrategias (--ids nos geradores):
+  aleatorio     uuid4 - muda a cada execucao (comportamento antigo)
+  determinista  uuid5 sobre a chave da linha de origem - re-executar o mesmo
+                CSV gera os mesmos ids, entao o SQL pode usar ON CONFLICT (id)
+                em vez de apagar e reinserir tudo
+  tempo         UUIDv7 (RFC 9562) com o timestamp da data da venda (data_iso)
+                nos 48 bits altos. Ids crescem com a data: a carga em massa
+                acrescenta no fim do indice da PK (sem page split espalhado) e
+                vendas do mesmo periodo ficam vizinhas no B-tree. Os 74 bits
+                restantes vem do hash da chave da linha (ou aleatorios sem
+                chave), entao com chave o v7 tambem e determinista.
+
+Uso:
+  from importacao_ids import GeradorIds
+  ids = GeradorIds('tempo', fonte='venda_aparelhos')   # planilha de origem
+  chave = ids.chave_linha(orig_linha)                   # linha dela
+  venda_id = ids.gerar('vendas', chave, data=data_iso)
+  pagto_id = ids.gerar('pagamentos_venda', chave, 'pix', data=data_iso)
+"""
+import hashlib, os, re, uuid
+from datetime import datetime, timezone
+
+# Namespace fixo das importacoes. NAO alterar: muda todos os ids deterministas
+# ja gravados no banco e as re-execucoes passam a duplicar as vendas.
+NAMESPACE_IMPORTACAO = uuid.UUID('6f1c2b4e-8d3a-5e7f-9a0b-1c2d3e4f5a6b')
+
+ESTRATEGIAS = ('aleatorio', 'determinista', 'tempo')
+
+# Hora usada como timestamp da venda (mesma do criado_em 'T14:00:00' dos scripts)
+HORA_VENDA = 14
+
+
+def uuid7(data_iso=None, semente=None):
+    """
+    UUIDv7: unix_ts_ms (48) | versao 7 (4) | rand_a (12) | variante (2) | rand_b (62).
+    data_iso 'YYYY-MM-DD' (None = agora). semente (bytes) torna os bits
+    "aleatorios" deterministas.
+    """
+    if data_iso:
+        a, m, d = (int(x) for x in data_iso[:10].split('-'))
+        ts = datetime(a, m, d, HORA_VENDA, tzinfo=timezone.utc)
+    else:
+        ts = datetime.now(timezone.utc)
+    ms = int(ts.timestamp() * 1000) & ((1 << 48) - 1)
+    aleat = hashlib.sha256(semente).digest()[:10] if semente is not None else os.urandom(10)
+    r = int.from_bytes(aleat, 'big')  # 80 bits, usamos 74
+    rand_a = r >> 68 & 0xFFF
+    rand_b = r & ((1 << 62) - 1)
+    n = ms << 80 | 0x7 << 76 | rand_a << 64 | 0b10 << 62 | rand_b
+    return uuid.UUID(int=n)
+
+
+def _normalizar_parte(p):
+    if p is None: return ''
+    return re.sub(r'\s+', ' ', str(p)).strip().upper()
+
+
+class GeradorIds:
+    """Gera ids por tabela a partir de uma chave estavel da linha de origem."""
+
+    def __init__(self, estrategia='aleatorio', fonte=''):
+        if estrategia not in ESTRATEGIAS:
+            raise ValueError(f'estrategia de id invalida: {estrategia} (use {", ".join(ESTRATEGIAS)})')
+        self.estrategia = estrategia
+        self.fonte = fonte
+        self._ocorrencias = {}
+
+    def chave_linha(self, *partes):
+        """
+        Chave da linha de origem: o que a identifica na planilha (fonte +
+        orig_linha), NAO os campos - uma correcao de valor, data, IMEI ou
+        vendedor na planilha vira UPDATE em vez de uma venda nova. Chaves
+        repetidas no mesmo arquivo recebem um sufixo de ocorrencia (#2, #3...)
+        na ordem em que aparecem.
+        """
+        base = '|'.join([self.fonte] + [_normalizar_parte(p) for p in partes])
+        n = self._ocorrencias.get(base, 0) + 1
+        self._ocorrencias[base] = n
+        return base if n == 1 else f'{base}#{n}'
+
+    def gerar(self, tabela, chave=None, *sufixo, data=None):
+        """
+        Id para `tabela`. chave (+ sufixo, ex.: tipo de pagamento) torna o id
+        determinista; data (data_iso da venda) e o timestamp da estrategia tempo.
+        """
+        nome = '|'.join([tabela, chave] + [str(s) for s in sufixo]) if chave is not None else None
+        if self.estrategia == 'tempo':
+            return str(uuid7(data, nome.encode('utf-8') if nome else None))
+        if self.estrategia == 'aleatorio' or nome is None:
+            return str(uuid.uuid4())
+        return str(uuid.uuid5(NAMESPACE_IMPORTACAO, nome))
+
+    @property
+    def determinista(self):
+        """Mesma chave -> mesmo id (requisito do modo idempotente)."""
+        return self.estrategia != 'aleatorio'
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Registro de importacoes: cada execucao de um gerador recebe um id
+(`--importacao ID`, padrao <script>-AAAAMMDD-HHMMSS) e cada linha que ela
+grava em vendas/aparelhos/pagamentos_venda/brindes_aparelhos fica anotada em
+importacao_registros. Assim da para desfazer EXATAMENTE uma importacao
+(reverter_importacao.py) sem o DELETE em cascata de tudo do Cliente Balcao.
+As tabelas ficam no schema `importacao` e sao criadas pela migration
+scripts/create_importacao_registro.sql (rodar uma vez).
+
+  importacoes          (id, script, fonte, criado_em, revertida_em)
+  importacao_registros (importacao_id, tabela, registro_id)
+                       PK (tabela, registro_id): o registro pertence a
+                       importacao que o CRIOU - re-executar em modo idempotente
+                       (upsert) nao muda o dono.
+
+Uso nos geradores:
+  from importacao_registro import id_importacao, sql_abrir, sql_marcar_venda
+  imp = id_importacao('importar_tudo')
+  sql.append(sql_abrir(imp, 'importar_tudo', 'vendas_final.csv'))  # apos BEGIN
+  ...INSERTs da linha...
+  sql.append(sql_marcar_venda(imp, aparelho_id))   # aparelho + venda + pagtos + brinde
+"""
+from datetime import datetime
+
+# DDL em scripts/create_importacao_registro.sql (schema fora do PostgREST, com RLS)
+SQL_CONFERIR_TABELAS = """DO $$
+BEGIN
+    IF to_regclass('importacao.importacoes') IS NULL THEN
+        RAISE EXCEPTION 'tabelas de importacao ausentes - rode antes scripts/create_importacao_registro.sql';
+    END IF;
+END $$;"""
+
+
+def _lit(s):
+    return "'" + str(s).replace("'", "''") + "'"
+
+
+def id_importacao(script, informado=None):
+    """Id da importacao: o informado (--importacao) ou <script>-AAAAMMDD-HHMMSS."""
+    return informado or f'{script}-{datetime.now():%Y%m%d-%H%M%S}'
+
+
+def sql_abrir(importacao_id, script, fonte=''):
+    """Confere a migration e registra a importacao. Rodar dentro da transacao."""
+    return (SQL_CONFERIR_TABELAS + '\n'
+            f"INSERT INTO importacao.importacoes (id, script, fonte) VALUES ({_lit(importacao_id)}, {_lit(script)}, {_lit(fonte)})\n"
+            "ON CONFLICT (id) DO NOTHING;")
+
+
+def sql_marcar(importacao_id, tabela, registro_ids):
+    """Anota ids conhecidos no Python (ex.: aparelho de troca, que nao tem venda_id)."""
+    if not registro_ids:
+        return ''
+    valores = ', '.join(f"({_lit(importacao_id)}, '{tabela}', '{r}')" for r in registro_ids)
+    return (f"INSERT INTO importacao.importacao_registros (importacao_id, tabela, registro_id) VALUES {valores}\n"
+            "ON CONFLICT DO NOTHING;")
+
+
+def sql_marcar_venda(importacao_id, aparelho_id):
+    """
+    Anota o aparelho vendido e, pelo aparelhos.venda_id, a venda, os pagamentos
+    e o brinde dela. Serve tambem quando os ids nascem no SQL (gen_random_uuid,
+    default do banco) - basta o id do aparelho. Rodar depois dos INSERTs da linha.
+    """
+    imp, ap = _lit(importacao_id), f"'{aparelho_id}'"
+    return f"""INSERT INTO importacao.importacao_registros (importacao_id, tabela, registro_id)
+SELECT {imp}, 'aparelhos', a.id FROM aparelhos a WHERE a.id = {ap}
+UNION ALL SELECT {imp}, 'vendas', a.venda_id FROM aparelhos a WHERE a.id = {ap} AND a.venda_id IS NOT NULL
+UNION ALL SELECT {imp}, 'pagamentos_venda', p.id FROM pagamentos_venda p JOIN aparelhos a ON a.venda_id = p.venda_id WHERE a.id = {ap}
+UNION ALL SELECT {imp}, 'brindes_aparelhos', b.id FROM brindes_aparelhos b JOIN aparelhos a ON a.venda_id = b.venda_id WHERE a.id = {ap}
+ON CONFLICT DO NOTHING;"""
+
+
+def sql_reverter(importacao_id):
+    """
+    Uma transacao, um DELETE set-based por tabela em ordem de FK. vendas
+    propaga o DELETE em cascata (devolucoes, creditos, sangrias, trocas,
+    itens...), entao ANTES de apagar confere toda tabela que referencia vendas
+    (lida do pg_constraint): qualquer linha que a importacao nao gravou -
+    pagamento/brinde/aparelho fora de importacao_registros, historico que nao
+    e o 'criacao' da carga, ou qualquer linha das demais - aborta com RAISE e
+    nada e apagado. So sai o que a importacao registrou.
+    """
+    imp = _lit(importacao_id)
+    return f"""BEGIN;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM importacao.importacoes WHERE id = {imp}) THEN
+        RAISE EXCEPTION 'importacao % nao encontrada', {imp};
+    END IF;
+END $$;
+
+CREATE TEMP TABLE reverter_registros ON COMMIT DROP AS
+SELECT tabela, registro_id FROM importacao.importacao_registros WHERE importacao_id = {imp};
+CREATE TEMP TABLE reverter_vendas ON COMMIT DROP AS
+SELECT registro_id AS id FROM reverter_registros WHERE tabela = 'vendas';
+
+DO $$
+DECLARE
+    fk RECORD;
+    v_extra BIGINT;
+BEGIN
+    FOR fk IN
+        SELECT c.conrelid::regclass AS tabela, c.conrelid::regclass::text AS nome, a.attname AS coluna
+        FROM pg_constraint c
+        JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = c.conkey[1]
+        WHERE c.contype = 'f' AND c.confrelid = 'vendas'::regclass
+    LOOP
+        EXECUTE format('SELECT count(*) FROM %s x WHERE x.%I IN (SELECT id FROM reverter_vendas)', fk.tabela, fk.coluna)
+            || CASE
+                WHEN fk.nome IN ('aparelhos', 'pagamentos_venda', 'brindes_aparelhos') THEN format(
+                    ' AND x.id NOT IN (SELECT registro_id FROM reverter_registros WHERE tabela = %L)', fk.nome)
+                WHEN fk.nome = 'historico_vendas' THEN ' AND x.tipo_acao <> ''criacao'''
+                ELSE '' END
+            INTO v_extra;
+        IF v_extra > 0 THEN
+            RAISE EXCEPTION 'importacao %: % linha(s) de % lancadas fora da importacao apontam para vendas dela - resolva antes de reverter',
+                {imp}, v_extra, fk.nome;
+        END IF;
+    END LOOP;
+END $$;
+
+DELETE FROM historico_vendas h USING reverter_vendas v WHERE h.venda_id = v.id AND h.tipo_acao = 'criacao';
+DELETE FROM pagamentos_venda p USING reverter_registros r WHERE r.tabela = 'pagamentos_venda' AND p.id = r.registro_id;
+DELETE FROM brindes_aparelhos b USING reverter_registros r WHERE r.tabela = 'brindes_aparelhos' AND b.id = r.registro_id;
+DELETE FROM aparelhos a USING reverter_registros r WHERE r.tabela = 'aparelhos' AND a.id = r.registro_id;
+DELETE FROM vendas v USING reverter_vendas r WHERE v.id = r.id;
+
+DELETE FROM importacao.importacao_registros WHERE importacao_id = {imp};
+UPDATE importacao.importacoes SET revertida_em = now() WHERE id = {imp};
+
+COMMIT;"""
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Gera SQL para carregar a planilha de estoque (exportada pela tela de Estoque,
+lib/exportarExcel.ts) em produtos + estoque_lojas, lendo o .xlsx direto em
+streaming - sem exportar para CSV e sem abrir a pasta inteira na memoria.
+
+Colunas: Codigo (8 primeiros caracteres do id do produto), Descricao, Marca,
+Modelos, Categoria, Grupo, Cod. Fabricante, Preco Compra/Venda, Estoque Min.
+e uma coluna 'Estoque - <nome da loja>' por loja.
+
+  - produto: casa pelo Codigo (prefixo do id, buscado como faixa de uuid
+    para usar a PK) ou pela descricao; se nao existir, e criado. Cada linha
+    da planilha leva seu numero ate o fim, entao duas linhas novas com a
+    mesma descricao viram dois produtos, cada uma com o seu saldo.
+  - estoque_lojas: quantidade da planilha vira o saldo da loja (upsert em
+    id_produto,id_loja). Loja casada pelo nome em lojas; zeros sao pulados
+    (--com-zeros para zerar tambem).
+
+Uso:
+  python3 scripts/importar_estoque.py [planilha.xlsx|.csv] [--aba NOME] [--com-zeros]
+"""
+import os, re, sys
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+from analisar_importacao import parse_brl
+from importacao_cli import arg_valor, args_posicionais
+from leitor_csv import indices, linhas_brutas, normalizar_cabecalho
+import perfilador
+
+INPUT = os.path.join(ROOT, 'scripts', 'estoque_2026-06-10.xlsx')
+SQL_OUTPUT = os.path.join(ROOT, 'scripts', 'importar_estoque.sql')
+
+COLUNAS_ESTOQUE = {
+    'codigo':            ('CODIGO',),
+    'descricao':         ('DESCRICAO',),
+    'marca':             ('MARCA',),
+    'modelos':           ('MODELOS',),
+    'categoria':         ('CATEGORIA',),
+    'grupo':             ('GRUPO',),
+    'codigo_fabricante': ('COD. FABRICANTE', 'CODIGO FABRICANTE'),
+    'preco_compra':      ('PRECO COMPRA',),
+    'preco_venda':       ('PRECO VENDA',),
+    'estoque_min':       ('ESTOQUE MIN.', 'ESTOQUE MIN'),
+    'status':            ('STATUS',),
+}
+PREFIXO_LOJA = 'ESTOQUE - '
+LOTE = 500
+RE_CODIGO = re.compile(r'[0-9a-f]{8}')
+
+
+def _lit(v):
+    """Texto da planilha -> literal SQL ('-' e vazio viram NULL)."""
+    if v in ('', '-'):
+        return 'NULL'
+    return "'" + v.replace("'", "''") + "'"
+
+
+def _inteiro(v):
+    try:
+        return int(float(v.replace(',', '.')))
+    except ValueError:
+        return 0
+
+
+def ler_estoque(caminho, aba=None):
+    """
+    Iterador de (campos, {loja: quantidade}) - campos = dict de COLUNAS_ESTOQUE.
+    Lojas sao as colunas 'Estoque - <loja>', na ordem da planilha.
+    """
+    linhas = linhas_brutas(caminho, aba=aba)
+    cab = next(linhas, [])
+    idx = indices(cab, COLUNAS_ESTOQUE)
+    lojas = [(i, nome.split('-', 1)[1].strip()) for i, nome in enumerate(cab)
+             if normalizar_cabecalho(nome).startswith(PREFIXO_LOJA)]
+    for row in linhas:
+        n = len(row)
+        campos = {c: (row[i].strip() if i is not None and i < n else '') for c, i in idx.items()}
+        if not campos['descricao']:
+            continue
+        yield campos, {loja: _inteiro(row[i]) for i, loja in lojas if i < n and row[i].strip()}
+
+
+def _faixa_id(codigo):
+    """Codigo (8 primeiros caracteres do uuid) -> literais da menor e da maior id com esse prefixo."""
+    codigo = codigo.lower()
+    if not RE_CODIGO.fullmatch(codigo):
+        return 'NULL', 'NULL'
+    return f"'{codigo}-0000-0000-0000-000000000000'", f"'{codigo}-ffff-ffff-ffff-ffffffffffff'"
+
+
+def _valores_produto(linha, c):
+    ativo = 'INATIVO' not in normalizar_cabecalho(c['status'])
+    id_de, id_ate = _faixa_id(c['codigo'])
+    return (f"({linha}, {id_de}, {id_ate}, {_lit(c['descricao'])}, {_lit(c['marca'])}, {_lit(c['modelos'])}, "
+            f"{_lit(c['categoria'])}, {_lit(c['grupo'])}, {_lit(c['codigo_fabricante'])}, "
+            f"{parse_brl(c['preco_compra']) or 0}, {parse_brl(c['preco_venda']) or 0}, "
+            f"{_inteiro(c['estoque_min'] or '0')}, {'true' if ativo else 'false'})")
+
+
+def gerar(caminho, saida, aba=None, com_zeros=False):
+    """Escreve o SQL em `saida` a medida que le a planilha. Retorna estatisticas."""
+    st = {'produtos': 0, 'saldos': 0, 'lojas': set()}
+    produtos, saldos = [], []
+
+    def despejar(f):
+        if produtos:
+            f.write('INSERT INTO _estoque_produtos VALUES\n  ' + ',\n  '.join(produtos) + ';\n')
+            produtos.clear()
+        if saldos:
+            f.write('INSERT INTO _estoque_saldos VALUES\n  ' + ',\n  '.join(saldos) + ';\n')
+            saldos.clear()
+
+    with open(saida, 'w', encoding='utf-8') as f:
+        f.write(f'-- Estoque gerado em {datetime.now()}\n')
+        f.write(f'-- Fonte: {os.path.basename(caminho)}\n\nBEGIN;\n\n')
+        f.write('CREATE TEMP TABLE _estoque_produtos (linha int PRIMARY KEY, id_de uuid, id_ate uuid,\n'
+                '    descricao text, marca text, modelos text, categoria text, grupo text, codigo_fabricante text,\n'
+                '    preco_compra numeric, preco_venda numeric, quantidade_minima int, ativo boolean) ON COMMIT DROP;\n')
+        f.write('CREATE TEMP TABLE _estoque_saldos (linha int, loja text, quantidade int) ON COMMIT DROP;\n\n')
+        for c, qtds in ler_estoque(caminho, aba):
+            st['produtos'] += 1
+            linha = st['produtos']
+            produtos.append(_valores_produto(linha, c))
+            for loja, q in qtds.items():
+                st['lojas'].add(loja)
+                if q or com_zeros:
+                    saldos.append(f"({linha}, {_lit(loja)}, {q})")
+                    st['saldos'] += 1
+            if len(produtos) >= LOTE or len(saldos) >= LOTE:
+                despejar(f)
+        despejar(f)
+        f.write("""
+-- linha da planilha -> id no banco (faixa do prefixo exportado na PK, senao descricao)
+CREATE TEMP TABLE _estoque_ids ON COMMIT DROP AS
+SELECT e.linha,
+       coalesce((SELECT p.id FROM produtos p WHERE p.id BETWEEN e.id_de AND e.id_ate ORDER BY p.id LIMIT 1),
+                (SELECT p.id FROM produtos p WHERE p.descricao = e.descricao ORDER BY p.id LIMIT 1)) AS id_produto,
+       false AS novo
+FROM _estoque_produtos e;
+
+-- sem correspondente: id gerado aqui, por linha, e o produto criado com ele
+UPDATE _estoque_ids SET id_produto = gen_random_uuid(), novo = true WHERE id_produto IS NULL;
+
+INSERT INTO produtos (id, descricao, marca, modelos, categoria, grupo, codigo_fabricante,
+                      preco_compra, preco_venda, quantidade_minima, ativo)
+SELECT i.id_produto, e.descricao, e.marca, e.modelos, e.categoria, e.grupo, e.codigo_fabricante,
+       e.preco_compra, e.preco_venda, e.quantidade_minima, e.ativo
+FROM _estoque_produtos e
+JOIN _estoque_ids i USING (linha)
+WHERE i.novo;
+
+-- linhas que caem no mesmo produto (ex.: mesma descricao sem Codigo): vale a ultima
+INSERT INTO estoque_lojas (id_produto, id_loja, quantidade, observacao)
+SELECT DISTINCT ON (i.id_produto, l.id) i.id_produto, l.id, s.quantidade, 'Importacao planilha de estoque'
+FROM _estoque_saldos s
+JOIN _estoque_ids i USING (linha)
+JOIN lojas l ON upper(l.nome) = upper(s.loja)
+ORDER BY i.id_produto, l.id, s.linha DESC
+ON CONFLICT (id_produto, id_loja) DO UPDATE
+SET quantidade = EXCLUDED.quantidade, observacao = EXCLUDED.observacao;
+
+-- lojas da planilha sem correspondente em lojas (saldos ignorados)
+SELECT DISTINCT s.loja AS loja_sem_cadastro FROM _estoque_saldos s
+WHERE NOT EXISTS (SELECT 1 FROM lojas l WHERE upper(l.nome) = upper(s.loja));
+
+COMMIT;
+""")
+    return st
+
+
+if __name__ == '__main__':
+    perfilador.ativar()
+    caminho = (args_posicionais(com_valor=('--aba',)) or [INPUT])[0]
+    st = gerar(caminho, SQL_OUTPUT, arg_valor('--aba'),
+               '--com-zeros' in sys.argv)
+    print(f'SQL gerado: {SQL_OUTPUT}')
+    print(f'  Produtos:   {st["produtos"]}')
+    print(f'  Saldos:     {st["saldos"]}')
+    print(f'  Lojas:      {", ".join(sorted(st["lojas"])) or "-"}')
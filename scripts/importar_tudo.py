@@ -8,16 +8,93 @@ Gera um unico SQL que:
   3. Importa TODAS as 397 linhas (NAO com pagamentos individuais,
      SIM com 1 Pix = valor_venda integral)
 
+Modo --idempotente: NAO apaga nada. Ids deterministas (uuid5 sobre a chave da
+linha de origem = planilha venda_aparelhos + orig_linha, que nao muda quando
+data, IMEI, vendedor ou loja sao corrigidos) + INSERT ... ON CONFLICT (id) DO
+UPDATE so quando algum valor mudou. Re-executar o mesmo CSV nao altera nada;
+uma linha corrigida na planilha vira UPDATE so daquela venda (e dos
+pagamentos/brinde dela).
+  Migracao: o upsert so casa com vendas gravadas no MESMO esquema de ids
+(estrategia + chave, anotado em importacoes.fonte). Se ha vendas de outra
+importacao do importar_tudo em outro esquema (modo antigo com ids aleatorios,
+--ids diferente, chave antiga) ou, na primeira execucao do esquema, vendas do
+Cliente Balcao sem registro de importacao, a transacao aborta em vez de
+duplicar tudo. Resolva com scripts/reverter_importacao.py ID da importacao
+antiga; vendas sem registro (anteriores ao importacao_registro) saem rodando
+uma vez sem --idempotente (limpa o Cliente Balcao) e revertendo essa carga.
+
 Uso:
   python3 scripts/importar_tudo.py                    # gera SQL
+  python3 scripts/importar_tudo.py --idempotente      # gera SQL sem limpeza (upsert)
   python3 scripts/importar_tudo.py --executar         # gera + executa via SSH
+  python3 scripts/importar_tudo.py --lote 100         # aplica direto, COMMIT a cada 100 linhas
+  python3 scripts/importar_tudo.py --lote 100 --retomar   # continua do ultimo lote confirmado
+  python3 scripts/importar_tudo.py --lote 20 --perfil horario-comercial  # sem pesar no PDV
+  python3 scripts/importar_tudo.py --idempotente --ids tempo   # UUIDv7 pela data da venda
+  python3 scripts/importar_tudo.py --idempotente --carga-massiva   # sem triggers por linha + ANALYZE
+  python3 scripts/importar_tudo.py --importacao vendas-jun   # id da importacao (padrao: data/hora)
+  python3 scripts/importar_tudo.py --lote 100 --async [--trabalhadores 4]   # parse e escrita sobrepostos
+  python3 scripts/importar_tudo.py --shards loja      # um SQL por loja (scripts/importacao_shards/)
+  python3 scripts/importar_tudo.py --shards loja --lote 100 [--conexoes 4]   # shards em paralelo
+
+Cada linha gravada fica anotada em importacao_registros com o id da importacao
+(importacao_registro.py); scripts/reverter_importacao.py ID desfaz so ela.
+Com --lote --retomar, repita o mesmo --importacao da execucao interrompida.
+
+--ids aleatorio|determinista|tempo (importacao_ids.py): padrao determinista no
+modo idempotente e aleatorio no modo antigo. 'tempo' = UUIDv7 com o timestamp
+de data_iso - a carga acrescenta no fim do indice da PK em vez de espalhar
+insercoes pelo B-tree inteiro (e continua determinista para o upsert).
+Ids deterministas so com --idempotente: o modo antigo apaga e recria o
+Cliente Balcao com os mesmos ids, e o registro deles continuaria com a
+importacao anterior (reverter a nova nao desfaria nada).
+
+Modo --lote (implica --idempotente): conecta em IMPORTACAO_DSN e aplica via
+carregador.py - um COMMIT por lote, checkpoint em
+importacao.importacao_checkpoints e linhas com erro em
+scripts/importacao_completa_quarentena.csv (sem abortar).
+
+Modo --carga-massiva (combina com os outros):
+  - session_replication_role = replica na transacao: triggers por linha
+    (atualizar_aparelho_por_venda, auditoria) e checagem de FK nao disparam
+    a cada INSERT. Sem permissao, segue com os triggers ligados e
+    SET CONSTRAINTS ALL DEFERRED. As FKs puladas sao conferidas de uma vez
+    (set-based) antes do COMMIT.
+  - historico_vendas: UM INSERT ... SELECT grava o 'criacao' de todas as
+    vendas importadas (o que vendasService.criarVenda gravaria uma a uma).
+  - ANALYZE nas tabelas tocadas no fim: dashboards ja consultam com
+    estatisticas novas.
+
+Modo --shards loja|vendedor|mes (implica --idempotente): as linhas sao
+particionadas pela chave (nenhuma linha em dois shards), cada shard com a
+propria transacao. numero_venda vem do default nextval em todos (sequence nao
+repete entre conexoes; o max()+1 do modo antigo colidiria). Sem --lote grava
+em scripts/importacao_shards/: 00_comum.sql (cliente + registro da
+importacao), um <chave>_<valor>.sql por shard (independentes, rodar em
+paralelo) e 99_fim.sql (ANALYZE, so com --carga-massiva - historico e
+conferencia de FKs fecham cada shard, com o replica ainda ligado). Com
+--lote aplica direto: carregador.carregar_paralelo, ate --conexoes (padrao 4)
+shards ao mesmo tempo, checkpoint por shard (--retomar continua cada um de
+onde parou).
+  No --lote o replica fica desligado (a quarentena depende do erro de FK
+  aparecer no SAVEPOINT da propria linha); historico e ANALYZE rodam no fim.
 """
-import csv, os, uuid, re, sys, subprocess
+import csv, os, re, sys, subprocess
 from datetime import datetime
 
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+from importacao_ids import GeradorIds
+from importacao_cli import arg_valor
+from carregador import Bloco, conectar, carregar, carregar_paralelo
+from importacao_registro import id_importacao, sql_abrir, sql_marcar_venda
+from pipeline_async import carregar_async
+from modelos import extract_brand
+import armazem
+import perfilador
 CSV_PATH = os.path.join(ROOT, 'scripts', 'vendas_final.csv')
 SQL_PATH = os.path.join(ROOT, 'scripts', 'importacao_completa.sql')
+SHARDS_DIR = os.path.join(ROOT, 'scripts', 'importacao_shards')
 
 ANGEL_UUID = '4549c96e-5c53-4cd6-b738-9d798f82a740'
 
@@ -28,22 +105,6 @@ LOJA_MAP = {
     '20': 20, 'BLOCO B': 20,
 }
 
-def extract_brand(modelo):
-    m = modelo.upper().strip()
-    if m.startswith('IPHONE') or m.startswith('IPAD') or m.startswith('MAC') or m.startswith('APPLE'):
-        return 'Apple'
-    if m.startswith('SAMSUNG'):
-        return 'Samsung'
-    if m.startswith('REDMI') or m.startswith('MI '):
-        return 'Xiaomi'
-    if m.startswith('REALME'):
-        return 'Realme'
-    if m.startswith('NOTE'):
-        return 'Redmi'
-    if m.startswith('BOMBOX'):
-        return 'Bombox'
-    return 'Outros'
-
 def condicao_from_estado(estado):
     estado = estado.lower().strip()
     if estado == 'novo':
@@ -78,10 +139,400 @@ def parse_decimal(val):
     except:
         return 0.0
 
-def gerar_sql():
+def sql_texto(v):
+    return f"'{v.replace(chr(39), chr(39) + chr(39))}'"
+
+# Colunas que o banco mexe sozinho (trigger_atualizar_aparelho_pagamento etc.):
+# entram no INSERT mas nao contam como "mudou" nem sao sobrescritas no UPDATE
+SO_NO_INSERT = ('id', 'atualizado_em')
+
+def sql_upsert(tabela, valores):
+    """
+    INSERT ... ON CONFLICT (id) DO UPDATE que so reescreve a linha quando algum
+    valor mudou (linha igual = nenhum UPDATE, nenhum trigger disparado).
+    `valores` e um dict coluna -> expressao SQL ja formatada.
+    """
+    cols = list(valores)
+    upd = [c for c in cols if c not in SO_NO_INSERT]
+    return (
+        f"INSERT INTO {tabela} ({', '.join(cols)})\n"
+        f"VALUES ({', '.join(str(valores[c]) for c in cols)})\n"
+        f"ON CONFLICT (id) DO UPDATE SET {', '.join(f'{c} = EXCLUDED.{c}' for c in upd)}\n"
+        f"WHERE ({', '.join(f'{tabela}.{c}' for c in upd)}) IS DISTINCT FROM ({', '.join(f'EXCLUDED.{c}' for c in upd)});"
+    )
+
+# Cria o Cliente Balcao (se faltar) e publica o id em importacao.cliente_id.
+# set_config(..., true) vale so na transacao: no modo --lote roda em cada lote.
+SQL_CLIENTE_PADRAO = """
+INSERT INTO clientes (id, nome, id_loja, criado_em, atualizado_em)
+SELECT gen_random_uuid(), 'Cliente Balcao', 1, NOW(), NOW()
+WHERE NOT EXISTS (SELECT 1 FROM clientes WHERE nome = 'Cliente Balcao');
+
+DO $$
+DECLARE
+    v_cliente_id UUID;
+BEGIN
+    SELECT id INTO v_cliente_id FROM clientes WHERE nome = 'Cliente Balcao' LIMIT 1;
+    PERFORM set_config('importacao.cliente_id', v_cliente_id::text, true);
+END;
+$$;
+""".strip()
+
+# Chave estavel da linha para os ids: planilha de origem + orig_linha
+PLANILHA = 'venda_aparelhos'
+
+
+def fonte_ids(ids):
+    """`fonte` registrada em importacoes: o CSV + o esquema de ids (o que o upsert casa)."""
+    return f'vendas_final.csv (ids {ids.estrategia}, chave {ids.fonte}:orig_linha)'
+
+
+def sql_abrir_tudo(importacao_id, fonte, idempotente=True):
+    """sql_abrir + (idempotente) aborta se ha vendas importadas com ids de outro esquema."""
+    sql = sql_abrir(importacao_id, 'importar_tudo', fonte)
+    if not idempotente:
+        return sql
+    imp, fonte = sql_texto(importacao_id), sql_texto(fonte)
+    return sql + f"""
+DO $$
+DECLARE
+    v_imp TEXT;
+    v_fonte TEXT;
+    v_soltas INT;
+BEGIN
+    SELECT i.id, i.fonte INTO v_imp, v_fonte
+    FROM importacao.importacoes i
+    JOIN importacao.importacao_registros r ON r.importacao_id = i.id AND r.tabela = 'vendas'
+    JOIN vendas v ON v.id = r.registro_id
+    WHERE i.script = 'importar_tudo' AND i.id <> {imp} AND i.fonte IS DISTINCT FROM {fonte}
+    LIMIT 1;
+    IF v_imp IS NOT NULL THEN
+        RAISE EXCEPTION 'importacao % gravou vendas com outro esquema de ids (%): o upsert duplicaria - rode antes scripts/reverter_importacao.py %', v_imp, v_fonte, v_imp;
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM importacao.importacoes
+                   WHERE script = 'importar_tudo' AND id <> {imp} AND fonte = {fonte}) THEN
+        SELECT count(*) INTO v_soltas FROM vendas v
+        WHERE v.cliente_id = current_setting('importacao.cliente_id')::uuid
+          AND NOT EXISTS (SELECT 1 FROM importacao.importacao_registros r WHERE r.tabela = 'vendas' AND r.registro_id = v.id);
+        IF v_soltas > 0 THEN
+            RAISE EXCEPTION '% venda(s) do Cliente Balcao sem registro de importacao (carga antiga): o upsert duplicaria - rode uma vez sem --idempotente (limpa o Cliente Balcao) e reverta essa importacao', v_soltas;
+        END IF;
+    END IF;
+END $$;"""
+
+
+TIPOS_PAGAMENTO = ('pix', 'dinheiro', 'cartao_credito', 'cartao_debito', 'troca_aparelho')
+
+TABELAS_CARGA = ('vendas', 'aparelhos', 'pagamentos_venda', 'brindes_aparelhos', 'historico_vendas')
+
+# --carga-massiva: desliga triggers/FK por linha so nesta transacao
+SQL_CARGA_MASSIVA_INICIO = """
+DO $$
+BEGIN
+    PERFORM set_config('session_replication_role', 'replica', true);
+EXCEPTION WHEN insufficient_privilege THEN
+    RAISE NOTICE 'sem permissao para session_replication_role: triggers e FKs seguem ativos';
+END;
+$$;
+SET CONSTRAINTS ALL DEFERRED;
+""".strip()
+
+
+def sql_carga_massiva_fim(venda_ids, conferir_fks=True):
+    """
+    Fim da carga massiva (dentro da transacao): historico 'criacao' set-based
+    para `venda_ids` e, se os triggers de FK foram pulados, conferencia das
+    referencias de uma vez. Re-executar nao duplica o historico.
+    """
+    valores = ',\n'.join(f"('{v}'::uuid)" for v in venda_ids) or "(NULL::uuid)"
+    partes = [f"""
+CREATE TEMP TABLE importacao_vendas_carga (id uuid PRIMARY KEY) ON COMMIT DROP;
+INSERT INTO importacao_vendas_carga (id) VALUES
+{valores}
+ON CONFLICT DO NOTHING;
+
+INSERT INTO historico_vendas (venda_id, tipo_acao, descricao, usuario_id, criado_em)
+SELECT v.id, 'criacao', 'Venda criada', v.vendedor_id, v.criado_em
+FROM vendas v
+JOIN importacao_vendas_carga c ON c.id = v.id
+WHERE NOT EXISTS (
+    SELECT 1 FROM historico_vendas h WHERE h.venda_id = v.id AND h.tipo_acao = 'criacao'
+);""".strip()]
+    if conferir_fks:
+        partes.append("""
+DO $$
+DECLARE
+    v_orfaos INT;
+BEGIN
+    IF current_setting('session_replication_role') <> 'replica' THEN
+        RETURN;  -- FKs foram checadas linha a linha
+    END IF;
+    SELECT count(DISTINCT v.id) INTO v_orfaos
+    FROM importacao_vendas_carga c
+    JOIN vendas v ON v.id = c.id
+    LEFT JOIN aparelhos a ON a.venda_id = v.id
+    LEFT JOIN brindes_aparelhos b ON b.venda_id = v.id
+    WHERE NOT EXISTS (SELECT 1 FROM lojas l WHERE l.id = v.loja_id)
+       OR NOT EXISTS (SELECT 1 FROM clientes cl WHERE cl.id = v.cliente_id)
+       OR (v.vendedor_id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM usuarios u WHERE u.id = v.vendedor_id))
+       OR (a.id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM lojas l WHERE l.id = a.loja_id))
+       OR (b.id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM lojas l WHERE l.id = b.loja_id));
+    IF v_orfaos > 0 THEN
+        RAISE EXCEPTION 'carga massiva: % vendas com loja/cliente/vendedor inexistente', v_orfaos;
+    END IF;
+    PERFORM set_config('session_replication_role', 'origin', true);
+END;
+$$;""".strip())
+    return '\n\n'.join(partes)
+
+
+SQL_ANALYZE = f"ANALYZE {', '.join(TABELAS_CARGA)};"
+
+CAMPOS_DECIMAIS = ('valor_venda', 'custo', 'brinde', 'pix', 'dinheiro', 'cartao_credito',
+                   'cartao_debito', 'troca_aparelho')
+
+
+def ler_csv():
     with open(CSV_PATH, 'r', encoding='utf-8-sig') as f:
-        reader = csv.DictReader(f)
-        rows = list(reader)
+        return list(csv.DictReader(f))
+
+
+def ler_linha(row):
+    """
+    Parte sem estado de uma linha do CSV: converte os campos. Nao depende das
+    linhas anteriores, entao roda em qualquer processo (pipeline_async usa um
+    pool). None = linha nao entra (data invalida, sem valor ou sem vendedor).
+    """
+    data = row.get('data', '').strip()
+    data_iso = to_date(data)
+    if not data_iso:
+        print(f'  AVISO: data invalida "{data}", linha {row.get("orig_linha")}')
+        return None
+    l = {k: parse_decimal(row.get(k, '')) for k in CAMPOS_DECIMAIS}
+    loja_id_raw = row.get('loja_id', '1').strip()
+    precisa_revisao = row.get('precisa_revisao', '').strip()
+    l.update({
+        'orig_linha': row.get('orig_linha'),
+        'precisa_revisao': precisa_revisao,
+        'data': data,
+        'data_iso': data_iso,
+        'modelo': row.get('modelo', '').strip(),
+        'imei': row.get('imei', '').strip().replace(' ', ''),
+        'loja_id': LOJA_MAP.get(loja_id_raw.upper(), LOJA_MAP.get(loja_id_raw, 1)),
+        'estado': row.get('estado', 'seminovo').strip().lower(),
+        'vendedor_id': row.get('vendedor_id', '').strip(),
+        'observacao': row.get('observacao', '').strip(),
+        'modelo_troca': row.get('modelo_troca', '').strip(),
+    })
+    if precisa_revisao == 'SIM':
+        l['soma_pagamentos'], l['usar_pix'] = l['valor_venda'], True
+    else:
+        l['soma_pagamentos'] = (l['pix'] + l['dinheiro'] + l['cartao_credito']
+                                + l['cartao_debito'] + l['troca_aparelho'])
+        l['usar_pix'] = False
+    if l['valor_venda'] <= 0 or l['vendedor_id'] == '':
+        return None
+    return l
+
+
+# --shards: chave de particao a partir de ler_linha (uma venda cai num shard so)
+SHARDS = {
+    'loja': lambda l: str(l['loja_id']),
+    'vendedor': lambda l: l['vendedor_id'][:8],
+    'mes': lambda l: l['data_iso'][:7],
+}
+
+# valores de ler_linha/bloco que vao para o armazem (o parse original fica na origem)
+CAMPOS_ARMAZEM = ('data_iso', 'modelo', 'imei', 'loja_id', 'vendedor_id', 'valor_venda', 'custo', 'brinde',
+                  'pix', 'dinheiro', 'cartao_credito', 'cartao_debito', 'troca_aparelho', 'modelo_troca',
+                  'venda_id', 'aparelho_id')
+
+
+class MontadorLinhas:
+    """
+    Parte com estado da geracao, na ordem do CSV: ocorrencias da chave (ids),
+    dedup de IMEI, numero_venda e contadores. bloco(l, idx) -> Bloco da linha.
+    Cada linha (entrou ou nao) vai para self.armazem (armazem.Lote).
+    """
+
+    def __init__(self, ids, idempotente, importacao_id):
+        self.ids = ids
+        self.idempotente = idempotente
+        self.importacao_id = importacao_id
+        self.used_imeis = set()
+        self.venda_ids = []
+        self.armazem = armazem.Lote(importacao_id, 'importar_tudo', 'vendas_final.csv')
+        self.stats = {
+            'aparelhos': 0, 'vendas': 0, 'pagamentos': 0,
+            'brindes': 0, 'trocas': 0, 'sem_imei': 0, 'imei_duplicado': 0, 'erros': 0,
+        }
+
+    def processar(self, row, l, idx):
+        """l = ler_linha(row) (ou a excecao dela). Bloco, ou None se a linha nao entra."""
+        orig_linha = row.get('orig_linha', idx + 1)
+        try:
+            if isinstance(l, Exception):
+                raise l
+            if l is None:
+                self.stats['erros'] += 1
+                self.armazem.linha(orig_linha, 'pulada', 'data invalida, sem valor ou sem vendedor', row=row)
+                return None
+            motivos = []
+            if l['imei'] and l['imei'] in self.used_imeis:
+                motivos.append('IMEI repetido no CSV: gravado sem IMEI')
+            if l['usar_pix']:
+                motivos.append('precisa revisao: gravado todo em pix')
+            bloco = self.bloco(l, idx)
+            campos = {k: l[k] for k in CAMPOS_ARMAZEM}
+            if l['usar_pix']:
+                campos.update(pix=l['valor_venda'], dinheiro=0, cartao_credito=0, cartao_debito=0, troca_aparelho=0)
+            self.armazem.linha(orig_linha, motivo='; '.join(motivos), row=row, **campos)
+            return bloco
+        except Exception as e:
+            print(f'  ERRO na linha {row.get("orig_linha", "?")}: {e}')
+            self.stats['erros'] += 1
+            self.armazem.linha(orig_linha, 'pulada', f'erro: {e}', row=row)
+            return None
+
+    def bloco(self, l, idx):
+        ids, stats, used_imeis = self.ids, self.stats, self.used_imeis
+        idempotente, importacao_id = self.idempotente, self.importacao_id
+        chave_bloco = idx + 1 if l['orig_linha'] is None else l['orig_linha']
+        precisa_revisao, data, data_iso = l['precisa_revisao'], l['data'], l['data_iso']
+        modelo, imei, estado, observacao = l['modelo'], l['imei'], l['estado'], l['observacao']
+        loja_id, vendedor_id = l['loja_id'], l['vendedor_id']
+        valor_venda, custo, brinde_val = l['valor_venda'], l['custo'], l['brinde']
+        pix, dinheiro = l['pix'], l['dinheiro']
+        cartao_credito, cartao_debito = l['cartao_credito'], l['cartao_debito']
+        troca_valor, modelo_troca = l['troca_aparelho'], l['modelo_troca']
+        soma_pagamentos, usar_pix = l['soma_pagamentos'], l['usar_pix']
+        sql_lines = []
+
+        if l['orig_linha']:
+            chave = ids.chave_linha(l['orig_linha'])
+        else:
+            chave = ids.chave_linha(data_iso, imei or modelo, vendedor_id, loja_id)
+        aparelho_id = ids.gerar('aparelhos', chave, data=data_iso)
+        venda_id = ids.gerar('vendas', chave, data=data_iso)
+        marca = extract_brand(modelo)
+        cond = condicao_from_estado(estado)
+
+        if not imei:
+            stats['sem_imei'] += 1
+            imei_sql = 'NULL'
+        elif imei in used_imeis:
+            stats['imei_duplicado'] += 1
+            imei_sql = 'NULL'
+        else:
+            used_imeis.add(imei)
+            imei_sql = f"'{imei}'"
+
+        criado_em_timestamp = f"'{data_iso}T14:00:00'"
+        vendedor_sql = f"'{vendedor_id}'" if vendedor_id else 'NULL'
+        observacao_sql = sql_texto(observacao) if observacao else 'NULL'
+
+        # Pagamentos da linha: lista de (tipo, valor, observacao)
+        if usar_pix:
+            pagamentos = [('pix', valor_venda, None)]
+        else:
+            pagamentos = [(tipo, valor, None) for tipo, valor in
+                          [('pix', pix), ('dinheiro', dinheiro), ('cartao_credito', cartao_credito), ('cartao_debito', cartao_debito)]
+                          if valor and valor > 0]
+            if troca_valor and troca_valor > 0:
+                obs_troca = f"Troca: {modelo_troca}" if modelo_troca else "Troca de aparelho"
+                pagamentos.append(('troca_aparelho', troca_valor, obs_troca))
+                stats['trocas'] += 1
+        stats['pagamentos'] += len(pagamentos)
+
+        saldo_devedor = round(valor_venda - soma_pagamentos, 2)
+        sql_lines.append(f'-- LINHA {chave_bloco} [{precisa_revisao}]: {modelo} ({data})')
+
+        if idempotente:
+            # Venda primeiro: o aparelho ja entra com venda_id (sem UPDATE de vinculo)
+            sql_lines.append(sql_upsert('vendas', {
+                'id': f"'{venda_id}'", 'cliente_id': "current_setting('importacao.cliente_id')::uuid",
+                'loja_id': loja_id, 'vendedor_id': vendedor_sql, 'status': "'concluida'", 'tipo': "'normal'",
+                'valor_total': valor_venda, 'valor_pago': soma_pagamentos, 'saldo_devedor': saldo_devedor,
+                'criado_em': f"'{data_iso}'", 'finalizado_em': f"'{data_iso}'", 'finalizado_por': vendedor_sql,
+            }))
+            sql_lines.append(sql_upsert('aparelhos', {
+                'id': f"'{aparelho_id}'", 'marca': f"'{marca}'", 'modelo': sql_texto(modelo), 'imei': imei_sql,
+                'valor_venda': valor_venda, 'valor_compra': custo, 'loja_id': loja_id, 'estado': f"'{estado}'",
+                'condicao': f"'{cond}'", 'status': "'vendido'", 'data_venda': f"'{data_iso}'",
+                'data_entrada': f"'{data_iso}'", 'criado_por': vendedor_sql, 'criado_em': f"'{data_iso}'",
+                'atualizado_em': 'now()', 'observacoes': observacao_sql, 'venda_id': f"'{venda_id}'",
+            }))
+            for tipo, valor, obs in pagamentos:
+                sql_lines.append(sql_upsert('pagamentos_venda', {
+                    'id': f"'{ids.gerar('pagamentos_venda', chave, tipo, data=data_iso)}'", 'venda_id': f"'{venda_id}'",
+                    'tipo_pagamento': f"'{tipo}'", 'valor': round(valor, 2), 'data_pagamento': f"'{data_iso}'",
+                    'criado_por': vendedor_sql, 'observacao': sql_texto(obs) if obs else 'NULL',
+                    'parcelas': 1, 'criado_em': criado_em_timestamp,
+                }))
+            # Pagamentos que esta linha gerava numa execucao anterior e nao gera mais
+            # (ids deterministas: so apaga o que a propria importacao criou)
+            usados = {t for t, _, _ in pagamentos}
+            obsoletos = [ids.gerar('pagamentos_venda', chave, t, data=data_iso) for t in TIPOS_PAGAMENTO if t not in usados]
+            if obsoletos:
+                sql_lines.append(f"DELETE FROM pagamentos_venda WHERE id IN ({', '.join(f'{chr(39)}{x}{chr(39)}' for x in obsoletos)});")
+        else:
+            # Aparelho
+            sql_lines.append(f"INSERT INTO aparelhos (id, marca, modelo, imei, valor_venda, valor_compra, loja_id, estado, condicao, status, data_venda, data_entrada, criado_por, criado_em, atualizado_em, observacoes)")
+            sql_lines.append(f"VALUES ('{aparelho_id}', '{marca}', {sql_texto(modelo)}, {imei_sql}, {valor_venda}, {custo}, {loja_id}, '{estado}', '{cond}', 'vendido', '{data_iso}', '{data_iso}', {vendedor_sql}, '{data_iso}', '{data_iso}', {observacao_sql});")
+
+            # Venda
+            sql_lines.append(f"INSERT INTO vendas (id, numero_venda, cliente_id, loja_id, vendedor_id, status, tipo, valor_total, valor_pago, saldo_devedor, criado_em, finalizado_em, finalizado_por)")
+            sql_lines.append(f"VALUES ('{venda_id}', current_setting('importacao.proximo_numero')::int + {stats['vendas']}, current_setting('importacao.cliente_id')::uuid, {loja_id}, {vendedor_sql}, 'concluida', 'normal', {valor_venda}, {soma_pagamentos}, {saldo_devedor}, '{data_iso}', '{data_iso}', {vendedor_sql});")
+
+            # Vincular
+            sql_lines.append(f"UPDATE aparelhos SET venda_id = '{venda_id}' WHERE id = '{aparelho_id}';")
+
+            # Pagamentos
+            for tipo, valor, obs in pagamentos:
+                pagto_id = ids.gerar('pagamentos_venda', chave, tipo, data=data_iso)
+                if obs:
+                    sql_lines.append(f"INSERT INTO pagamentos_venda (id, venda_id, tipo_pagamento, valor, data_pagamento, criado_por, observacao, parcelas, criado_em)")
+                    sql_lines.append(f"VALUES ('{pagto_id}', '{venda_id}', '{tipo}', {round(valor, 2)}, '{data_iso}', {vendedor_sql}, '{obs}', 1, {criado_em_timestamp});")
+                else:
+                    sql_lines.append(f"INSERT INTO pagamentos_venda (id, venda_id, tipo_pagamento, valor, data_pagamento, criado_por, parcelas, criado_em)")
+                    sql_lines.append(f"VALUES ('{pagto_id}', '{venda_id}', '{tipo}', {round(valor, 2)}, '{data_iso}', {vendedor_sql}, 1, {criado_em_timestamp});")
+        stats['aparelhos'] += 1
+        stats['vendas'] += 1
+
+        # Brinde
+        brinde_id = ids.gerar('brindes_aparelhos', chave, data=data_iso)
+        if brinde_val and brinde_val > 0:
+            if idempotente:
+                sql_lines.append(sql_upsert('brindes_aparelhos', {
+                    'id': f"'{brinde_id}'", 'loja_id': loja_id, 'venda_id': f"'{venda_id}'", 'descricao': "'Brinde'",
+                    'valor_custo': round(brinde_val, 2), 'data_ocorrencia': f"'{data_iso}'",
+                    'criado_por': vendedor_sql, 'criado_em': f"'{data_iso}'",
+                }))
+            else:
+                sql_lines.append(f"INSERT INTO brindes_aparelhos (id, loja_id, venda_id, descricao, valor_custo, data_ocorrencia, criado_por, criado_em)")
+                sql_lines.append(f"VALUES ('{brinde_id}', {loja_id}, '{venda_id}', 'Brinde', {round(brinde_val, 2)}, '{data_iso}', {vendedor_sql}, '{data_iso}');")
+            stats['brindes'] += 1
+        elif idempotente:
+            sql_lines.append(f"DELETE FROM brindes_aparelhos WHERE id = '{brinde_id}';")
+
+        sql_lines.append(sql_marcar_venda(importacao_id, aparelho_id))
+        self.venda_ids.append(venda_id)
+        l['venda_id'], l['aparelho_id'] = venda_id, aparelho_id
+        return Bloco(chave_bloco, '\n'.join(sql_lines))
+
+
+def gerar_sql(idempotente=False, estrategia_ids=None, carga_massiva=False, importacao_id=None, shard=None):
+    """SQL inteiro, stats e blocos; com `shard` (chave de SHARDS), stats['shards'] = {valor: [Bloco]}."""
+    importacao_id = id_importacao('importar_tudo', importacao_id)
+    estrategia_ids = estrategia_ids or ('determinista' if idempotente else 'aleatorio')
+    ids = GeradorIds(estrategia_ids, fonte=PLANILHA)
+    if idempotente and not ids.determinista:
+        sys.exit('--idempotente precisa de ids deterministas (--ids determinista ou tempo)')
+    if not idempotente and ids.determinista:
+        sys.exit(f'--ids {estrategia_ids} so com --idempotente: sem ele o Cliente Balcao e apagado e recriado '
+                 'com os mesmos ids, que ficariam registrados na importacao anterior')
+
+    rows = ler_csv()
 
     nao_rows = [r for r in rows if r.get('precisa_revisao', '').strip() == 'NAO']
     sim_rows = [r for r in rows if r.get('precisa_revisao', '').strip() == 'SIM']
@@ -92,6 +543,8 @@ def gerar_sql():
     sql_lines.append('-- ============================================')
     sql_lines.append(f'-- Script completo de importacao - {datetime.now()}')
     sql_lines.append(f'-- Fonte: vendas_final.csv ({len(rows)} linhas)')
+    if idempotente:
+        sql_lines.append('-- Modo idempotente: ids deterministas + ON CONFLICT (sem limpeza)')
     sql_lines.append('-- ============================================')
     sql_lines.append('')
     sql_lines.append('BEGIN;')
@@ -103,7 +556,10 @@ def gerar_sql():
     sql_lines.append('-- ============================================')
     sql_lines.append('-- 1. LIMPAR DADOS EXISTENTES (Cliente Balcao)')
     sql_lines.append('-- ============================================')
-    sql_lines.append("""
+    if idempotente:
+        sql_lines.append('-- PULADO: modo idempotente (upsert por id deterministico)')
+    else:
+        sql_lines.append("""
 DO $$
 DECLARE
     v_cliente_id UUID;
@@ -141,22 +597,10 @@ $$;
     sql_lines.append('-- ============================================')
     sql_lines.append('-- 2. CRIAR CLIENTE PADRAO')
     sql_lines.append('-- ============================================')
-    sql_lines.append("""
-INSERT INTO clientes (id, nome, id_loja, criado_em, atualizado_em)
-SELECT gen_random_uuid(), 'Cliente Balcao', 1, NOW(), NOW()
-WHERE NOT EXISTS (SELECT 1 FROM clientes WHERE nome = 'Cliente Balcao');
-""".strip())
+    sql_lines.append(SQL_CLIENTE_PADRAO)
     sql_lines.append('')
-    sql_lines.append("""
-DO $$
-DECLARE
-    v_cliente_id UUID;
-BEGIN
-    SELECT id INTO v_cliente_id FROM clientes WHERE nome = 'Cliente Balcao' LIMIT 1;
-    PERFORM set_config('importacao.cliente_id', v_cliente_id::text, true);
-END;
-$$;
-""".strip())
+    sql_lines.append(f'-- Importacao {importacao_id} (desfazer: scripts/reverter_importacao.py {importacao_id})')
+    sql_lines.append(sql_abrir_tudo(importacao_id, fonte_ids(ids), idempotente))
     sql_lines.append('')
 
     # ====================================================
@@ -167,9 +611,15 @@ $$;
     sql_lines.append('-- ============================================')
     sql_lines.append('')
 
-    used_imeis = set()
+    # So depois da limpeza: com replica os ON DELETE CASCADE tambem nao disparam
+    if carga_massiva:
+        sql_lines.append(SQL_CARGA_MASSIVA_INICIO)
+        sql_lines.append('')
+
     # Buscar max numero_venda atual para continuar a sequencia
-    sql_lines.append("""
+    # (idempotente: numero_venda fica com o default nextval do banco)
+    if not idempotente:
+        sql_lines.append("""
 DO $$
 DECLARE
     v_max INT;
@@ -179,135 +629,47 @@ BEGIN
 END;
 $$;
 """.strip())
-    sql_lines.append('')
-
-    stats = {
-        'aparelhos': 0, 'vendas': 0, 'pagamentos': 0,
-        'brindes': 0, 'trocas': 0, 'sem_imei': 0, 'imei_duplicado': 0, 'erros': 0,
-    }
+        sql_lines.append('')
 
+    montador = MontadorLinhas(ids, idempotente, importacao_id)
+    stats = montador.stats
+    blocos = []  # uma entrada por linha importada (modo --lote)
+    shards = {}
+    vendas_shard = {}  # valor -> venda_ids do shard (fim da carga massiva por shard)
     for idx, row in enumerate(rows):
-        precisa_revisao = row.get('precisa_revisao', '').strip()
-        is_sim = (precisa_revisao == 'SIM')
-
         try:
-            data = row.get('data', '').strip()
-            data_iso = to_date(data)
-            if not data_iso:
-                print(f'  AVISO: data invalida "{data}", linha {row.get("orig_linha")}')
-                stats['erros'] += 1
-                continue
-
-            modelo = row.get('modelo', '').strip()
-            imei = row.get('imei', '').strip().replace(' ', '')
-            valor_venda = parse_decimal(row.get('valor_venda', ''))
-            custo = parse_decimal(row.get('custo', ''))
-            brinde_val = parse_decimal(row.get('brinde', ''))
-            loja_id_raw = row.get('loja_id', '1').strip()
-            loja_id = LOJA_MAP.get(loja_id_raw.upper(), LOJA_MAP.get(loja_id_raw, 1))
-            estado = row.get('estado', 'seminovo').strip().lower()
-            vendedor_id = row.get('vendedor_id', '').strip()
-            observacao = row.get('observacao', '').strip()
-
-            pix = parse_decimal(row.get('pix', ''))
-            dinheiro = parse_decimal(row.get('dinheiro', ''))
-            cartao_credito = parse_decimal(row.get('cartao_credito', ''))
-            cartao_debito = parse_decimal(row.get('cartao_debito', ''))
-            troca_valor = parse_decimal(row.get('troca_aparelho', ''))
-            modelo_troca = row.get('modelo_troca', '').strip()
-            valor_troca = parse_decimal(row.get('valor_troca', ''))
-
-            if is_sim:
-                soma_pagamentos = valor_venda
-                usar_pix = True
-            else:
-                soma_pagamentos = pix + dinheiro + cartao_credito + cartao_debito + troca_valor
-                usar_pix = False
-
-            if valor_venda <= 0 or vendedor_id == '':
-                stats['erros'] += 1
-                continue
-
-            aparelho_id = str(uuid.uuid4())
-            venda_id = str(uuid.uuid4())
-            marca = extract_brand(modelo)
-            cond = condicao_from_estado(estado)
-
-            if not imei:
-                stats['sem_imei'] += 1
-                imei_sql = 'NULL'
-            elif imei in used_imeis:
-                stats['imei_duplicado'] += 1
-                imei_sql = 'NULL'
-            else:
-                used_imeis.add(imei)
-                imei_sql = f"'{imei}'"
-
-            criado_em_timestamp = f"'{data_iso}T14:00:00'"
-            vendedor_sql = f"'{vendedor_id}'" if vendedor_id else 'NULL'
-            observacao_sql = f"'{observacao.replace(chr(39), chr(39) + chr(39))}'" if observacao else 'NULL'
-
-            sql_lines.append(f'-- LINHA {row.get("orig_linha", idx+1)} [{precisa_revisao}]: {modelo} ({data})')
-
-            # Aparelho
-            sql_lines.append(f"INSERT INTO aparelhos (id, marca, modelo, imei, valor_venda, valor_compra, loja_id, estado, condicao, status, data_venda, data_entrada, criado_por, criado_em, atualizado_em, observacoes)")
-            sql_lines.append(f"VALUES ('{aparelho_id}', '{marca}', '{modelo.replace(chr(39), chr(39) + chr(39))}', {imei_sql}, {valor_venda}, {custo}, {loja_id}, '{estado}', '{cond}', 'vendido', '{data_iso}', '{data_iso}', {vendedor_sql}, '{data_iso}', '{data_iso}', {observacao_sql});")
-            stats['aparelhos'] += 1
-
-            # Venda
-            saldo_devedor = round(valor_venda - soma_pagamentos, 2)
-            sql_lines.append(f"INSERT INTO vendas (id, numero_venda, cliente_id, loja_id, vendedor_id, status, tipo, valor_total, valor_pago, saldo_devedor, criado_em, finalizado_em, finalizado_por)")
-            sql_lines.append(f"VALUES ('{venda_id}', current_setting('importacao.proximo_numero')::int + {stats['vendas']}, current_setting('importacao.cliente_id')::uuid, {loja_id}, {vendedor_sql}, 'concluida', 'normal', {valor_venda}, {soma_pagamentos}, {saldo_devedor}, '{data_iso}', '{data_iso}', {vendedor_sql});")
-            stats['vendas'] += 1
-
-            # Vincular
-            sql_lines.append(f"UPDATE aparelhos SET venda_id = '{venda_id}' WHERE id = '{aparelho_id}';")
-
-            # Pagamentos
-            if usar_pix:
-                pagto_id = str(uuid.uuid4())
-                sql_lines.append(f"INSERT INTO pagamentos_venda (id, venda_id, tipo_pagamento, valor, data_pagamento, criado_por, parcelas, criado_em)")
-                sql_lines.append(f"VALUES ('{pagto_id}', '{venda_id}', 'pix', {round(valor_venda, 2)}, '{data_iso}', {vendedor_sql}, 1, {criado_em_timestamp});")
-                stats['pagamentos'] += 1
-            else:
-                for tipo, valor in [('pix', pix), ('dinheiro', dinheiro), ('cartao_credito', cartao_credito), ('cartao_debito', cartao_debito)]:
-                    if valor and valor > 0:
-                        pagto_id = str(uuid.uuid4())
-                        sql_lines.append(f"INSERT INTO pagamentos_venda (id, venda_id, tipo_pagamento, valor, data_pagamento, criado_por, parcelas, criado_em)")
-                        sql_lines.append(f"VALUES ('{pagto_id}', '{venda_id}', '{tipo}', {round(valor, 2)}, '{data_iso}', {vendedor_sql}, 1, {criado_em_timestamp});")
-                        stats['pagamentos'] += 1
-
-                if troca_valor and troca_valor > 0:
-                    pagto_id = str(uuid.uuid4())
-                    obs_troca = f"Troca: {modelo_troca}" if modelo_troca else "Troca de aparelho"
-                    sql_lines.append(f"INSERT INTO pagamentos_venda (id, venda_id, tipo_pagamento, valor, data_pagamento, criado_por, observacao, parcelas, criado_em)")
-                    sql_lines.append(f"VALUES ('{pagto_id}', '{venda_id}', 'troca_aparelho', {round(troca_valor, 2)}, '{data_iso}', {vendedor_sql}, '{obs_troca}', 1, {criado_em_timestamp});")
-                    stats['pagamentos'] += 1
-                    stats['trocas'] += 1
-
-            # Brinde
-            if brinde_val and brinde_val > 0:
-                brinde_id = str(uuid.uuid4())
-                sql_lines.append(f"INSERT INTO brindes_aparelhos (id, loja_id, venda_id, descricao, valor_custo, data_ocorrencia, criado_por, criado_em)")
-                sql_lines.append(f"VALUES ('{brinde_id}', {loja_id}, '{venda_id}', 'Brinde', {round(brinde_val, 2)}, '{data_iso}', {vendedor_sql}, '{data_iso}');")
-                stats['brindes'] += 1
-
-            sql_lines.append('')
-
+            l = ler_linha(row)
         except Exception as e:
-            print(f'  ERRO na linha {row.get("orig_linha", "?")}: {e}')
-            stats['erros'] += 1
+            l = e
+        bloco = montador.processar(row, l, idx)
+        if bloco is None:
             continue
-
-    # Atualizar sequence
-    sql_lines.append("""
+        blocos.append(bloco)
+        if shard:
+            shards.setdefault(SHARDS[shard](l), []).append(bloco)
+            vendas_shard.setdefault(SHARDS[shard](l), []).append(l['venda_id'])
+        sql_lines.append(bloco.sql)
+        sql_lines.append('')
+    venda_ids = montador.venda_ids
+
+    # Atualizar sequence (idempotente ja usa o nextval, nao precisa)
+    if not idempotente:
+        sql_lines.append("""
 -- Atualizar sequence
 SELECT setval('vendas_numero_venda_seq', (SELECT max(numero_venda) FROM vendas));
 """.strip())
-    sql_lines.append('')
+        sql_lines.append('')
+
+    if carga_massiva:
+        sql_lines.append('-- Carga massiva: historico set-based + conferencia de FKs')
+        sql_lines.append(sql_carga_massiva_fim(venda_ids))
+        sql_lines.append('')
 
     sql_lines.append('COMMIT;')
     sql_lines.append('')
+    if carga_massiva:
+        sql_lines.append(SQL_ANALYZE)
+        sql_lines.append('')
     sql_lines.append('-- ============================================')
     sql_lines.append('-- RESUMO')
     sql_lines.append(f'-- Aparelhos: {stats["aparelhos"]}')
@@ -320,16 +682,104 @@ SELECT setval('vendas_numero_venda_seq', (SELECT max(numero_venda) FROM vendas))
     sql_lines.append(f'-- Erros:     {stats["erros"]}')
     sql_lines.append('-- ============================================')
 
-    return '\n'.join(sql_lines), stats
+    stats['venda_ids'] = venda_ids
+    stats['importacao_id'] = importacao_id
+    stats['fonte'] = fonte_ids(ids)
+    stats['shards'] = shards
+    stats['vendas_shard'] = vendas_shard
+    montador.armazem.gravar()
+    return '\n'.join(sql_lines), stats, blocos
+
+
+def gravar_shards(stats, shard, carga_massiva=False, destino=SHARDS_DIR):
+    """Um .sql por shard + 00_comum / 99_fim em `destino` (os .sql antigos saem). Retorna os caminhos."""
+    os.makedirs(destino, exist_ok=True)
+    for antigo in os.listdir(destino):
+        if antigo.endswith('.sql'):
+            os.remove(os.path.join(destino, antigo))
+    imp = stats['importacao_id']
+    arquivos = {'00_comum.sql': ['BEGIN;', SQL_CLIENTE_PADRAO, sql_abrir_tudo(imp, stats['fonte']), 'COMMIT;']}
+    for valor, blocos in sorted(stats['shards'].items()):
+        corpo = [f'-- Importacao {imp}, shard {shard}={valor}: {len(blocos)} linhas (rodar depois do 00_comum.sql)',
+                 'BEGIN;', SQL_CLIENTE_PADRAO]
+        if carga_massiva:
+            corpo.append(SQL_CARGA_MASSIVA_INICIO)
+        corpo += [b.sql for b in blocos]
+        if carga_massiva:
+            # na mesma transacao: com o replica ainda ligado a conferencia de FKs roda
+            corpo.append(sql_carga_massiva_fim(stats['vendas_shard'][valor]))
+        corpo.append('COMMIT;')
+        arquivos[f'{shard}_{re.sub(r"[^0-9A-Za-z-]", "_", valor)}.sql'] = corpo
+    if carga_massiva:
+        arquivos['99_fim.sql'] = ['-- Depois de TODOS os shards', SQL_ANALYZE]
+    caminhos = []
+    for nome, corpo in arquivos.items():
+        caminhos.append(os.path.join(destino, nome))
+        with open(caminhos[-1], 'w', encoding='utf-8') as f:
+            f.write('\n\n'.join(corpo) + '\n')
+    return caminhos
+
+
+def importar_async(tamanho_lote, estrategia_ids=None, carga_massiva=False, importacao_id=None):
+    """
+    --lote N --async: sem gerar o .sql inteiro antes. ler_linha roda num pool
+    de processos enquanto os lotes ja montados sao gravados (pipeline_async).
+    """
+    estrategia_ids = estrategia_ids or 'determinista'
+    ids = GeradorIds(estrategia_ids, fonte=PLANILHA)
+    if not ids.determinista:
+        sys.exit('--lote precisa de ids deterministas (--ids determinista ou tempo)')
+    importacao_id = id_importacao('importar_tudo', importacao_id)
+    montador = MontadorLinhas(ids, True, importacao_id)
+    rows = ler_csv()
+    quarentena = os.path.join(ROOT, 'scripts', 'importacao_completa_quarentena.csv')
+    print(f'Importacao {importacao_id}: {len(rows)} linhas, lotes de {tamanho_lote} (pipeline assincrono)')
+
+    def posambulo():
+        if not carga_massiva:
+            return ''
+        return sql_carga_massiva_fim(montador.venda_ids, conferir_fks=False) + '\n' + SQL_ANALYZE
+
+    conn = conectar(arg_valor('--dsn'))
+    st = carregar_async(conn, 'importar_tudo', rows, ler_linha, montador.processar,
+                        tamanho_lote=tamanho_lote, trabalhadores=arg_valor('--trabalhadores', tipo=int),
+                        preambulo=SQL_CLIENTE_PADRAO + '\n' + sql_abrir_tudo(importacao_id, fonte_ids(ids)),
+                        posambulo=posambulo, quarentena=quarentena, retomar='--retomar' in sys.argv)
+    st.update(montador.stats)
+    montador.armazem.gravar()
+    return st
 
 
 if __name__ == '__main__':
-    sql, stats = gerar_sql()
-
+    perfilador.ativar()
+    tamanho_lote = arg_valor('--lote', tipo=int)
+    # --lote implica --idempotente: com ids deterministas e upsert, refazer um
+    # lote (quarentena, queda de conexao) nunca duplica venda
+    carga_massiva = '--carga-massiva' in sys.argv
+    shard = arg_valor('--shards')
+    if shard and shard not in SHARDS:
+        sys.exit(f'--shards {shard}: use {", ".join(SHARDS)}')
+    if shard and '--async' in sys.argv:
+        sys.exit('--shards nao combina com --async (cada shard ja tem a sua conexao)')
+    if tamanho_lote and '--async' in sys.argv:
+        perfilador.etapa('carga_async')
+        st = importar_async(tamanho_lote, arg_valor('--ids'), carga_massiva, arg_valor('--importacao'))
+        print(f'\nLotes: {st["lotes"]} | aplicadas: {st["aplicados"]} | '
+              f'quarentena: {st["quarentena"]} | ja confirmadas antes: {st["pulados"]} | erros: {st["erros"]}')
+        print(f'Tempo: total {st["t_total"]:.2f}s | parse {st["t_parse"]:.2f}s (pool) | '
+              f'montagem {st["t_montagem"]:.2f}s | escrita {st["t_escrita"]:.2f}s')
+        sys.exit(0)
+    perfilador.etapa('sql')
+    sql, stats, blocos = gerar_sql(idempotente='--idempotente' in sys.argv or tamanho_lote is not None or bool(shard),
+                                   estrategia_ids=arg_valor('--ids'), carga_massiva=carga_massiva,
+                                   importacao_id=arg_valor('--importacao'), shard=shard)
+
+    perfilador.etapa('gravacao')
     with open(SQL_PATH, 'w', encoding='utf-8') as f:
         f.write(sql)
 
     print(f'\nSQL gerado: {SQL_PATH}')
+    print(f'Importacao: {stats["importacao_id"]} (desfazer: scripts/reverter_importacao.py {stats["importacao_id"]})')
     print(f'Tamanho: {len(sql.splitlines())} linhas')
     print(f'  Aparelhos:  {stats["aparelhos"]}')
     print(f'  Vendas:     {stats["vendas"]}')
@@ -339,9 +789,51 @@ if __name__ == '__main__':
     print(f'  Sem IMEI:   {stats["sem_imei"]}')
     print(f'  IMEI dup:   {stats["imei_duplicado"]}')
     print(f'  Erros:      {stats["erros"]}')
-
-    if '--executar' in sys.argv:
+    if shard:
+        print(f'Shards por {shard}: ' + ', '.join(f'{k} ({len(v)})' for k, v in sorted(stats['shards'].items())))
+
+    if shard and not tamanho_lote:
+        caminhos = gravar_shards(stats, shard, carga_massiva)
+        print(f'\nShards em {SHARDS_DIR}: {len(caminhos)} arquivos. Ordem: 00_comum.sql; os {shard}_*.sql '
+              f'em paralelo (ex.: ls {shard}_*.sql | xargs -P 4 -n 1 psql -v ON_ERROR_STOP=1 -f)'
+              + ('; 99_fim.sql' if carga_massiva else ''))
+    elif shard:
+        quarentena = os.path.join(ROOT, 'scripts', 'importacao_completa_quarentena.csv')
+        conexoes = arg_valor('--conexoes', 4, int)
+        print(f'\nAplicando {len(stats["shards"])} shards em ate {conexoes} conexoes, '
+              f'lotes de {tamanho_lote} (quarentena: {quarentena})...')
+        perfilador.etapa('aplicacao')
+        posambulo = ''
+        if carga_massiva:
+            posambulo = sql_carga_massiva_fim(stats['venda_ids'], conferir_fks=False) + '\n' + SQL_ANALYZE
+        abrir = sql_abrir_tudo(stats['importacao_id'], stats['fonte'])
+        st = carregar_paralelo(arg_valor('--dsn'), 'importar_tudo', stats['shards'],
+                               preambulo=SQL_CLIENTE_PADRAO, inicio=SQL_CLIENTE_PADRAO + '\n' + abrir,
+                               posambulo=posambulo, conexoes=conexoes, tamanho_lote=tamanho_lote,
+                               retomar='--retomar' in sys.argv, quarentena=quarentena,
+                               perfil=arg_valor('--perfil', 'livre'))
+        print(f'\nShards: {len(st["shards"])} | lotes: {st["lotes"]} | aplicadas: {st["aplicados"]} | '
+              f'quarentena: {st["quarentena"]} | ja confirmadas antes: {st["pulados"]} | {st["t_shards"]:.2f}s')
+    elif tamanho_lote:
+        quarentena = os.path.join(ROOT, 'scripts', 'importacao_completa_quarentena.csv')
+        print(f'\nAplicando em lotes de {tamanho_lote} linhas (quarentena: {quarentena})...')
+        perfilador.etapa('aplicacao')
+        conn = conectar(arg_valor('--dsn'))
+        posambulo = ''
+        if carga_massiva:
+            posambulo = sql_carga_massiva_fim(stats['venda_ids'], conferir_fks=False) + '\n' + SQL_ANALYZE
+        preambulo = SQL_CLIENTE_PADRAO + '\n' + sql_abrir_tudo(stats['importacao_id'], stats['fonte'])
+        st = carregar(conn, 'importar_tudo', blocos, preambulo=preambulo, posambulo=posambulo,
+                      tamanho_lote=tamanho_lote, retomar='--retomar' in sys.argv,
+                      quarentena=quarentena, perfil=arg_valor('--perfil', 'livre'))
+        print(f'\nLotes: {st["lotes"]} | aplicadas: {st["aplicados"]} | '
+              f'quarentena: {st["quarentena"]} | ja confirmadas antes: {st["pulados"]}')
+        if st.get('latencia_max') is not None:
+            print(f'Latencia por lote: media {st["latencia_media"] * 1000:.0f}ms, '
+                  f'max {st["latencia_max"] * 1000:.0f}ms, commit p95 {st["commit_p95"] * 1000:.0f}ms')
+    elif '--executar' in sys.argv:
         print('\nTransferindo e executando na VPS...')
+        perfilador.etapa('ssh')
         subprocess.run([
             'scp', SQL_PATH, 'vps:/tmp/importacao_completa.sql'
         ], check=True)
@@ -13,13 +13,26 @@ Nao executa nada no banco. Gera SQL para revisao.
 
 Uso:
   python3 scripts/importar_vendas_aparelhos2.py
+  python3 scripts/importar_vendas_aparelhos2.py --ids tempo   # UUIDv7 pela data da venda
+  python3 scripts/importar_vendas_aparelhos2.py --importacao ID   # desfazer: reverter_importacao.py ID
 """
-import csv, os, uuid, re, sys
+import csv, os, re, sys
 from datetime import datetime
 
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 CSV_PATH = os.path.join(ROOT, 'scripts', 'vendas_aparelhos2_final.csv')
 SQL_PATH = os.path.join(ROOT, 'scripts', 'importar_vendas_aparelhos2.sql')
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+from importacao_ids import GeradorIds
+from importacao_cli import arg_valor
+from importacao_registro import id_importacao, sql_abrir, sql_marcar_venda
+from modelos import extract_brand
+import armazem
+import perfilador
+perfilador.ativar()
+ids = GeradorIds(arg_valor('--ids', 'aleatorio'))
+IMPORTACAO_ID = id_importacao('importar_vendas_aparelhos2', arg_valor('--importacao'))
+LOTE = armazem.Lote(IMPORTACAO_ID, 'importar_vendas_aparelhos2', os.path.basename(CSV_PATH))
 
 START_NUMERO_VENDA = 11496
 
@@ -34,18 +47,6 @@ IMEIS_EXISTENTES = {
     'C4H61040G83Q8YQA3', 'C4H6123284GQ8YQAZ', 'CH07LGKN17', 'V865532083172607',
 }
 
-def extract_brand(modelo):
-    m = modelo.upper().strip()
-    if any(m.startswith(p) for p in ('IPHONE', 'IPAD', 'MAC', 'APPLE', 'FONTE APPLE', 'FONTE ORIGINAL APPLE')):
-        return 'Apple'
-    if m.startswith('SAMSUNG'): return 'Samsung'
-    if m.startswith('REDMI') or m.startswith('MI '): return 'Xiaomi'
-    if m.startswith('POCO') or m.startswith('XIAOMI'): return 'Xiaomi'
-    if m.startswith('REALME'): return 'Realme'
-    if m.startswith('NOTE'): return 'Redmi'
-    if m.startswith('MACBOOK'): return 'Apple'
-    return 'Outros'
-
 def condicao_from_estado(estado):
     e = estado.lower().strip()
     if e == 'novo': return 'perfeito'
@@ -101,6 +102,8 @@ BEGIN
 END;
 $$;
 """)
+sql.append(sql_abrir(IMPORTACAO_ID, 'importar_vendas_aparelhos2', os.path.basename(CSV_PATH)))
+sql.append('')
 
 numero_venda = START_NUMERO_VENDA
 stats = {
@@ -135,26 +138,32 @@ for row in rows:
     if vendedor.strip().upper() == 'ANGEL':
         sql.append(f'-- PULADO (Angel): linha {linha} - {modelo}')
         stats['pulados_angel'] += 1
+        LOTE.linha(linha, 'pulada', 'Angel', row=row)
         continue
 
     # ── Regra 2: pular IMEI duplicado no banco ────────────────────────────
     if imei and imei in IMEIS_EXISTENTES:
         sql.append(f'-- PULADO (IMEI ja existe): linha {linha} - {modelo} [{imei}]')
         stats['pulados_imei_dup'] += 1
+        LOTE.linha(linha, 'pulada', 'IMEI ja existe', row=row)
         continue
 
     # ── Validacoes basicas ────────────────────────────────────────────────
     if not data_iso:
         sql.append(f'-- PULADO (data invalida): linha {linha} - {modelo}')
+        LOTE.linha(linha, 'pulada', 'data invalida', row=row)
         continue
     if valor_venda <= 0:
         sql.append(f'-- PULADO (valor zero): linha {linha} - {modelo}')
+        LOTE.linha(linha, 'pulada', 'valor zero', row=row)
         continue
     if not vendedor_id:
         sql.append(f'-- PULADO (sem vendedor_id): linha {linha} - {modelo} [{vendedor}]')
+        LOTE.linha(linha, 'pulada', 'sem vendedor_id', row=row)
         continue
     if not loja_id:
         sql.append(f'-- PULADO (sem loja): linha {linha} - {modelo}')
+        LOTE.linha(linha, 'pulada', 'sem loja', row=row)
         continue
 
     # ── Regra 3: sem IMEI → NULL ──────────────────────────────────────────
@@ -167,6 +176,7 @@ for row in rows:
     # ── Regra 4: diff de pagamento → forcar pix = valor_venda ────────────
     soma = pix + dinheiro + cartao_credito + cartao_debito + troca
     diferenca = round(valor_venda - soma, 2)
+    forcado = ''
 
     if precisa_revisao == 'SIM' and abs(diferenca) > 0.01 and diferenca > 0:
         # Faltou valor: forcamos pix = valor_venda inteiro, zeramos o resto
@@ -178,7 +188,8 @@ for row in rows:
         modelo_troca = ''
         soma = valor_venda
         stats['pix_forcado'] += 1
-        observacao = (observacao + '; ' if observacao else '') + 'pgto forcado pix (diff nao extraida)'
+        forcado = 'pgto forcado pix (diff nao extraida)'
+        observacao = (observacao + '; ' if observacao else '') + forcado
 
     elif precisa_revisao == 'SIM' and abs(diferenca) > 0.01 and diferenca < 0:
         # Extraiu mais que a venda (pagamento conjunto de outros itens) → pix = valor_venda
@@ -190,13 +201,14 @@ for row in rows:
         modelo_troca = ''
         soma = valor_venda
         stats['pix_forcado'] += 1
-        observacao = (observacao + '; ' if observacao else '') + 'pgto forcado pix (extracao excedeu venda)'
+        forcado = 'pgto forcado pix (extracao excedeu venda)'
+        observacao = (observacao + '; ' if observacao else '') + forcado
 
     saldo_devedor = 0.0  # todas quitadas
     marca = extract_brand(modelo)
     cond = condicao_from_estado(estado)
-    aparelho_id = str(uuid.uuid4())
-    venda_id = str(uuid.uuid4())
+    aparelho_id = ids.gerar('aparelhos', data=data_iso)
+    venda_id = ids.gerar('vendas', data=data_iso)
     numero_venda += 1
 
     ts = f"'{data_iso}T14:00:00+00'"
@@ -241,7 +253,7 @@ for row in rows:
     ]
     for tipo, valor in pagamentos:
         if valor > 0:
-            pid = str(uuid.uuid4())
+            pid = ids.gerar('pagamentos_venda', data=data_iso)
             sql.append(
                 f"INSERT INTO pagamentos_venda "
                 f"(id, venda_id, tipo_pagamento, valor, data_pagamento, criado_por, parcelas, criado_em) "
@@ -249,7 +261,7 @@ for row in rows:
             )
 
     if troca > 0:
-        pid = str(uuid.uuid4())
+        pid = ids.gerar('pagamentos_venda', data=data_iso)
         obs_troca = esc(f'Troca: {modelo_troca}') if modelo_troca else 'Troca de aparelho'
         sql.append(
             f"INSERT INTO pagamentos_venda "
@@ -260,7 +272,7 @@ for row in rows:
 
     # Brinde
     if brinde > 0:
-        bid = str(uuid.uuid4())
+        bid = ids.gerar('brindes_aparelhos', data=data_iso)
         sql.append(
             f"INSERT INTO brindes_aparelhos "
             f"(id, loja_id, venda_id, descricao, valor_custo, data_ocorrencia, criado_por, criado_em) "
@@ -268,8 +280,13 @@ for row in rows:
         )
         stats['brindes'] += 1
 
+    sql.append(sql_marcar_venda(IMPORTACAO_ID, aparelho_id))
     sql.append('')
     stats['importados'] += 1
+    LOTE.linha(linha, motivo=forcado, row=row,
+               data_iso=data_iso, pix=pix, dinheiro=dinheiro, cartao_credito=cartao_credito,
+               cartao_debito=cartao_debito, troca_aparelho=troca, modelo_troca=modelo_troca,
+               venda_id=venda_id, aparelho_id=aparelho_id)
 
 sql.append('COMMIT;')
 sql.append('')
@@ -283,10 +300,12 @@ sql.append(f'-- Pix forcado:         {stats["pix_forcado"]}')
 sql.append(f'-- Brindes:             {stats["brindes"]}')
 sql.append(f'-- Trocas:              {stats["trocas"]}')
 sql.append(f'-- Ultimo numero_venda: {numero_venda}')
+sql.append(f'-- Importacao:          {IMPORTACAO_ID}')
 sql.append('-- ============================================================')
 
 with open(SQL_PATH, 'w', encoding='utf-8') as f:
     f.write('\n'.join(sql))
+LOTE.gravar()
 
 print(f'\nSQL gerado: {SQL_PATH}')
 print(f'  Importados:          {stats["importados"]}')
@@ -9,18 +9,36 @@ Correcoes em relacao aos lotes anteriores:
   - LOJA_MAP corrigido: ONLINE -> 21 (antes ia pro 4/ESTOQUE).
   - Dedup por IMEI contra o BANCO AO VIVO (snapshot _snapshot_imeis_vendidos.txt).
   - numero_venda NAO e setado (usa o default nextval do banco -> unico).
-  - Sem-IMEI: dedup heuristico por modelo+valor (snapshot). Provavel duplicata =>
-    pulada; provavel nova => importada com imei NULL (marcada para revisao).
+  - Sem-IMEI: dedup heuristico por modelo canonico (modelos.py) + valor (snapshot).
+    Provavel duplicata => pulada; provavel nova => importada com imei NULL (revisao).
 
 NAO executa nada. Gera scripts/importar_vendas_aparelhos3.sql para revisao.
-  python3 scripts/importar_vendas_aparelhos3.py
+  python3 scripts/importar_vendas_aparelhos3.py [CSV] [SQL] [--importacao ID]
+  --atualizar-snapshot: atualiza os _snapshot_* antes (snapshot_banco.py, IMPORTACAO_DSN)
+  --confianca 0.8: corte do resolvedor de nomes para vendedor/loja fora dos mapas
+Vendedor/loja: mapas abaixo primeiro; grafia nova (RENNAN, BLOCO  B) passa pelo
+resolvedor_nomes.py e, acima do corte, entra com um comentario no SQL.
+Cada linha fica anotada em importacao_registros; se a execucao der errado:
+  python3 scripts/reverter_importacao.py ID
 """
-import csv, re, uuid, os, sys
+import csv, re, uuid, os, sys, time
 
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+from importacao_cli import arg_valor, args_posicionais
+from importacao_registro import id_importacao, sql_abrir, sql_marcar_venda
+from modelos import detectar_estado, extract_brand, parse_modelo
+import regex_seguro as rx
+import armazem
+import resolvedor_nomes
+import perfilador
+perfilador.ativar()
 # Aceita CSV de entrada e SQL de saida como argumentos (default: lote 3)
-CSV_PATH = sys.argv[1] if len(sys.argv) > 1 else os.path.join(ROOT, 'vendas_aparelhos3.csv')
-SQL_PATH = sys.argv[2] if len(sys.argv) > 2 else os.path.join(ROOT, 'scripts', 'importar_vendas_aparelhos3.sql')
+ARGS = args_posicionais(com_valor=('--importacao', '--confianca'))
+CSV_PATH = ARGS[0] if len(ARGS) > 0 else os.path.join(ROOT, 'vendas_aparelhos3.csv')
+SQL_PATH = ARGS[1] if len(ARGS) > 1 else os.path.join(ROOT, 'scripts', 'importar_vendas_aparelhos3.sql')
+IMPORTACAO_ID = id_importacao('importar_vendas_aparelhos3', arg_valor('--importacao'))
+LOTE = armazem.Lote(IMPORTACAO_ID, 'importar_vendas_aparelhos3', os.path.basename(CSV_PATH))
 SNAP_IMEIS = os.path.join(ROOT, 'scripts', '_snapshot_imeis_todos.txt')
 SNAP_MV = os.path.join(ROOT, 'scripts', '_snapshot_modelo_valor.txt')
 
@@ -41,65 +59,62 @@ VENDEDOR_MAP = {
     'Yasmin':       'e07d4d35-1381-4d4d-914d-8382a7456fdd',  # Yasmin Monteiro
     'Luiz Henrique':'0dd2c938-c6dd-4f5d-aac5-ed045ee5d2fb',  # -> Luiz Felipe (decisao anterior)
 }
-# Lookup case-insensitive + apelidos (master mistura MARCELA/Marcela, Raissa/Rayssa, etc.)
-VENDEDOR_LC = {k.lower(): v for k, v in VENDEDOR_MAP.items()}
-VENDEDOR_LC['raissa'] = VENDEDOR_MAP['Rayssa']   # grafia da planilha
 LOJA_MAP = {
     'CELL': 1, 'BALCAO': 1, 'CASES': 19, 'BLOCO B': 20,
     'ONLINE': 21,  # CORRIGIDO (antes ia pro 4/ESTOQUE)
     '': 1,         # loja em branco -> CELL (as 4 em branco sao todas da Renata/CELL)
 }
+# Mapas como apelidos (vencem o cadastro); a chave do resolvedor ja ignora caixa,
+# acento e letra dobrada (MARCELA/Marcela, Raissa/Rayssa, RENNAN/Renan)
+VENDEDORES = resolvedor_nomes.vendedores(VENDEDOR_MAP)
+LOJAS = resolvedor_nomes.lojas({k: v for k, v in LOJA_MAP.items() if k})
+CONFIANCA_MIN = arg_valor('--confianca', resolvedor_nomes.CONFIANCA_MIN, float)
 
 # ── Helpers de parsing (copiados de normalizar_vendas2.py) ────────────────────
 def parse_brl(v):
     if not v or not v.strip(): return 0.0
-    v = re.sub(r'^R?\$\s*', '', v.strip()).replace('.', '').replace(',', '.')
+    v = rx.sub(r'^R?\$\s*', '', v.strip()).replace('.', '').replace(',', '.')
     try: return float(v)
     except: return 0.0
 
 def to_date(datestr):
     if not datestr or not datestr.strip(): return None
-    m = re.match(r'(\d{2})/(\d{2})/(\d{4})', datestr.strip())
+    m = rx.match(r'(\d{2})/(\d{2})/(\d{4})', datestr.strip())
     return f'{m.group(3)}-{m.group(2)}-{m.group(1)}' if m else None
 
-def detectar_estado(modelo):
-    m = modelo.upper()
-    if 'NOVO' in m: return 'novo'
-    if 'SEMINOVO' in m: return 'seminovo'
-    if 'USADO' in m: return 'usado'
-    return 'seminovo'
-
 def condicao_from_estado(estado):
     e = (estado or '').lower().strip()
     if e == 'novo': return 'perfeito'
     if e == 'usado': return 'regular'
     return 'bom'  # seminovo e demais
 
-def extract_brand(modelo):
-    m = modelo.upper().strip()
-    if m.startswith(('IPHONE', 'IPAD', 'MAC', 'APPLE', 'WATCH')): return 'Apple'
-    if m.startswith('SAMSUNG') or m.startswith('GALAXY'): return 'Samsung'
-    if m.startswith('REDMI') or m.startswith('MI '): return 'Xiaomi'
-    if m.startswith('REALME'): return 'Realme'
-    return 'Outros'
-
 def normalizar_pagamento(texto):
+    # com prazo: texto patologico vai para revisao em vez de travar o lote
+    try:
+        with rx.prazo(texto or ''):
+            return _normalizar_pagamento(texto)
+    except rx.PrazoEsgotado as e:
+        return {'formas': 'nao_analisado', 'pix': 0, 'dinheiro': 0,
+                'cartao_credito': 0, 'cartao_debito': 0, 'troca': 0,
+                'modelo_troca': '', 'precisa_revisao': 'SIM', 'motivo': f'pagamento nao analisado ({e})'}
+
+def _normalizar_pagamento(texto):
     if not texto or not texto.strip():
         return {'formas': 'nao_informado', 'pix': 0, 'dinheiro': 0, 'cartao_credito': 0,
                 'cartao_debito': 0, 'troca': 0, 'modelo_troca': '', 'precisa_revisao': 'SIM',
                 'motivo': 'sem forma de pagamento'}
     t = texto.strip(); t_upper = t.upper()
-    if 'PAGAMENTO JUNTO' in t_upper and re.search(r'APARELHO\s*[234]', t_upper):
+    if 'PAGAMENTO JUNTO' in t_upper and rx.search(r'APARELHO\s*[234]', t_upper):
         return {'formas': 'pagamento_junto_secundario', 'pix': 0, 'dinheiro': 0, 'cartao_credito': 0,
                 'cartao_debito': 0, 'troca': 0, 'modelo_troca': '', 'precisa_revisao': 'SIM',
                 'motivo': 'pagamento junto - aparelho 2+'}
-    if re.match(r'^GARANTIA', t_upper):
+    if rx.match(r'^GARANTIA', t_upper):
         return {'formas': 'garantia', 'pix': 0, 'dinheiro': 0, 'cartao_credito': 0,
                 'cartao_debito': 0, 'troca': 0, 'modelo_troca': '', 'precisa_revisao': 'SIM',
                 'motivo': 'garantia - revisar manualmente'}
     resultado = {'pix': 0.0, 'dinheiro': 0.0, 'cartao_credito': 0.0, 'cartao_debito': 0.0,
                  'troca': 0.0, 'modelo_troca': ''}
-    troca_match = re.search(
+    troca_match = rx.search(
         r'(?:entrou?|entrada|entrando|pegando|trocando)[^\d/]*(?:um|uma|iphone|samsung|redmi|realme)?[^R$\d]*'
         r'([A-Za-z0-9 ]+?)(?:\s+(?:por|a|no valor de|seminovo|novo|usado)\s*)?(?:R\$\s*)?(\d[\d.,]*)', t, re.IGNORECASE)
     if troca_match:
@@ -111,13 +126,13 @@ def normalizar_pagamento(texto):
         t_sem_troca = t[:troca_match.start()].strip()
     else:
         t_sem_troca = t
-    partes = re.split(r'\s*/\s*|\s*\+\s*', t_sem_troca)
+    partes = rx.split(r'\s*/\s*|\s*\+\s*', t_sem_troca)
     formas = set()
     for parte in partes:
         parte = parte.strip()
         if not parte: continue
         p = parte.upper()
-        vm = re.search(r'R?\$?\s*([\d.,]+)', parte)
+        vm = rx.search(r'R?\$?\s*([\d.,]+)', parte)
         val = 0.0
         if vm:
             raw = vm.group(1).replace('.', '').replace(',', '.')
@@ -126,7 +141,7 @@ def normalizar_pagamento(texto):
         if 'PIX' in p or 'PX' in p: resultado['pix'] += val; formas.add('pix')
         elif 'DINHEIRO' in p or 'REAIS' in p: resultado['dinheiro'] += val; formas.add('dinheiro')
         elif 'DEBITO' in p or 'DÉBITO' in p: resultado['cartao_debito'] += val; formas.add('cartao_debito')
-        elif re.search(r'CREDITO|CRÉDITO|CARTAO|CARTÃO|\d+[Xx]', p): resultado['cartao_credito'] += val; formas.add('cartao_credito')
+        elif rx.search(r'CREDITO|CRÉDITO|CARTAO|CARTÃO|\d+[Xx]', p): resultado['cartao_credito'] += val; formas.add('cartao_credito')
         elif resultado['troca'] > 0 and 'ENTRADA' in p: pass
         elif val > 0 and not formas: resultado['pix'] += val; formas.add('pix?')
     if resultado['troca'] > 0: formas.add('troca_aparelho')
@@ -142,22 +157,32 @@ def esc(s):
     return (s or '').replace("'", "''")
 
 # ── Snapshots do banco (dedup) ────────────────────────────────────────────────
+if '--atualizar-snapshot' in sys.argv:
+    from carregador import conectar
+    from snapshot_banco import atualizar_tudo, resumo
+    # mesmo caminho do snapshot_banco.py (coberto por scripts/verificar_snapshot.py)
+    print('\n'.join(resumo(*atualizar_tudo(conectar()))))
+    VENDEDORES = resolvedor_nomes.vendedores(VENDEDOR_MAP)
+    LOJAS = resolvedor_nomes.lojas({k: v for k, v in LOJA_MAP.items() if k})
+else:
+    _idade = (time.time() - os.path.getmtime(SNAP_IMEIS)) / 3600
+    if _idade > 24:
+        print(f'AVISO: snapshot do banco tem {_idade:.0f}h - rode com --atualizar-snapshot')
 imeis_vendidos = set(l.strip() for l in open(SNAP_IMEIS) if l.strip())
-mv_por_valor = {}   # valor -> list de modelos completos (para dedup sem-imei)
+mv_por_chave = {}   # (familia, linha canonica, valor) -> [Modelo] vendidos (dedup sem-imei)
 for l in open(SNAP_MV):
     if '|' not in l: continue
     mod, val = l.rsplit('|', 1)
     try: v = round(float(val.strip()), 2)
     except: continue
-    mv_por_valor.setdefault(v, []).append(mod.strip().upper())
+    m = parse_modelo(mod)
+    mv_por_chave.setdefault((m.familia, m.linha, v), []).append(m)
 
 def existe_por_modelo_valor(modelo_csv, valor):
-    """Heuristica p/ sem-IMEI: existe aparelho vendido com esse modelo (contido) e valor?"""
-    mc = modelo_csv.strip().upper()
-    for m in mv_por_valor.get(round(valor, 2), []):
-        if mc and mc in m:
-            return True
-    return False
+    """Heuristica p/ sem-IMEI: existe aparelho vendido do mesmo modelo canonico e valor?"""
+    mc = parse_modelo(modelo_csv)
+    if not mc.linha: return False
+    return any(mc.compativel(m) for m in mv_por_chave.get((mc.familia, mc.linha, round(valor, 2)), ()))
 
 # ── Ler CSV cru ───────────────────────────────────────────────────────────────
 rows = list(csv.reader(open(CSV_PATH, encoding='utf-8-sig')))[1:]
@@ -176,53 +201,76 @@ BEGIN
     END IF;
     PERFORM set_config('importacao.cliente_id', v_cliente_id::text, true);
 END $$;""")
+sql.append(sql_abrir(IMPORTACAO_ID, 'importar_vendas_aparelhos3', os.path.basename(CSV_PATH)))
 sql.append('')
 
 st = {'importados': 0, 'imei_dup_banco': 0, 'imei_dup_csv': 0, 'sem_vendedor': 0,
       'sem_loja': 0, 'valor_zero': 0, 'data_inval': 0, 'pix_forcado': 0,
-      'brindes': 0, 'trocas': 0, 'sem_imei_novo': 0, 'sem_imei_dup': 0}
-sem_vendedor_nomes = set(); revisar_sem_imei = []; imeis_csv = {}
+      'brindes': 0, 'trocas': 0, 'sem_imei_novo': 0, 'sem_imei_dup': 0, 'nome_aproximado': 0}
+sem_vendedor_nomes = set(); revisar_sem_imei = []; imeis_csv = {}; aproximados = {}
 
 for idx, r in enumerate(rows, start=2):
     def col(i): return r[i].strip() if len(r) > i else ''
     data = col(0); modelo = col(1)
-    imei = re.sub(r'\D', '', col(2))          # so digitos (igual ao snapshot/banco)
+    imei = rx.sub(r'\D', '', col(2))          # so digitos (igual ao snapshot/banco)
     if len(imei) < 14: imei = ''              # <14 digitos = lixo -> trata como sem-IMEI
     valor = parse_brl(col(3)); brinde = parse_brl(col(4)); custo = parse_brl(col(5))
     forma = col(6); vendedor = col(11); loja = col(12).upper()
     data_iso = to_date(data)
+    arm = dict(origem=r, data_iso=data_iso, modelo=modelo, imei=imei, valor_venda=valor, custo=custo,
+               brinde=brinde, forma_orig=forma, vendedor=vendedor, loja=loja)
 
     # validacoes / dedup / mapeamento
     if data_iso is None:
-        sql.append(f'-- PULADO (data invalida) linha {idx}: {modelo}'); st['data_inval'] += 1; continue
+        sql.append(f'-- PULADO (data invalida) linha {idx}: {modelo}'); st['data_inval'] += 1
+        LOTE.linha(idx, 'pulada', 'data invalida', **arm); continue
     if valor <= 0:
-        sql.append(f'-- PULADO (valor zero) linha {idx}: {modelo}'); st['valor_zero'] += 1; continue
-    vendedor_id = VENDEDOR_LC.get(vendedor.strip().lower())
-    if not vendedor_id:
-        sql.append(f'-- PULADO (vendedor sem cadastro "{vendedor}") linha {idx}: {modelo}')
-        sem_vendedor_nomes.add(vendedor); st['sem_vendedor'] += 1; continue
+        sql.append(f'-- PULADO (valor zero) linha {idx}: {modelo}'); st['valor_zero'] += 1
+        LOTE.linha(idx, 'pulada', 'valor zero', **arm); continue
+    rv = VENDEDORES.resolver(vendedor)
+    if not rv.id or rv.confianca < CONFIANCA_MIN:
+        palpite = f' (palpite {rv.nome}, {rv.confianca:.2f})' if rv.nome else ''
+        sql.append(f'-- PULADO (vendedor sem cadastro "{vendedor}"){palpite} linha {idx}: {modelo}')
+        sem_vendedor_nomes.add(vendedor); st['sem_vendedor'] += 1
+        LOTE.linha(idx, 'pulada', 'vendedor sem cadastro', **arm); continue
+    vendedor_id = arm['vendedor_id'] = rv.id
     loja_id = LOJA_MAP.get(loja)
+    rl = None
+    if loja_id is None:
+        rl = LOJAS.resolver(loja)
+        loja_id = rl.id if rl.confianca >= CONFIANCA_MIN else None
     if not loja_id:
-        sql.append(f'-- PULADO (loja sem mapeamento "{loja}") linha {idx}: {modelo}'); st['sem_loja'] += 1; continue
+        sql.append(f'-- PULADO (loja sem mapeamento "{loja}") linha {idx}: {modelo}'); st['sem_loja'] += 1
+        LOTE.linha(idx, 'pulada', 'loja sem mapeamento', **arm); continue
+    arm['loja_id'] = loja_id
+    for texto, r in ((vendedor, rv), (loja, rl)):
+        if r and r.via != 'apelido':   # fora dos mapas: fica visivel no SQL e no resumo
+            sql.append(f'-- NOME "{texto}" -> {r.nome} ({r.via}, confianca {r.confianca:.2f}) linha {idx}')
+            aproximados[texto] = r; st['nome_aproximado'] += 1
 
     if imei:
         if os.environ.get('SO_SEM_IMEI') == '1':
-            continue   # passada exclusiva dos sem-IMEI: pula os com-IMEI (ja importados)
+            # passada exclusiva dos sem-IMEI: pula os com-IMEI (ja importados)
+            LOTE.linha(idx, 'pulada', 'SO_SEM_IMEI', **arm); continue
         if imei in imeis_vendidos:
-            sql.append(f'-- PULADO (IMEI ja existe no banco) linha {idx}: {modelo} [{imei}]'); st['imei_dup_banco'] += 1; continue
+            sql.append(f'-- PULADO (IMEI ja existe no banco) linha {idx}: {modelo} [{imei}]'); st['imei_dup_banco'] += 1
+            LOTE.linha(idx, 'pulada', 'IMEI ja existe no banco', **arm); continue
         if imei in imeis_csv:
-            sql.append(f'-- PULADO (IMEI repetido no CSV, linha {imeis_csv[imei]}) linha {idx}: {modelo} [{imei}]'); st['imei_dup_csv'] += 1; continue
+            sql.append(f'-- PULADO (IMEI repetido no CSV, linha {imeis_csv[imei]}) linha {idx}: {modelo} [{imei}]'); st['imei_dup_csv'] += 1
+            LOTE.linha(idx, 'pulada', f'IMEI repetido no CSV (linha {imeis_csv[imei]})', **arm); continue
         imeis_csv[imei] = idx
         imei_sql = f"'{esc(imei)}'"
     else:
         # sem IMEI -> dedup heuristico modelo+valor
         if existe_por_modelo_valor(modelo, valor):
             sql.append(f'-- PULADO (SEM IMEI, provavel duplicata por modelo+valor) linha {idx}: {modelo} R$ {valor}')
-            st['sem_imei_dup'] += 1; continue
+            st['sem_imei_dup'] += 1
+            LOTE.linha(idx, 'pulada', 'sem IMEI, provavel duplicata por modelo+valor', **arm); continue
         st['sem_imei_novo'] += 1
         revisar_sem_imei.append((idx, modelo, valor, vendedor, loja))
         if os.environ.get('SO_IMEI') == '1':
             sql.append(f'-- SEGURADO p/ revisao (SEM IMEI) linha {idx}: {modelo} R$ {valor} | {vendedor} | {loja}')
+            LOTE.linha(idx, 'pulada', 'sem IMEI, segurada p/ revisao', **arm)
             continue
         imei_sql = 'NULL'
 
@@ -280,8 +328,12 @@ for idx, r in enumerate(rows, start=2):
             f"SELECT gen_random_uuid(), {loja_id}, venda_id, 'Brinde', {round(brinde,2)}, '{data_iso}', {vd}, {ts} "
             f"FROM aparelhos WHERE id = '{aparelho_id}';")
         st['brindes'] += 1
+    sql.append(sql_marcar_venda(IMPORTACAO_ID, aparelho_id))
     sql.append('')
     st['importados'] += 1
+    # venda_id sai do default do banco (ver o WITH acima): so o aparelho_id e conhecido
+    LOTE.linha(idx, motivo=obs, pix=pix, dinheiro=din, cartao_credito=cc, cartao_debito=cd, troca_aparelho=troca,
+               modelo_troca=modelo_troca, precisa_revisao=pg['precisa_revisao'], aparelho_id=aparelho_id, **arm)
 
 sql.append('COMMIT;')
 
@@ -296,14 +348,18 @@ resumo = [
     f"-- Pulados sem-IMEI dup:    {st['sem_imei_dup']}  (heuristica modelo+valor)",
     f"-- Pulados vendedor s/cad:  {st['sem_vendedor']}  {sorted(sem_vendedor_nomes)}",
     f"-- Pulados loja s/mapa:     {st['sem_loja']}",
+    f"-- Nomes fora dos mapas:    {st['nome_aproximado']}  "
+    + ', '.join(f'{t} -> {r.nome} ({r.confianca:.2f})' for t, r in sorted(aproximados.items())),
     f"-- Pulados valor zero:      {st['valor_zero']}",
     f"-- Pulados data invalida:   {st['data_inval']}",
     f"-- Pgto forcado pix:        {st['pix_forcado']}",
     f"-- Brindes / Trocas:        {st['brindes']} / {st['trocas']}",
+    f"-- Importacao:              {IMPORTACAO_ID}  (desfazer: scripts/reverter_importacao.py {IMPORTACAO_ID})",
     '-- =========================================',
 ]
 sql += [''] + resumo
 open(SQL_PATH, 'w', encoding='utf-8').write('\n'.join(sql))
+LOTE.gravar()
 
 print('\n'.join(l[3:] if l.startswith('-- ') else l for l in resumo))
 print(f'\nSQL gerado (NAO executado): {SQL_PATH}')
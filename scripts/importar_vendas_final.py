@@ -5,11 +5,20 @@ Gera script SQL para importar vendas_final.csv no banco.
 Modos:
   padrao:  processa linhas com precisa_revisao = NAO (pagamentos individuais)
   --apenas-sim: processa linhas com precisa_revisao = SIM (1 Pix = valor_venda)
+  --ids tempo:  UUIDv7 pela data da venda em vez de uuid4 (ver importacao_ids.py)
+  --importacao ID: id da importacao (desfazer com scripts/reverter_importacao.py ID)
 """
-import csv, os, uuid, re, sys
+import csv, os, re, sys
 from datetime import datetime
 
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+from importacao_ids import GeradorIds
+from importacao_cli import arg_valor
+from importacao_registro import id_importacao, sql_abrir, sql_marcar_venda
+from modelos import extract_brand
+import armazem
+import perfilador
 CSV_PATH = os.path.join(ROOT, 'scripts', 'vendas_final.csv')
 
 # UUID do Angel (encontrado no banco)
@@ -22,22 +31,6 @@ LOJA_MAP = {
     '20': 20, 'BLOCO B': 20,
 }
 
-def extract_brand(modelo):
-    m = modelo.upper().strip()
-    if m.startswith('IPHONE') or m.startswith('IPAD') or m.startswith('MAC') or m.startswith('APPLE'):
-        return 'Apple'
-    if m.startswith('SAMSUNG'):
-        return 'Samsung'
-    if m.startswith('REDMI') or m.startswith('MI '):
-        return 'Xiaomi'
-    if m.startswith('REALME'):
-        return 'Realme'
-    if m.startswith('NOTE'):
-        return 'Redmi'
-    if m.startswith('BOMBOX'):
-        return 'Bombox'
-    return 'Outros'
-
 def condicao_from_estado(estado):
     estado = estado.lower().strip()
     if estado == 'novo':
@@ -74,7 +67,10 @@ def parse_decimal(val):
     except:
         return 0.0
 
-def gerar_sql(start_numero_venda, apenas_sim=False):
+def gerar_sql(start_numero_venda, apenas_sim=False, estrategia_ids='aleatorio', importacao_id=None):
+    ids = GeradorIds(estrategia_ids, fonte='vendas_final')
+    importacao_id = id_importacao('importar_vendas_final', importacao_id)
+    lote = armazem.Lote(importacao_id, 'importar_vendas_final', os.path.basename(CSV_PATH))
     with open(CSV_PATH, 'r', encoding='utf-8-sig') as f:
         reader = csv.DictReader(f)
         rows = list(reader)
@@ -124,6 +120,8 @@ END;
 $$;
 """.strip())
     sql_lines.append('')
+    sql_lines.append(sql_abrir(importacao_id, 'importar_vendas_final', 'vendas_final.csv'))
+    sql_lines.append('')
 
     numero_venda = start_numero_venda
     used_imeis = set()
@@ -145,6 +143,7 @@ $$;
             if not data_iso:
                 print(f'  AVISO: data invalida "{data}", ignorando linha {row.get("orig_linha")}')
                 stats['erros'] += 1
+                lote.linha(row.get('orig_linha'), 'pulada', 'data invalida', row=row)
                 continue
 
             modelo = row.get('modelo', '').strip()
@@ -179,11 +178,12 @@ $$;
 
             if valor_venda <= 0 or vendedor_id == '':
                 stats['erros'] += 1
+                lote.linha(row.get('orig_linha'), 'pulada', 'sem valor ou sem vendedor', row=row)
                 continue
 
             numero_venda += 1
-            aparelho_id = str(uuid.uuid4())
-            venda_id = str(uuid.uuid4())
+            aparelho_id = ids.gerar('aparelhos', data=data_iso)
+            venda_id = ids.gerar('vendas', data=data_iso)
             marca = extract_brand(modelo)
             cond = condicao_from_estado(estado)
 
@@ -196,6 +196,7 @@ $$;
             else:
                 used_imeis.add(imei)
                 imei_sql = f"'{imei}'"
+            motivo = 'IMEI repetido no CSV: gravado sem IMEI' if imei and imei_sql == 'NULL' else ''
 
             criado_em_timestamp = f"'{data_iso}T14:00:00'"
             vendedor_sql = f"'{vendedor_id}'" if vendedor_id else 'NULL'
@@ -219,7 +220,7 @@ $$;
 
             # Pagamentos - modo SIM: 1 Pix = valor_venda
             if usar_pix:
-                pagto_id = str(uuid.uuid4())
+                pagto_id = ids.gerar('pagamentos_venda', data=data_iso)
                 sql_lines.append(f"INSERT INTO pagamentos_venda (id, venda_id, tipo_pagamento, valor, data_pagamento, criado_por, parcelas, criado_em)")
                 sql_lines.append(f"VALUES ('{pagto_id}', '{venda_id}', 'pix', {round(valor_venda, 2)}, '{data_iso}', {vendedor_sql}, 1, {criado_em_timestamp});")
                 stats['pagamentos'] += 1
@@ -233,14 +234,14 @@ $$;
                 ]
                 for tipo, valor in pagamentos:
                     if valor and valor > 0:
-                        pagto_id = str(uuid.uuid4())
+                        pagto_id = ids.gerar('pagamentos_venda', data=data_iso)
                         sql_lines.append(f"INSERT INTO pagamentos_venda (id, venda_id, tipo_pagamento, valor, data_pagamento, criado_por, parcelas, criado_em)")
                         sql_lines.append(f"VALUES ('{pagto_id}', '{venda_id}', '{tipo}', {round(valor, 2)}, '{data_iso}', {vendedor_sql}, 1, {criado_em_timestamp});")
                         stats['pagamentos'] += 1
 
                 # Pagamento de troca (se houver)
                 if troca_valor and troca_valor > 0:
-                    pagto_id = str(uuid.uuid4())
+                    pagto_id = ids.gerar('pagamentos_venda', data=data_iso)
                     obs_troca = f"Troca: {modelo_troca}" if modelo_troca else "Troca de aparelho"
                     sql_lines.append(f"INSERT INTO pagamentos_venda (id, venda_id, tipo_pagamento, valor, data_pagamento, criado_por, observacao, parcelas, criado_em)")
                     sql_lines.append(f"VALUES ('{pagto_id}', '{venda_id}', 'troca_aparelho', {round(troca_valor, 2)}, '{data_iso}', {vendedor_sql}, '{obs_troca}', 1, {criado_em_timestamp});")
@@ -249,16 +250,22 @@ $$;
 
             # Brinde (se houver)
             if brinde_val and brinde_val > 0:
-                brinde_id = str(uuid.uuid4())
+                brinde_id = ids.gerar('brindes_aparelhos', data=data_iso)
                 sql_lines.append(f"INSERT INTO brindes_aparelhos (id, loja_id, venda_id, descricao, valor_custo, data_ocorrencia, criado_por, criado_em)")
                 sql_lines.append(f"VALUES ('{brinde_id}', {loja_id}, '{venda_id}', 'Brinde', {round(brinde_val, 2)}, '{data_iso}', {vendedor_sql}, '{data_iso}');")
                 stats['brindes'] += 1
 
+            sql_lines.append(sql_marcar_venda(importacao_id, aparelho_id))
             sql_lines.append('')
+            pagos = ({'pix': valor_venda, 'dinheiro': 0, 'cartao_credito': 0, 'cartao_debito': 0, 'troca_aparelho': 0}
+                     if usar_pix else {})
+            lote.linha(row.get('orig_linha'), motivo=motivo, row=row, data_iso=data_iso, imei=imei, loja_id=loja_id,
+                       venda_id=venda_id, aparelho_id=aparelho_id, **pagos)
 
         except Exception as e:
             print(f'  ERRO na linha {row.get("orig_linha", "?")}: {e}')
             stats['erros'] += 1
+            lote.linha(row.get('orig_linha'), 'pulada', f'erro: {e}', row=row)
             continue
 
     sql_lines.append('COMMIT;')
@@ -275,10 +282,13 @@ $$;
     sql_lines.append(f'-- Erros:     {stats["erros"]}')
     sql_lines.append('-- ============================================')
 
+    stats['importacao_id'] = importacao_id
+    lote.gravar()
     return '\n'.join(sql_lines), stats, sql_path
 
 
 if __name__ == '__main__':
+    perfilador.ativar()
     apenas_sim = '--apenas-sim' in sys.argv
 
     if apenas_sim:
@@ -287,12 +297,14 @@ if __name__ == '__main__':
     else:
         start_numero_venda = 11064
 
-    sql, stats, sql_path = gerar_sql(start_numero_venda, apenas_sim)
+    sql, stats, sql_path = gerar_sql(start_numero_venda, apenas_sim, arg_valor('--ids', 'aleatorio'),
+                                     arg_valor('--importacao'))
 
     with open(sql_path, 'w', encoding='utf-8') as f:
         f.write(sql)
 
     print(f'\nSQL gerado: {sql_path}')
+    print(f'Importacao: {stats["importacao_id"]}')
     print(f'Tamanho: {len(sql.splitlines())} linhas')
     print(f'  Aparelhos:  {stats["aparelhos"]}')
     print(f'  Vendas:     {stats["vendas"]}')
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Ingestao das planilhas: cada arquivo de origem vira UMA copia UTF-8 limpa,
+em cache por hash do conteudo, e todo parser le a copia.
+
+  1. encoding detectado uma vez por arquivo: BOM utf-8 / utf-8 valido /
+     senao cp1252 (o Excel brasileiro) com fallback latin-1
+  2. mojibake reparado numa passada so sobre o texto inteiro: cada sequencia
+     que e utf-8 lido como cp1252/latin-1 ('Ã£' -> 'ã', 'Ã‡' -> 'Ç', 'MÃŠS'
+     -> 'MÊS'; duplo 'ÃƒÂ£' em duas passadas) volta ao caractere. So troca
+     quando os bytes formam utf-8 valido, entao 'CARTÃO' de verdade fica.
+  3. resultado gravado em _cache_csv/<sha256 da origem>.csv: arquivo igual
+     = cache quente, sem reler nem reparar.
+
+Antes cada script abria o mesmo CSV com um encoding (latin-1, utf-8,
+utf-8-sig) e normalizar_forma() transcodificava valor por valor.
+
+  from ingestao_csv import arquivo_limpo
+  caminho_utf8 = arquivo_limpo('venda_aparelhos.csv')
+"""
+import hashlib, os, re
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '_cache_csv')
+# Mudou a deteccao/reparo? incremente: invalida as copias em cache
+VERSAO = 1
+
+# caractere (como aparece quando o byte e lido em cp1252, ou latin-1 nos
+# buracos do cp1252) -> byte original
+_BYTE = {}
+for _b in range(0x80, 0x100):
+    try:
+        _BYTE[bytes([_b]).decode('cp1252')] = _b
+    except UnicodeDecodeError:
+        _BYTE[chr(_b)] = _b
+_CONT = ''.join(re.escape(c) for c, b in _BYTE.items() if b <= 0xBF)
+_INICIO = ''.join(re.escape(c) for c, b in _BYTE.items() if 0xC2 <= b <= 0xF4)
+RE_MOJIBAKE = re.compile(f'[{_INICIO}][{_CONT}]{{1,3}}')
+
+
+def detectar_encoding(dados):
+    """'utf-8-sig', 'utf-8' ou 'cp1252'/'latin-1' (bytes que nao sao utf-8)."""
+    if dados.startswith(b'\xef\xbb\xbf'):
+        return 'utf-8-sig'
+    try:
+        dados.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    try:
+        dados.decode('cp1252')
+        return 'cp1252'
+    except UnicodeDecodeError:
+        return 'latin-1'
+
+
+def _reparar(m):
+    s = m.group(0)
+    try:
+        return bytes(_BYTE[c] for c in s).decode('utf-8')
+    except UnicodeDecodeError:
+        return s
+
+
+def reparar_mojibake(texto, passadas=2):
+    """Desfaz utf-8 decodificado como cp1252/latin-1 (ate `passadas` camadas)."""
+    for _ in range(passadas):
+        novo = RE_MOJIBAKE.sub(_reparar, texto)
+        if novo == texto:
+            break
+        texto = novo
+    return texto
+
+
+def texto_limpo(dados):
+    """bytes da planilha -> (texto utf-8 reparado, encoding detectado)."""
+    enc = detectar_encoding(dados)
+    return reparar_mojibake(dados.decode(enc)), enc
+
+
+def arquivo_limpo(caminho):
+    """Caminho da copia UTF-8 reparada de `caminho` (gera na 1a vez)."""
+    with open(caminho, 'rb') as f:
+        dados = f.read()
+    chave = hashlib.sha256(dados + f'|v{VERSAO}'.encode()).hexdigest()
+    destino = os.path.join(CACHE_DIR, f'{chave}.csv')
+    if os.path.exists(destino):
+        return destino
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    texto, _ = texto_limpo(dados)
+    tmp = f'{destino}.{os.getpid()}.tmp'
+    with open(tmp, 'w', encoding='utf-8', newline='') as f:
+        f.write(texto)
+    os.replace(tmp, destino)
+    return destino
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Leitura das planilhas de venda por coluna projetada, sem DictReader.
+
+O cabecalho e resolvido UMA vez por arquivo: cada campo pedido vira um indice
+de coluna (apelidos, acento e mojibake do cabecalho - 'MES', 'MÊS', 'MÃŠS' -
+resolvidos aqui, nao em cada linha). Cada linha sai como namedtuple com os
+valores ja sem espacos nas pontas: nada de dict por linha nem hash de chave
+por campo. O arquivo passa antes pelo ingestao_csv (encoding/mojibake);
+.xlsx e lido direto da planilha, em streaming (leitor_xlsx).
+
+  from leitor_csv import ler_vendas
+  for l in ler_vendas(caminho):
+      l.modelo, l.forma, l.valor_venda ...   # str ('' se a coluna nao existe)
+"""
+import csv, unicodedata
+from collections import namedtuple
+
+from ingestao_csv import arquivo_limpo
+from leitor_xlsx import linhas_xlsx
+
+# campo -> nomes aceitos no cabecalho (comparados sem acento, em maiusculas)
+COLUNAS_VENDA = {
+    'data':        ('DATA',),
+    'modelo':      ('MODELO',),
+    'imei':        ('IMEI',),
+    'valor_venda': ('VALOR DE VENDA', 'VALOR VENDA'),
+    'brinde':      ('BRINDE',),
+    'custo':       ('CUSTO APARELHO', 'CUSTO'),
+    'forma':       ('FORMA DE PAGAMENTO', 'FORMA PAGAMENTO'),
+    'lucro':       ('LUCRO',),
+    'vendedor':    ('VENDEDOR',),
+    'mes':         ('MES',),
+    'ano':         ('ANO',),
+    'loja':        ('LOJA',),
+}
+
+
+def normalizar_cabecalho(nome):
+    """'MÊS' / 'MÃŠS' (utf-8 lido como latin-1) / ' mes ' -> 'MES'."""
+    try:
+        nome = nome.encode('latin-1').decode('utf-8')
+    except UnicodeError:
+        pass
+    nome = unicodedata.normalize('NFKD', nome.replace('\ufeff', '')).encode('ascii', 'ignore').decode()
+    return ' '.join(nome.upper().split())
+
+
+def indices(cabecalho, colunas):
+    """{campo: indice ou None} resolvendo os apelidos contra o cabecalho."""
+    pos = {}
+    for i, nome in enumerate(cabecalho):
+        pos.setdefault(normalizar_cabecalho(nome), i)
+    return {campo: next((pos[normalizar_cabecalho(a)] for a in apelidos if normalizar_cabecalho(a) in pos), None)
+            for campo, apelidos in colunas.items()}
+
+
+def linhas_brutas(caminho, encoding=None, aba=None):
+    """
+    Iterador de listas de str (1a = cabecalho) de um .csv ou .xlsx.
+    CSV com encoding None = copia UTF-8 limpa do ingestao_csv (encoding
+    detectado e mojibake reparado uma vez por arquivo, em cache).
+    """
+    if caminho.lower().endswith('.xlsx'):
+        yield from linhas_xlsx(caminho, aba)
+        return
+    if encoding is None:
+        caminho, encoding = arquivo_limpo(caminho), 'utf-8'
+    with open(caminho, encoding=encoding, newline='') as f:
+        yield from csv.reader(f)
+
+
+def projetar(linhas, colunas=COLUNAS_VENDA, nome='Linha'):
+    """Listas (1a = cabecalho) -> namedtuples (campos de `colunas`, na ordem) com os valores strip()."""
+    Linha = namedtuple(nome, colunas)
+    linhas = iter(linhas)
+    idx = tuple(indices(next(linhas, []), colunas).values())
+    fazer = Linha._make
+    for row in linhas:
+        if not row:
+            continue
+        n = len(row)
+        yield fazer([row[i].strip() if i is not None and i < n else '' for i in idx])
+
+
+def ler_projetado(caminho, colunas=COLUNAS_VENDA, encoding=None, nome='Linha', aba=None):
+    """Lista de namedtuples de `caminho` (.csv ou .xlsx) - ver projetar()."""
+    return list(projetar(linhas_brutas(caminho, encoding, aba), colunas, nome))
+
+
+def ler_vendas(caminho, encoding=None, aba=None):
+    """Planilha crua de vendas (venda_aparelhos*.csv, aparelhos.xlsx) -> [LinhaVenda]."""
+    return ler_projetado(caminho, COLUNAS_VENDA, encoding, 'LinhaVenda', aba)
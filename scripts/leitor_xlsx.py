@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Leitura de .xlsx em streaming (openpyxl read_only): as linhas saem direto do
+XML da aba, uma por vez, sem montar a pasta de trabalho na memoria nem
+exportar para CSV antes (aparelhos.xlsx, estoque_AAAA-MM-DD.xlsx).
+
+Cada celula vira o texto que a exportacao CSV do Excel daria, para o resto
+do pipeline (leitor_csv.projetar, parse_brl, to_date) nao saber a origem:
+data -> 'dd/mm/aaaa', numero inteiro (IMEI, ano) -> sem '.0', numero com
+casas -> virgula decimal ('2095,46', o parse_brl tira o ponto como milhar),
+vazio -> ''. openpyxl so e importado ao abrir um .xlsx: quem le so CSV
+(leitor_csv) nao precisa dele instalado.
+
+  from leitor_xlsx import linhas_xlsx
+  for row in linhas_xlsx('aparelhos.xlsx'):   # 1a linha = cabecalho
+      ...
+"""
+import datetime, sys
+
+
+def texto_celula(v):
+    if v is None:
+        return ''
+    if isinstance(v, datetime.datetime):
+        return v.strftime('%d/%m/%Y') if v.time() == datetime.time() else v.strftime('%d/%m/%Y %H:%M:%S')
+    if isinstance(v, datetime.date):
+        return v.strftime('%d/%m/%Y')
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    if isinstance(v, bool):
+        return 'VERDADEIRO' if v else 'FALSO'
+    if isinstance(v, float):
+        return str(v).replace('.', ',')
+    return str(v)
+
+
+def linhas_xlsx(caminho, aba=None):
+    """Iterador de listas de str (cabecalho incluso). aba None = a primeira.
+    Linhas totalmente vazias (formatacao sobrando no fim da aba) sao puladas."""
+    try:
+        import openpyxl
+    except ImportError:
+        sys.exit('openpyxl nao instalado: pip install openpyxl')
+    wb = openpyxl.load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        ws = wb[aba] if aba else wb.worksheets[0]
+        for valores in ws.iter_rows(values_only=True):
+            row = [texto_celula(v) for v in valores]
+            if any(row):
+                yield row
+    finally:
+        wb.close()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Parser do texto MODELO das planilhas: "IPHONE 15 PRO MAX 256GB NATURAL SEMINOVO"
+-> Modelo(marca='Apple', linha='IPHONE 15 PRO MAX', armazenamento='256GB',
+          cor='NATURAL', estado='seminovo', garantia=False)
+
+Substitui os extract_brand / detectar_estado / extrair_estado / limpar_modelo
+copiados em cada script (cada um com sua lista de startswith - e o
+detectar_estado do lote 3 devolvia 'novo' para SEMINOVO, porque testava
+'NOVO' primeiro). Marca, estado e cor sao consultas em dicionario por token.
+
+Diferencas para as copias antigas (mudam o estado de linhas ja geradas, ex.
+vendas_final.csv 373 "SEMIINOVO" novo -> seminovo e 377 "BRANCA NOVA"
+seminovo -> novo): o estado e por token inteiro, nao substring ("NOVO" dentro
+de "SEMIINOVO" nao conta; NOVA/USADA/LACRADA contam). Marca continua por
+prefixo do primeiro token ("IPHONE13" = Apple), menos MI e NOTE, que precisam
+vir sozinhos (MIDNIGHT, NOTEBOOK).
+
+Catalogo canonico: cada texto ja visto fica em _catalogo_modelos.json
+(texto normalizado -> campos); a proxima execucao nem reparseia. Entradas com
+"manual": true sao correcoes feitas a mao e nunca sao sobrescritas. Processos
+em paralelo: cada um grava num .tmp proprio e junta o que ja esta no arquivo.
+
+Dedup sem IMEI: Modelo.chave = MARCA|LINHA|ARMAZENAMENTO|COR (sem estado).
+"""
+import atexit, json, os, re, unicodedata
+from collections import namedtuple
+
+CATALOGO = os.path.join(os.path.dirname(os.path.abspath(__file__)), '_catalogo_modelos.json')
+# Mudou a regra do parser? incremente: entradas automaticas antigas sao descartadas
+CATALOGO_VERSAO = 3
+
+# Primeiro token -> marca (mesmos valores que os extract_brand gravavam no banco)
+MARCAS = {
+    'IPHONE': 'Apple', 'IPAD': 'Apple', 'MAC': 'Apple', 'MACBOOK': 'Apple', 'APPLE': 'Apple',
+    'WATCH': 'Apple', 'AIRPODS': 'Apple',
+    'SAMSUNG': 'Samsung', 'GALAXY': 'Samsung',
+    'REDMI': 'Xiaomi', 'MI': 'Xiaomi', 'POCO': 'Xiaomi', 'XIAOMI': 'Xiaomi',
+    'REALME': 'Realme',
+    'NOTE': 'Redmi',
+    'BOMBOX': 'Bombox', 'BOOMBOX': 'Bombox',
+}
+# Casam so como token inteiro (MIDNIGHT, NOTEBOOK); o resto vale como prefixo ("IPHONE13")
+MARCAS_SO_TOKEN = {'MI', 'NOTE'}
+# Chave/dedup: 'Redmi' (NOTE ...) e a mesma familia de 'Xiaomi' (REDMI NOTE ...)
+FAMILIA_MARCA = {'Redmi': 'Xiaomi'}
+# Acessorio: a marca vem do token seguinte ("FONTE APPLE ORIGINAL")
+ACESSORIOS = {'FONTE', 'CABO', 'CARREGADOR', 'CAPA', 'PELICULA'}
+# Prefixo com o nome da marca ("APPLE IPHONE 14", como no snapshot do banco): fora da linha
+NOMES_MARCA = {'APPLE', 'SAMSUNG', 'XIAOMI', 'REALME', 'OUTROS'}
+
+ESTADOS = {
+    'SEMINOVO': 'seminovo', 'SEMINOVA': 'seminovo',
+    'USADO': 'usado', 'USADA': 'usado',
+    'NOVO': 'novo', 'NOVA': 'novo', 'LACRADO': 'novo', 'LACRADA': 'novo',
+}
+PRIORIDADE_ESTADO = ('seminovo', 'usado', 'novo')
+
+CORES = {
+    'PRETO': 'PRETO', 'PRETA': 'PRETO', 'BLACK': 'PRETO', 'MIDNIGHT': 'PRETO', 'MEIA-NOITE': 'PRETO',
+    'BRANCO': 'BRANCO', 'BRANCA': 'BRANCO', 'WHITE': 'BRANCO', 'STARLIGHT': 'BRANCO', 'ESTELAR': 'BRANCO',
+    'AZUL': 'AZUL', 'BLUE': 'AZUL', 'ROSA': 'ROSA', 'PINK': 'ROSA',
+    'VERDE': 'VERDE', 'GREEN': 'VERDE', 'ROXO': 'ROXO', 'ROXA': 'ROXO', 'PURPLE': 'ROXO', 'LILAS': 'ROXO',
+    'CINZA': 'CINZA', 'GREY': 'CINZA', 'GRAY': 'CINZA', 'GRAFITE': 'GRAFITE', 'GRAFIT': 'GRAFITE',
+    'PRATA': 'PRATA', 'SILVER': 'PRATA', 'DOURADO': 'DOURADO', 'GOLD': 'DOURADO',
+    'NATURAL': 'NATURAL', 'DESERT': 'DESERT', 'LARANJA': 'LARANJA', 'ORANGE': 'LARANJA',
+    'AMARELO': 'AMARELO', 'YELLOW': 'AMARELO', 'VERMELHO': 'VERMELHO', 'RED': 'VERMELHO',
+}
+MODIFICADORES_COR = {'TITANIO', 'TITANIUM'}  # "TITANIO NATURAL" = NATURAL
+
+ARMAZENAMENTOS_GB = {32, 64, 128, 256, 512}  # 8GB/16GB sozinhos = RAM
+RE_ARMAZENAMENTO = re.compile(r'^(\d+)(G|GB|T|TB)$')
+RE_RAM_ARMAZENAMENTO = re.compile(r'^(\d+)/(\d+)(GB)?$')  # "16/512"
+# "SEMI NOVO" / "SEMI-NOVA": os SEMI* de ESTADOS tambem aparecem separados
+_SEMI = [e[4:] for e in ESTADOS if e.startswith('SEMI')]
+RE_SEMI_SEPARADO = re.compile(r'\bSEMI[\s-]+(' + '|'.join(_SEMI) + r')\b')
+RE_SUFIXO_ESTADO = re.compile(r'(\s+(-\s*)?(' + '|'.join(
+    e.replace('SEMI', r'SEMI[\s-]*', 1) for e in sorted(ESTADOS, key=len, reverse=True)) + r'))+\s*$', re.IGNORECASE)
+RE_GARANTIA = re.compile(r'\s*-?\s*\bGARANTIA\b.*$', re.IGNORECASE)
+
+
+class Modelo(namedtuple('Modelo', 'marca linha armazenamento cor estado garantia')):
+    __slots__ = ()
+
+    @property
+    def chave(self):
+        """Chave canonica do aparelho (sem estado): dedup e agrupamento."""
+        return f'{self.familia.upper()}|{self.linha}|{self.armazenamento}|{self.cor}'
+
+    @property
+    def familia(self):
+        return FAMILIA_MARCA.get(self.marca, self.marca)
+
+    def compativel(self, outro):
+        """Mesmo aparelho? Armazenamento/cor em branco de um lado nao desempata."""
+        return (self.familia == outro.familia and self.linha == outro.linha
+                and (not self.armazenamento or not outro.armazenamento or self.armazenamento == outro.armazenamento)
+                and (not self.cor or not outro.cor or self.cor == outro.cor))
+
+
+def normalizar_texto(texto):
+    """Maiusculas, sem acento, espacos simples (chave do catalogo)."""
+    t = unicodedata.normalize('NFKD', texto or '').encode('ascii', 'ignore').decode()
+    return re.sub(r'\s+', ' ', t).strip().upper()
+
+
+def _armazenamento(tok):
+    m = RE_RAM_ARMAZENAMENTO.match(tok)
+    if m:
+        return f'{m.group(2)}GB'
+    m = RE_ARMAZENAMENTO.match(tok)
+    if not m:
+        return None
+    n, unidade = int(m.group(1)), m.group(2)
+    if unidade.startswith('T'):
+        return f'{n}TB'
+    return f'{n}GB' if n in ARMAZENAMENTOS_GB else None
+
+
+def _marca(tok):
+    """(marca, prefixo) do token: exato, senao o maior prefixo de MARCAS ("IPHONE13")."""
+    if tok in MARCAS:
+        return MARCAS[tok], tok
+    pref = max((p for p in MARCAS if p not in MARCAS_SO_TOKEN and tok.startswith(p)), key=len, default=None)
+    return (MARCAS[pref], pref) if pref else (None, None)
+
+
+def _parse(norm):
+    texto = RE_GARANTIA.sub('', norm)
+    garantia = texto != norm
+    texto = RE_SEMI_SEPARADO.sub(r'SEMI\1', texto)
+    toks = [t for t in re.split(r'[\s()°º,;]+|(?<=\w)-(?=\s)', texto) if t and t != '-']
+
+    marca = 'Outros'
+    if toks:
+        primeiro = toks[0]
+        if primeiro in ACESSORIOS:
+            marca = next((m for m in (_marca(t)[0] for t in toks[1:]) if m), 'Outros')
+        else:
+            m, pref = _marca(primeiro)
+            marca = m or 'Outros'
+            if pref and primeiro[len(pref):][:1].isdigit():
+                toks[:1] = [pref, primeiro[len(pref):]]   # "IPHONE13" = "IPHONE 13"
+                primeiro = pref
+        if primeiro in NOMES_MARCA and len(toks) > 1:
+            toks = toks[1:]
+        elif primeiro == 'REDMI' and len(toks) > 1 and toks[1] == 'NOTE':
+            toks = toks[1:]  # "REDMI NOTE 15" e "NOTE 15": mesma linha
+
+    linha, estados, cores, armaz = [], set(), [], []
+    for t in toks:
+        if t in ESTADOS:
+            estados.add(ESTADOS[t])
+        elif t in CORES:
+            if CORES[t] not in cores:
+                cores.append(CORES[t])
+        elif t in MODIFICADORES_COR:
+            continue
+        elif _armazenamento(t):
+            armaz.append(_armazenamento(t))
+        elif RE_ARMAZENAMENTO.match(t) and t.endswith('GB'):
+            continue  # RAM ("8GB 256GB")
+        else:
+            linha.append(t)
+    estado = next((e for e in PRIORIDADE_ESTADO if e in estados), None)
+    # maior valor = armazenamento (TB > GB)
+    armaz.sort(key=lambda a: int(a[:-2]) * (1024 if a.endswith('TB') else 1))
+    return Modelo(marca, ' '.join(linha), armaz[-1] if armaz else '', ' '.join(cores), estado, garantia)
+
+
+_catalogo = None
+_alterado = False
+
+
+def _carregar():
+    global _catalogo
+    _catalogo = {}
+    if os.path.exists(CATALOGO):
+        try:
+            with open(CATALOGO, encoding='utf-8') as f:
+                dados = json.load(f)
+        except (OSError, ValueError):
+            dados = {}
+        mesma_versao = dados.get('versao') == CATALOGO_VERSAO
+        for texto, campos in dados.get('modelos', {}).items():
+            if mesma_versao or campos.get('manual'):
+                _catalogo[texto] = campos
+    atexit.register(salvar_catalogo)
+
+
+def parse_modelo(texto):
+    """Modelo do texto (catalogo primeiro; parse so na primeira vez que o texto aparece)."""
+    global _alterado
+    if _catalogo is None:
+        _carregar()
+    norm = normalizar_texto(texto)
+    campos = _catalogo.get(norm)
+    if campos is None:
+        campos = _parse(norm)._asdict()
+        _catalogo[norm] = campos
+        _alterado = True
+    return Modelo(*(campos[c] for c in Modelo._fields))
+
+
+def salvar_catalogo():
+    global _alterado
+    if not _alterado:
+        return
+    # outro processo pode ter gravado depois do _carregar: junta, e o manual do disco vence
+    modelos = dict(_catalogo)
+    try:
+        with open(CATALOGO, encoding='utf-8') as f:
+            dados = json.load(f)
+    except (OSError, ValueError):
+        dados = {}
+    mesma_versao = dados.get('versao') == CATALOGO_VERSAO
+    for texto, campos in dados.get('modelos', {}).items():
+        if campos.get('manual') or (mesma_versao and texto not in modelos):
+            modelos[texto] = campos
+    tmp = f'{CATALOGO}.{os.getpid()}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'versao': CATALOGO_VERSAO, 'modelos': dict(sorted(modelos.items()))},
+                  f, ensure_ascii=False, indent=1)
+    os.replace(tmp, CATALOGO)
+    _alterado = False
+
+
+# ── Interface antiga dos scripts ─────────────────────────────────────────────
+def extract_brand(modelo):
+    return parse_modelo(modelo).marca
+
+
+def detectar_estado(modelo, padrao='seminovo'):
+    return parse_modelo(modelo).estado or padrao
+
+
+def limpar_modelo(modelo):
+    """Texto original sem o sufixo de estado / "- GARANTIA ..." (para a coluna modelo)."""
+    return RE_SUFIXO_ESTADO.sub('', RE_GARANTIA.sub('', modelo or '')).strip()
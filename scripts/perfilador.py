@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Modo --profile dos scripts de importacao: cProfile + tracemalloc + amostras de
+pilha por etapa, gravados num diretorio por execucao para comparar execucoes.
+(Nao confundir com --perfil do carregador, que e a janela de carga no banco.)
+
+  import perfilador
+  perfilador.ativar()                  # no inicio do script; so liga com --profile
+  perfilador.etapa('leitura')          # daqui em diante conta como 'leitura'
+  with perfilador.etapa('ssh'): ...    # ou so o bloco (volta para a anterior)
+
+Sem --profile ativar() e etapa() nao fazem nada. Com --profile o que roda
+antes da primeira etapa cai em 'geral'; cada etapa mede so o tempo em que
+esta corrente (exclusiva, nao inclui as aninhadas). Ao sair do processo, em
+scripts/_perfil/AAAAMMDD-HHMMSS/ (--profile=DIR ou PERFIL_DIR para escolher;
+etapas.py --profile poe todos os scripts no mesmo diretorio):
+
+  <script>.<etapa>.pstats   cProfile (python3 -m pstats, snakeviz)
+  <script>.<etapa>.folded   pilhas colapsadas amostradas (flamegraph.pl, speedscope)
+  <script>.<etapa>.txt      top funcoes (tottime e cumtime) + top alocacoes por linha
+  <script>.json             por etapa: tempo, pico de memoria, top funcoes e alocacoes
+
+  python3 scripts/perfilador.py comparar scripts/_perfil/A scripts/_perfil/B
+"""
+import atexit, cProfile, io, json, os, pstats, sys, threading, time, tracemalloc
+from collections import Counter
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASE = os.path.join(ROOT, 'scripts', '_perfil')
+INTERVALO = 0.002  # segundos entre amostras de pilha
+TOP_N = 25
+
+_execucao = None
+
+
+def _foto():
+    return tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, os.path.abspath(__file__))])
+
+
+class _Etapa:
+    def __init__(self, nome):
+        self.nome = nome
+        self.prof = cProfile.Profile()
+        self.segundos = 0.0
+        self.pico = 0
+        self.pilhas = Counter()
+        self.alocado = Counter()   # 'arquivo:linha' -> bytes liquidos
+        self.blocos = Counter()    # 'arquivo:linha' -> alocacoes liquidas
+
+
+class _Execucao:
+    def __init__(self, script, destino):
+        self.script, self.destino = script, destino
+        self.inicio = datetime.now()
+        self.etapas = {}
+        self.corrente = None
+        self.desde = self.foto = None
+        self.thread = threading.main_thread().ident
+        self.parar = threading.Event()
+        tracemalloc.start()
+        self.trocar('geral')
+        self.amostrador = threading.Thread(target=self._amostrar, daemon=True)
+        self.amostrador.start()
+
+    def _fechar_corrente(self):
+        e = self.corrente
+        e.prof.disable()
+        e.segundos += time.perf_counter() - self.desde
+        e.pico = max(e.pico, tracemalloc.get_traced_memory()[1])
+        for d in _foto().compare_to(self.foto, 'lineno'):
+            quadro = d.traceback[0]
+            arquivo = quadro.filename
+            if arquivo.startswith(ROOT + os.sep):
+                arquivo = os.path.relpath(arquivo, ROOT)
+            chave = f'{arquivo}:{quadro.lineno}'
+            e.alocado[chave] += d.size_diff
+            e.blocos[chave] += d.count_diff
+
+    def trocar(self, nome):
+        """Passa a contar como `nome`; retorna a etapa anterior."""
+        anterior = self.corrente
+        if anterior is not None:
+            if anterior.nome == nome:
+                return anterior
+            self._fechar_corrente()
+        if nome not in self.etapas:
+            self.etapas[nome] = _Etapa(nome)
+        self.corrente = self.etapas[nome]
+        tracemalloc.reset_peak()
+        self.foto = _foto()
+        self.desde = time.perf_counter()
+        self.corrente.prof.enable()
+        return anterior
+
+    def _amostrar(self):
+        proprio = os.path.abspath(__file__)
+        while not self.parar.wait(INTERVALO):
+            quadro = sys._current_frames().get(self.thread)
+            pilha = []
+            while quadro is not None:
+                co = quadro.f_code
+                if co.co_filename == proprio:
+                    break  # troca de etapa em andamento (fotos do tracemalloc): nao conta
+                pilha.append(f'{os.path.basename(co.co_filename)}:{co.co_name}')
+                quadro = quadro.f_back
+            etapa = self.corrente
+            if quadro is None and pilha and etapa is not None:
+                etapa.pilhas[';'.join(reversed(pilha))] += 1
+
+    def gravar(self):
+        self.parar.set()
+        self._fechar_corrente()
+        tracemalloc.stop()
+        self.amostrador.join(1)
+        os.makedirs(self.destino, exist_ok=True)
+        resumo = {'script': self.script, 'argv': sys.argv[1:], 'inicio': self.inicio.isoformat(timespec='seconds'),
+                  'intervalo_amostra': INTERVALO, 'etapas': {}}
+        for e in self.etapas.values():
+            base = os.path.join(self.destino, f'{self.script}.{e.nome}')
+            e.prof.dump_stats(base + '.pstats')
+            with open(base + '.folded', 'w', encoding='utf-8') as f:
+                for pilha, n in e.pilhas.most_common():
+                    f.write(f'{pilha} {n}\n')
+            funcoes = top_funcoes(e.prof)
+            alocacoes = [(k, v, e.blocos[k]) for k, v in e.alocado.most_common(TOP_N) if v > 0]
+            with open(base + '.txt', 'w', encoding='utf-8') as f:
+                f.write(f'{self.script} / {e.nome}: {e.segundos:.3f}s, pico {e.pico / 2**20:.1f} MiB, '
+                        f'{sum(e.pilhas.values())} amostras\n\n')
+                for ordem in ('tottime', 'cumtime'):
+                    txt = io.StringIO()
+                    pstats.Stats(e.prof, stream=txt).sort_stats(ordem).print_stats(TOP_N)
+                    f.write(txt.getvalue())
+                f.write(f'\nTop {TOP_N} alocacoes (bytes liquidos na etapa, por linha):\n')
+                for chave, tamanho, n in alocacoes:
+                    f.write(f'  {tamanho / 1024:10.1f} KiB  {n:8d} blocos  {chave}\n')
+            resumo['etapas'][e.nome] = {
+                'segundos': round(e.segundos, 4), 'pico_mib': round(e.pico / 2**20, 2),
+                'amostras': sum(e.pilhas.values()),
+                'top_funcoes': funcoes, 'top_alocacoes': [[k, v, n] for k, v, n in alocacoes],
+            }
+        with open(os.path.join(self.destino, f'{self.script}.json'), 'w', encoding='utf-8') as f:
+            json.dump(resumo, f, indent=1, ensure_ascii=False)
+        print(f'\nPerfil: {self.destino} ({", ".join(f"{e.nome} {e.segundos:.2f}s" for e in self.etapas.values())})',
+              file=sys.stderr)
+
+
+def top_funcoes(prof, n=TOP_N):
+    """[[funcao, tottime, cumtime, chamadas]] pelas que mais gastam tempo proprio."""
+    st = pstats.Stats(prof).stats
+    linhas = []
+    for (arquivo, linha, nome), (_, chamadas, tt, ct, _) in st.items():
+        funcao = f'{os.path.basename(arquivo)}:{linha}:{nome}' if linha else nome
+        linhas.append([funcao, round(tt, 4), round(ct, 4), chamadas])
+    return sorted(linhas, key=lambda l: -l[1])[:n]
+
+
+def destino_padrao():
+    for a in sys.argv:
+        if a.startswith('--profile='):
+            return os.path.abspath(a.split('=', 1)[1])
+    return os.environ.get('PERFIL_DIR') or os.path.join(BASE, datetime.now().strftime('%Y%m%d-%H%M%S'))
+
+
+def pedido(argv=None):
+    argv = sys.argv if argv is None else argv
+    return any(a == '--profile' or a.startswith('--profile=') for a in argv)
+
+
+def ativar(script=None):
+    """Liga o perfil se o script foi chamado com --profile (idempotente)."""
+    global _execucao
+    if _execucao is not None or not pedido():
+        return
+    script = script or os.path.splitext(os.path.basename(sys.argv[0]))[0]
+    _execucao = _Execucao(script, destino_padrao())
+    atexit.register(_execucao.gravar)
+
+
+class etapa:
+    """etapa('x') passa a contar como 'x'; com `with`, volta para a anterior no fim."""
+
+    def __init__(self, nome):
+        self.anterior = _execucao.trocar(nome) if _execucao else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if _execucao and self.anterior is not None:
+            _execucao.trocar(self.anterior.nome)
+
+
+def _ler_resumos(diretorio):
+    resumos = {}
+    for nome in sorted(os.listdir(diretorio)):
+        if nome.endswith('.json'):
+            with open(os.path.join(diretorio, nome), encoding='utf-8') as f:
+                r = json.load(f)
+            resumos[r['script']] = r
+    return resumos
+
+
+def comparar(dir_a, dir_b, n=10):
+    """Tempo e pico por script/etapa de duas execucoes + funcoes que mais mudaram."""
+    a, b = _ler_resumos(dir_a), _ler_resumos(dir_b)
+    for script in sorted(set(a) | set(b)):
+        ea = a.get(script, {}).get('etapas', {})
+        eb = b.get(script, {}).get('etapas', {})
+        print(f'\n{script}')
+        print(f'  {"etapa":20s} {"A (s)":>9s} {"B (s)":>9s} {"delta":>8s} {"pico A":>8s} {"pico B":>8s}')
+        for nome in list(ea) + [k for k in eb if k not in ea]:
+            sa, sb = ea.get(nome, {}), eb.get(nome, {})
+            ta, tb = sa.get('segundos'), sb.get('segundos')
+            delta = f'{(tb - ta) / ta * 100:+.0f}%' if ta and tb is not None else '-'
+            fmt = lambda v, f: f.format(v) if v is not None else '-'
+            print(f'  {nome:20s} {fmt(ta, "{:.3f}"):>9s} {fmt(tb, "{:.3f}"):>9s} {delta:>8s} '
+                  f'{fmt(sa.get("pico_mib"), "{:.1f}M"):>8s} {fmt(sb.get("pico_mib"), "{:.1f}M"):>8s}')
+            if not (sa and sb):
+                continue
+            fa = {f[0]: f[1] for f in sa.get('top_funcoes', [])}
+            fb = {f[0]: f[1] for f in sb.get('top_funcoes', [])}
+            mudancas = sorted(((fb.get(k, 0) - fa.get(k, 0), k) for k in set(fa) | set(fb)),
+                              key=lambda d: -abs(d[0]))[:n]
+            for d, k in mudancas:
+                if abs(d) >= 0.001:
+                    print(f'      {d:+8.3f}s  {k}')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == 'comparar':
+        comparar(sys.argv[2], sys.argv[3])
+    else:
+        sys.exit(__doc__)
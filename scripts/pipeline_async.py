@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Pipeline assincrono de importacao: parse, montagem do SQL e gravacao no banco
+rodando ao mesmo tempo, em vez de gerar o .sql inteiro, copiar e so entao
+aplicar (tempo total ~ max(parse, escrita) em vez da soma).
+
+  pool de processos  -> `ler(row)` (parte sem estado) em pedacos de linhas
+  loop (em ordem)    -> `montar(row, lido, idx)` -> Bloco (ids, dedup, numero...)
+  fila limitada      -> lotes prontos; cheia = o parse espera (backpressure)
+  escritor           -> aplicar_lote do carregador numa thread (psycopg2 e
+                        bloqueante), um COMMIT + checkpoint por lote
+
+Mesmo checkpoint e quarentena do carregador.py: uma execucao interrompida
+pode ser retomada por aqui (--retomar) ou pelo carregar() sincrono.
+"""
+import asyncio, os, sys, time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from carregador import aplicar_lote, ler_checkpoint
+
+
+def _ler_pedaco(ler, linhas):
+    """Roda no pool. Excecao de uma linha volta no lugar dela (nao derruba o pedaco)."""
+    t0 = time.perf_counter()
+    lidos = []
+    for row in linhas:
+        try:
+            lidos.append(ler(row))
+        except Exception as e:
+            lidos.append(e)
+    return lidos, time.perf_counter() - t0
+
+
+async def executar(conn, nome, linhas, ler, montar, tamanho_lote=200, trabalhadores=None,
+                   fila_max=4, preambulo='', posambulo='', quarentena=None, retomar=False):
+    """
+    Importa `linhas` (dicts do CSV). `ler` precisa ser funcao de modulo (vai
+    para outro processo); `montar` roda no processo principal, na ordem.
+    posambulo pode ser funcao (ex.: depende dos ids montados) - chamada no fim.
+    """
+    loop = asyncio.get_running_loop()
+    inicio, ultima = ler_checkpoint(conn, nome)
+    if not retomar:
+        inicio, ultima = 0, None
+    trabalhadores = trabalhadores or os.cpu_count() or 2
+    fila = asyncio.Queue(maxsize=fila_max)
+    st = {'lotes': 0, 'aplicados': 0, 'quarentena': 0, 'pulados': inicio,
+          't_parse': 0.0, 't_montagem': 0.0, 't_escrita': 0.0}
+
+    async def escritor():
+        while True:
+            item = await fila.get()
+            if item is None:
+                return
+            lote, fim = item
+            t0 = time.perf_counter()
+            falhas, t_commit = await asyncio.to_thread(aplicar_lote, conn, nome, lote, fim, preambulo, quarentena)
+            segundos = time.perf_counter() - t0
+            st['t_escrita'] += segundos
+            st['lotes'] += 1
+            st['aplicados'] += len(lote) - falhas
+            st['quarentena'] += falhas
+            print(f'  lote {st["lotes"]}: bloco {fim} confirmado (ultima linha {lote[-1].chave}) '
+                  f'{len(lote)} linhas em {segundos * 1000:.0f}ms, fila {fila.qsize()}/{fila_max}')
+
+    tarefa = asyncio.create_task(escritor())
+
+    async def enfileirar(item):
+        # se o escritor morrer (conexao caiu), nao fica preso com a fila cheia
+        put = asyncio.ensure_future(fila.put(item))
+        await asyncio.wait({put, tarefa}, return_when=asyncio.FIRST_COMPLETED)
+        if not put.done():
+            put.cancel()
+            tarefa.result()
+
+    t_total = time.perf_counter()
+    pedacos = [linhas[i:i + tamanho_lote] for i in range(0, len(linhas), tamanho_lote)]
+    if inicio:
+        print(f'Retomando "{nome}" do bloco {inicio} (ultima linha confirmada: {ultima})')
+    with ProcessPoolExecutor(trabalhadores) as pool:
+        pendentes, proximo = deque(), 0
+        idx, n_bloco, lote = 0, 0, []
+        while pendentes or proximo < len(pedacos):
+            while proximo < len(pedacos) and len(pendentes) < 2 * trabalhadores:
+                pendentes.append((pedacos[proximo], loop.run_in_executor(pool, _ler_pedaco, ler, pedacos[proximo])))
+                proximo += 1
+            pedaco, futuro = pendentes.popleft()
+            lidos, t_parse = await futuro
+            st['t_parse'] += t_parse
+            t0 = time.perf_counter()
+            for row, lido in zip(pedaco, lidos):
+                bloco = montar(row, lido, idx)
+                idx += 1
+                if bloco is None:
+                    continue
+                n_bloco += 1
+                if n_bloco <= inicio:
+                    if n_bloco == inicio and str(bloco.chave) != ultima:
+                        sys.exit(f'Checkpoint de "{nome}" ({ultima}) nao bate com o bloco {inicio} '
+                                 f'({bloco.chave}): a fonte mudou, retome com o --lote sincrono')
+                    continue
+                lote.append(bloco)
+                if len(lote) >= tamanho_lote:
+                    st['t_montagem'] += time.perf_counter() - t0
+                    await enfileirar((lote, n_bloco))
+                    t0, lote = time.perf_counter(), []
+            st['t_montagem'] += time.perf_counter() - t0
+        if lote:
+            await enfileirar((lote, n_bloco))
+        await enfileirar(None)
+        await tarefa
+    st['t_total'] = time.perf_counter() - t_total
+
+    posambulo = posambulo() if callable(posambulo) else posambulo
+    if posambulo:
+        with conn.cursor() as cur:
+            cur.execute(posambulo)
+        conn.commit()
+    return st
+
+
+def carregar_async(conn, nome, linhas, ler, montar, **opcoes):
+    """Versao sincrona de executar() para os scripts (asyncio.run)."""
+    return asyncio.run(executar(conn, nome, linhas, ler, montar, **opcoes))
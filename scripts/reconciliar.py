@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Reconciliacao planilha x banco por arvore de somas: loja -> mes -> dia -> venda.
+
+Cada venda vira uma chave canonica (dia|loja|vendedor|valor|pix|dinheiro|
+credito|debito|troca, valores em centavos) e um hash de 60 bits dela. Cada no
+da arvore guarda (vendas, soma do valor, soma dos hashes): o pai e a soma dos
+filhos, entao dois lados com o mesmo no tem (com probabilidade ~1) as mesmas
+vendas embaixo dele.
+
+  banco: UMA consulta agregada devolve os nos (loja, dia); mes, loja e raiz
+         sao somados aqui. Depois, uma consulta so das vendas dos dias que
+         divergiram - o custo no banco cresce com as diferencas, nao com o
+         total de vendas.
+  planilha: o lote do armazem (--importacao ID, exatamente o que o gerador
+         mandou: loja mapeada, pix forcado etc.) ou um *_final.csv (--csv;
+         linha em revisao conta como pix = valor_venda, como no importar_tudo).
+
+Escopo no banco: com --importacao, as vendas anotadas em importacao_registros
+daquela importacao; so com --csv, todas as vendas das lojas da planilha entre a
+primeira e a ultima data dela. IMEI nao entra no hash (gerador grava NULL para
+IMEI repetido); aparece so para parear a venda divergente.
+
+Uso:
+  python3 scripts/reconciliar.py --importacao ID                   # IMPORTACAO_DSN ou --dsn
+  python3 scripts/reconciliar.py --csv scripts/vendas_final.csv [--importacao ID]
+  --max-dias N: quantos dias divergentes detalhar venda a venda (padrao 50)
+Sai com 1 se houver diferenca.
+"""
+import csv, hashlib, os, sys
+from collections import Counter, defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+from importacao_cli import arg_valor
+import armazem
+import perfilador
+
+CENTAVO = Decimal('0.01')
+TIPOS = ('pix', 'dinheiro', 'cartao_credito', 'cartao_debito', 'troca_aparelho')
+BITS = 15  # digitos hex do md5 no hash (60 bits: cabe no bigint do Postgres)
+
+
+def centavos(v):
+    """Valor como o numeric(…,2) do banco grava: meio centavo arredonda para cima."""
+    return Decimal(str(v or 0)).quantize(CENTAVO, ROUND_HALF_UP)
+
+
+def chave_venda(dia, loja_id, vendedor_id, valor, pagamentos):
+    return '|'.join([dia, str(loja_id), vendedor_id or '', str(centavos(valor))]
+                    + [str(centavos(pagamentos.get(t))) for t in TIPOS])
+
+
+def hash_chave(chave):
+    return int(hashlib.md5(chave.encode()).hexdigest()[:BITS], 16)
+
+
+class No:
+    """Vendas, soma do valor e soma dos hashes de uma subarvore."""
+    __slots__ = ('n', 'valor', 'hash')
+
+    def __init__(self, n=0, valor=Decimal(0), hash_=0):
+        self.n, self.valor, self.hash = n, Decimal(valor), int(hash_)
+
+    def somar(self, outro):
+        self.n += outro.n
+        self.valor += outro.valor
+        self.hash += outro.hash
+        return self
+
+    def __eq__(self, outro):
+        return (self.n, self.valor, self.hash) == (outro.n, outro.valor, outro.hash)
+
+    def __str__(self):
+        return f'{self.n:4d} vendas  R$ {self.valor:>12,.2f}'
+
+
+def arvore(dias):
+    """{(loja, 'AAAA-MM-DD'): No} -> ({caminho: No}, {caminho: filhos}); caminho = (), (loja,), (loja, mes), (loja, mes, dia)."""
+    nos, filhos = defaultdict(No), defaultdict(set)
+    for (loja, dia), no in dias.items():
+        caminho = (loja, dia[:7], dia)
+        for i in range(4):
+            nos[caminho[:i]].somar(no)
+            if i:
+                filhos[caminho[:i - 1]].add(caminho[:i])
+    return nos, filhos
+
+
+class Venda:
+    __slots__ = ('loja', 'dia', 'chave', 'ref', 'imei', 'valor', 'pagamentos', 'vendedor_id')
+
+    def __init__(self, loja, dia, vendedor_id, valor, pagamentos, ref, imei=''):
+        self.loja, self.dia, self.ref, self.imei = int(loja), dia, ref, imei or ''
+        self.vendedor_id, self.valor, self.pagamentos = vendedor_id or '', centavos(valor), pagamentos
+        self.chave = chave_venda(dia, self.loja, self.vendedor_id, valor, pagamentos)
+
+    def descricao(self):
+        pg = ' '.join(f'{t[:6]}={centavos(self.pagamentos.get(t))}' for t in TIPOS if self.pagamentos.get(t))
+        return f'{self.ref}  R$ {self.valor}  {pg}  vend={self.vendedor_id[:8]}  imei={self.imei or "-"}'
+
+
+def dias_de(vendas):
+    dias = defaultdict(No)
+    for v in vendas:
+        dias[(v.loja, v.dia)].somar(No(1, v.valor, hash_chave(v.chave)))
+    return dias
+
+
+# ── planilha ────────────────────────────────────────────────────────────────
+
+def vendas_armazem(importacao_id):
+    _, linhas = armazem.consultar(
+        "SELECT orig_linha, data_iso, loja_id, vendedor_id, valor_venda, imei, " + ', '.join(TIPOS) +
+        " FROM linhas WHERE importacao_id = ? AND situacao = 'importada'", (importacao_id,))
+    if not linhas:
+        sys.exit(f'Lote {importacao_id} nao esta no armazem (scripts/armazem.py lotes)')
+    return [Venda(l[2], l[1], l[3], l[4], dict(zip(TIPOS, l[6:])), f'linha {l[0]}', l[5]) for l in linhas]
+
+
+def vendas_csv(caminho):
+    vendas = []
+    with open(caminho, encoding='utf-8-sig', newline='') as f:
+        for row in csv.DictReader(f):
+            c = armazem.campos_csv(row)
+            if not c['data_iso'] or not (c.get('valor_venda') or 0) > 0 or not c['vendedor_id'] \
+                    or not c['loja_id'].isdigit():
+                continue
+            pagamentos = {t: c.get(t) or 0 for t in TIPOS}
+            if c['precisa_revisao'] == 'SIM':
+                pagamentos = {'pix': c['valor_venda']}
+            vendas.append(Venda(c['loja_id'], c['data_iso'], c['vendedor_id'], c['valor_venda'],
+                                pagamentos, f'linha {row.get("orig_linha", "?")}', c['imei']))
+    return vendas
+
+
+# ── banco ───────────────────────────────────────────────────────────────────
+
+_NUM = "to_char(coalesce({}, 0), 'FM999999999990.00')"
+
+SQL_VENDAS = """
+WITH escopo AS (
+    SELECT v.id, v.loja_id, v.criado_em::date AS dia, v.vendedor_id, v.valor_total
+    FROM vendas v WHERE {filtro}
+), pg AS (
+    SELECT p.venda_id, {somas}
+    FROM pagamentos_venda p JOIN escopo e ON e.id = p.venda_id
+    GROUP BY p.venda_id
+), s AS (
+    SELECT e.id, e.loja_id, e.dia, e.vendedor_id, e.valor_total, {colunas},
+           concat_ws('|', e.dia, e.loja_id, coalesce(e.vendedor_id::text, ''), {textos}) AS chave
+    FROM escopo e LEFT JOIN pg ON pg.venda_id = e.id
+)
+""".strip()
+
+
+def _sql_vendas(filtro):
+    somas = ', '.join(f"sum(p.valor) FILTER (WHERE p.tipo_pagamento = '{t}') AS {t}" for t in TIPOS)
+    colunas = ', '.join(f'coalesce(pg.{t}, 0) AS {t}' for t in TIPOS)
+    textos = ', '.join([_NUM.format('e.valor_total')] + [_NUM.format(f'pg.{t}') for t in TIPOS])
+    return SQL_VENDAS.format(filtro=filtro, somas=somas, colunas=colunas, textos=textos)
+
+
+def escopo_banco(importacao_id, vendas_planilha):
+    """(filtro SQL sobre vendas v, parametros)."""
+    if importacao_id:
+        return ("v.id IN (SELECT registro_id FROM importacao.importacao_registros "
+                "WHERE importacao_id = %s AND tabela = 'vendas')"), [importacao_id]
+    dias = [v.dia for v in vendas_planilha]
+    lojas = sorted({v.loja for v in vendas_planilha})
+    return 'v.criado_em::date BETWEEN %s AND %s AND v.loja_id = ANY(%s)', [min(dias), max(dias), lojas]
+
+
+def dias_banco(cur, filtro, params):
+    """A consulta agregada: um No por (loja, dia)."""
+    cur.execute(_sql_vendas(filtro) + f"""
+SELECT loja_id, dia::text, count(*), sum(valor_total),
+       sum(('x' || substr(md5(chave), 1, {BITS}))::bit({BITS * 4})::bigint)
+FROM s GROUP BY 1, 2""", params)
+    return {(loja, dia): No(n, valor, h) for loja, dia, n, valor, h in cur.fetchall()}
+
+
+def vendas_banco(cur, filtro, params, dias):
+    """Vendas so dos (loja, dia) pedidos."""
+    if not dias:
+        return []
+    pares = ', '.join(['(%s, %s::date)'] * len(dias))
+    cur.execute(_sql_vendas(filtro + f' AND (v.loja_id, v.criado_em::date) IN ({pares})') + f"""
+SELECT s.id, s.loja_id, s.dia::text, s.vendedor_id::text, s.valor_total, {', '.join('s.' + t for t in TIPOS)},
+       (SELECT min(a.imei) FROM aparelhos a WHERE a.venda_id = s.id)
+FROM s""", params + [x for d in dias for x in d])
+    return [Venda(l[1], l[2], l[3], l[4], dict(zip(TIPOS, l[5:10])), f'venda {l[0]}', l[10])
+            for l in cur.fetchall()]
+
+
+# ── comparacao ──────────────────────────────────────────────────────────────
+
+def divergentes(dias_a, dias_b):
+    """
+    Desce so pelos ramos diferentes. Retorna ([(caminho, no_a, no_b)],
+    [(loja, dia) divergentes], nos comparados).
+    """
+    nos_a, filhos_a = arvore(dias_a)
+    nos_b, filhos_b = arvore(dias_b)
+    saida, dias, comparados = [], [], 0
+
+    def descer(caminho):
+        nonlocal comparados
+        comparados += 1
+        a, b = nos_a.get(caminho, No()), nos_b.get(caminho, No())
+        if a == b:
+            return
+        saida.append((caminho, a, b))
+        if len(caminho) == 3:
+            dias.append((caminho[0], caminho[2]))
+            return
+        for filho in sorted(filhos_a.get(caminho, set()) | filhos_b.get(caminho, set())):
+            descer(filho)
+
+    descer(())
+    return saida, dias, comparados
+
+
+def diferencas_dia(planilha, banco):
+    """Vendas de um dia: (so na planilha, so no banco), pareadas pela ordem de IMEI/valor."""
+    sobra = Counter(v.chave for v in planilha)
+    sobra.subtract(v.chave for v in banco)
+    so_a, so_b = [], []
+    for v in planilha:
+        if sobra[v.chave] > 0:
+            so_a.append(v)
+            sobra[v.chave] -= 1
+    for v in banco:
+        if sobra[v.chave] < 0:
+            so_b.append(v)
+            sobra[v.chave] += 1
+    par = lambda v: (v.imei == '', v.imei, v.valor)
+    return sorted(so_a, key=par), sorted(so_b, key=par)
+
+
+if __name__ == '__main__':
+    perfilador.ativar()
+    importacao_id, caminho = arg_valor('--importacao'), arg_valor('--csv')
+    if not importacao_id and not caminho:
+        sys.exit(__doc__)
+    max_dias = arg_valor('--max-dias', 50, int)
+
+    perfilador.etapa('planilha')
+    planilha = vendas_csv(caminho) if caminho else vendas_armazem(importacao_id)
+    origem = os.path.basename(caminho) if caminho else f'armazem:{importacao_id}'
+    dias_planilha = dias_de(planilha)
+
+    perfilador.etapa('banco')
+    from carregador import conectar
+    conn = conectar(arg_valor('--dsn'))
+    filtro, params = escopo_banco(importacao_id, planilha)
+    with conn.cursor() as cur:
+        dias_bd = dias_banco(cur, filtro, params)
+
+        perfilador.etapa('comparacao')
+        saida, dias, comparados = divergentes(dias_planilha, dias_bd)
+        print(f'Planilha: {origem} ({len(planilha)} vendas, {len(dias_planilha)} dias) | '
+              f'banco: {sum(n.n for n in dias_bd.values())} vendas, {len(dias_bd)} dias')
+        if not saida:
+            print(f'OK: arvores iguais ({comparados} no comparado)')
+            sys.exit(0)
+
+        print(f'\n{"":34s} {"planilha":>28s}   {"banco":>28s}')
+        for caminho, a, b in saida:
+            nivel = len(caminho)
+            nome = ('total', f'loja {caminho[0]}' if caminho else '', *caminho[1:])[nivel]
+            print(f'{"  " * nivel}{nome:{34 - 2 * nivel}s} {a}   {b}')
+
+        perfilador.etapa('vendas')
+        detalhar = dias[:max_dias]
+        bd = vendas_banco(cur, filtro, params, detalhar)
+    conn.close()
+
+    por_dia_a, por_dia_b = defaultdict(list), defaultdict(list)
+    pedidos = set(detalhar)
+    for v in planilha:
+        if (v.loja, v.dia) in pedidos:
+            por_dia_a[(v.loja, v.dia)].append(v)
+    for v in bd:
+        por_dia_b[(v.loja, v.dia)].append(v)
+    print(f'\nVendas divergentes ({len(detalhar)} de {len(dias)} dias; {len(bd)} vendas lidas do banco):')
+    for loja, dia in detalhar:
+        so_a, so_b = diferencas_dia(por_dia_a[(loja, dia)], por_dia_b[(loja, dia)])
+        print(f'  loja {loja} {dia}')
+        for v in so_a:
+            print(f'    so na planilha: {v.descricao()}')
+        for v in so_b:
+            print(f'    so no banco:    {v.descricao()}')
+    print(f'\n{comparados} nos comparados, {len(dias)} dias divergentes')
+    sys.exit(1)
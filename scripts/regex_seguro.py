@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Regex dos parsers de pagamento com motor linear opcional e prazo por linha.
+
+Varios padroes de troca/pagamento tem grupo preguicoso seguido de sufixo
+longo ('(.+?)\\s+DE\\s+ENTRADA\\s+NO\\s+VALOR\\s+DE...', 'ENTRADA\\s+(.+?)\\s+R?\\$?...')
+e no `re` fazem backtracking polinomial numa observacao longa colada na
+planilha - uma linha dessas travava a importacao inteira.
+
+  - motor: com o pacote google-re2 instalado (`import re2`, opcional em
+    scripts/requirements.txt) cada padrao e compilado no RE2, tempo linear
+    garantido. \\w \\s \\d viram as classes Unicode equivalentes (no RE2
+    sao so ASCII), entao o resultado e o mesmo do `re`. Padrao que o RE2 nao
+    aceita (lookaround `(?!...)` `(?<!...)`, \\b, flags alem de I/M/S) cai
+    no `re` - so ele. REGEX_MOTOR=re forca o `re`.
+  - padroes: grupo numerico na frente ('([\\d.,]+)\\s*PIX') leva um
+    `(?<![\\d.,])` para so tentar no inicio do numero - sem ele o `re` tenta
+    de cada digito de uma sequencia longa (quadratico).
+  - prazo: `with prazo(texto):` em volta do parse de UMA linha. Cada chamada
+    (e cada match do finditer) confere o relogio; estourou -> PrazoEsgotado,
+    e quem chamou manda a linha para revisao. Texto acima de TAMANHO_MAX nem
+    e tentado. O `re` nao para no meio de um match: o prazo corta entre
+    chamadas; o pior caso de UM padrao so o RE2 (ou o TAMANHO_MAX) limita.
+
+Mesma assinatura do `re` para o que os parsers usam:
+  import regex_seguro as rx
+  with rx.prazo(forma):
+      rx.search(p, t); rx.finditer(p, t); rx.sub(p, r, t) ...
+"""
+import os, re, threading, time
+from contextlib import contextmanager
+
+try:
+    import re2
+except ImportError:
+    re2 = None
+if os.environ.get('REGEX_MOTOR') == 're':
+    re2 = None
+
+MOTOR = 're2' if re2 else 're'
+PRAZO_LINHA = float(os.environ.get('REGEX_PRAZO', '0.5'))  # segundos por linha
+TAMANHO_MAX = 2000  # caracteres de texto de pagamento
+
+_local = threading.local()
+_compilados = {}
+
+# classes do `re` (Unicode) escritas para o RE2, dentro e fora de [...]
+_CLASSES_RE2 = {'w': r'\pL\pN_', 's': r'\s\p{Z}\x1c-\x1f\x85', 'd': r'\p{Nd}'}
+_SEM_RE2 = re.compile(r'\(\?[=!<]|\\[bBWSDAZ1-9]')
+_FLAGS_RE2 = {re.IGNORECASE: 'i', re.MULTILINE: 'm', re.DOTALL: 's'}
+
+
+class PrazoEsgotado(Exception):
+    """Linha cujo parse passou do prazo (ou texto grande demais) - vai para revisao."""
+
+
+def para_re2(padrao, flags=0):
+    """Padrao equivalente para o RE2, ou None se so o `re` roda ele."""
+    if _SEM_RE2.search(padrao):
+        return None
+    inline = ''
+    for f, letra in _FLAGS_RE2.items():
+        if flags & f:
+            inline += letra
+            flags &= ~f
+    if flags & ~re.UNICODE:
+        return None
+    saida, i, em_classe = [], 0, False
+    while i < len(padrao):
+        c = padrao[i]
+        if c == '\\' and i + 1 < len(padrao):
+            esc = padrao[i + 1]
+            if esc in _CLASSES_RE2:
+                classe = _CLASSES_RE2[esc]
+                saida.append(classe if em_classe else f'[{classe}]')
+            else:
+                saida.append(padrao[i:i + 2])
+            i += 2
+            continue
+        if c == '[' and not em_classe:
+            em_classe = True
+            saida.append(c)
+            # ']' logo depois de '[' ou '[^' e literal
+            for prox in ('^', ']'):
+                if padrao.startswith(prox, i + 1):
+                    saida.append(prox)
+                    i += 1
+        elif c == ']' and em_classe:
+            em_classe = False
+            saida.append(c)
+        else:
+            saida.append(c)
+        i += 1
+    return (f'(?{inline})' if inline else '') + ''.join(saida)
+
+
+def compilar(padrao, flags=0):
+    """Padrao compilado no RE2 quando possivel, senao no `re` (em cache)."""
+    chave = (padrao, flags)
+    c = _compilados.get(chave)
+    if c is None:
+        traduzido = para_re2(padrao, flags) if re2 is not None else None
+        if traduzido is not None:
+            try:
+                c = re2.compile(traduzido)
+            except re2.error:
+                c = None
+        if c is None:
+            c = re.compile(padrao, flags)
+        _compilados[chave] = c
+    return c
+
+
+def motor_de(padrao, flags=0):
+    """'re2' ou 're' - qual motor roda `padrao`."""
+    return 're' if isinstance(compilar(padrao, flags), re.Pattern) else 're2'
+
+
+def _conferir():
+    limite = getattr(_local, 'limite', None)
+    if limite is not None and time.perf_counter() > limite:
+        raise PrazoEsgotado(f'parse passou de {PRAZO_LINHA:g}s')
+
+
+@contextmanager
+def prazo(texto='', segundos=None):
+    """Limita o tempo das chamadas de regex dentro do bloco (aninhado: vale o menor)."""
+    if texto and len(texto) > TAMANHO_MAX:
+        raise PrazoEsgotado(f'texto com {len(texto)} caracteres (max {TAMANHO_MAX})')
+    anterior = getattr(_local, 'limite', None)
+    limite = time.perf_counter() + (PRAZO_LINHA if segundos is None else segundos)
+    _local.limite = limite if anterior is None else min(anterior, limite)
+    try:
+        yield
+    finally:
+        _local.limite = anterior
+
+
+def search(padrao, texto, flags=0):
+    _conferir()
+    return compilar(padrao, flags).search(texto)
+
+
+def match(padrao, texto, flags=0):
+    _conferir()
+    return compilar(padrao, flags).match(texto)
+
+
+def findall(padrao, texto, flags=0):
+    _conferir()
+    return compilar(padrao, flags).findall(texto)
+
+
+def finditer(padrao, texto, flags=0):
+    _conferir()
+    for m in compilar(padrao, flags).finditer(texto):
+        yield m
+        _conferir()
+
+
+def sub(padrao, repl, texto, count=0, flags=0):
+    _conferir()
+    return compilar(padrao, flags).sub(repl, texto, count)
+
+
+def split(padrao, texto, maxsplit=0, flags=0):
+    _conferir()
+    return compilar(padrao, flags).split(texto, maxsplit)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Registros de linha das planilhas de venda com __slots__ (sem __dict__ por
+linha): ~3-4x menos memoria que o dict de 30 chaves que cada script montava
+e acesso por atributo nos lacos quentes. Vira dict/lista so na escrita.
+
+  VendaFinal        gerar_csv_final.py   -> vendas_final.csv
+  VendaNormalizada  normalizar_vendas2.py -> vendas_aparelhos2_normalizado.csv
+  VendaAnalisada    analisar_importacao.py -> preview_importacao.csv
+  TrocaDetectada / TrocaRevisao          -> trocas_*.csv
+
+CAMPOS = colunas do CSV de saida, na ordem; INTERNOS = atributos so de
+trabalho (nao vao para o arquivo). Cada classe declara __slots__ =
+slots(CAMPOS (+ INTERNOS), CATEGORICOS). Campo nao informado comeca com
+PADRAO (ou '').
+
+Colunas categoricas (CATEGORICOS = {campo: Categoria}): vendedor, loja,
+estado, marca, formas - poucas dezenas de valores distintos. O registro
+guarda so o codigo inteiro (slot _cod_<campo>); ler o atributo devolve a
+string da tabela, a mesma para todas as linhas. Categoria.normalizar
+aplica .title()/.upper() uma vez por texto distinto, e os resumos
+agrupam por codigo (codigos + contar/somar) em vez de comparar strings.
+"""
+import csv
+from array import array
+
+
+class Categoria:
+    """Tabela compartilhada valor <-> codigo (0, 1, 2... na ordem em que aparecem)."""
+    __slots__ = ('nome', 'valores', '_codigo', '_normalizado')
+
+    def __init__(self, nome):
+        self.nome = nome
+        self.valores = []        # codigo -> valor
+        self._codigo = {}        # valor -> codigo
+        self._normalizado = {}   # funcao -> {texto cru: valor}
+
+    def __len__(self):
+        return len(self.valores)
+
+    def codigo(self, valor):
+        c = self._codigo.get(valor)
+        if c is None:
+            c = self._codigo[valor] = len(self.valores)
+            self.valores.append(valor)
+        return c
+
+    def normalizar(self, cru, funcao):
+        """funcao(cru) uma vez por (funcao, cru); devolve o valor da tabela (objeto unico)."""
+        try:
+            return self._normalizado[funcao][cru]
+        except KeyError:
+            v = self.valores[self.codigo(funcao(cru))]
+            self._normalizado.setdefault(funcao, {})[cru] = v
+            return v
+
+    def contar(self, codigos):
+        n = [0] * len(self.valores)
+        for c in codigos:
+            n[c] += 1
+        return n
+
+    def somar(self, codigos, pesos):
+        """Soma de `pesos` por codigo, na ordem das linhas (mesmo float que sum())."""
+        t = [0] * len(self.valores)
+        for c, p in zip(codigos, pesos):
+            t[c] += p
+        return t
+
+
+# Tabelas compartilhadas entre as classes (e entre os scripts do processo)
+VENDEDOR = Categoria('vendedor')
+LOJA = Categoria('loja')
+ESTADO = Categoria('estado')
+MARCA = Categoria('marca')
+FORMAS = Categoria('formas')
+
+
+def slots(campos, categoricos=None):
+    """__slots__ de `campos`, com _cod_<campo> no lugar das colunas categoricas."""
+    return tuple(f'_cod_{c}' if c in (categoricos or {}) else c for c in campos)
+
+
+def _categorico(campo, tabela):
+    slot = f'_cod_{campo}'
+    codigo, valores = tabela.codigo, tabela.valores
+    pegar = object.__getattribute__
+
+    def ler(self):
+        return valores[pegar(self, slot)]
+
+    def gravar(self, valor):
+        object.__setattr__(self, slot, codigo(valor))
+    return property(ler, gravar)
+
+
+class Registro:
+    __slots__ = ()
+    CAMPOS = ()
+    INTERNOS = ()
+    PADRAO = {}
+    CATEGORICOS = {}
+
+    def __init_subclass__(cls, **kw):
+        super().__init_subclass__(**kw)
+        for campo, tabela in cls.__dict__.get('CATEGORICOS', {}).items():
+            setattr(cls, campo, _categorico(campo, tabela))
+
+    def __init__(self, **valores):
+        for c in self.CAMPOS + self.INTERNOS:
+            setattr(self, c, valores.pop(c) if c in valores else self.PADRAO.get(c, ''))
+        if valores:
+            raise TypeError(f'{type(self).__name__}: campos desconhecidos {sorted(valores)}')
+
+    def linha(self, campos=None):
+        """Valores na ordem de `campos` (padrao CAMPOS) - para csv.writer."""
+        return [getattr(self, c) for c in (campos or self.CAMPOS)]
+
+    def como_dict(self):
+        return {c: getattr(self, c) for c in self.CAMPOS}
+
+    @classmethod
+    def codigos(cls, registros, campo):
+        """array de codigos de `campo` (categorico) - para Categoria.contar/somar."""
+        slot = f'_cod_{campo}'
+        return array('I', [getattr(r, slot) for r in registros])
+
+    def __repr__(self):
+        return f'{type(self).__name__}({", ".join(f"{c}={getattr(self, c)!r}" for c in self.CAMPOS[:4])}, ...)'
+
+
+def gravar_csv(caminho, registros, campos, encoding='utf-8', **abrir):
+    """Escreve cabecalho + registros (Registro.linha) - mesma saida do DictWriter."""
+    with open(caminho, 'w', newline='', encoding=encoding, **abrir) as f:
+        w = csv.writer(f)
+        w.writerow(campos)
+        for r in registros:
+            w.writerow(r.linha(campos))
+
+
+class VendaFinal(Registro):
+    """Linha de vendas_final.csv (pagamentos extraidos + revisao)."""
+    CAMPOS = (
+        'orig_linha', 'data', 'modelo', 'imei',
+        'valor_venda', 'brinde', 'custo', 'lucro',
+        'pix', 'dinheiro', 'cartao_credito', 'cartao_debito',
+        'troca_aparelho', 'soma_pagamentos', 'diferenca',
+        'formas_pgto', 'tem_troca', 'modelo_troca', 'valor_troca',
+        'pagto_junto', 'pagto_junto_grupo', 'pagto_junto_total', 'pagto_junto_restante',
+        'vendedor', 'vendedor_id', 'loja', 'loja_id', 'estado', 'observacao',
+        'precisa_revisao', 'motivo_revisao', 'entendimento',
+    )
+    INTERNOS = ('taxa_aplicada', 'arredondamento')
+    CATEGORICOS = {'vendedor': VENDEDOR, 'loja': LOJA, 'estado': ESTADO, 'formas_pgto': FORMAS}
+    __slots__ = slots(CAMPOS + INTERNOS, CATEGORICOS)
+    PADRAO = {'pix': 0, 'dinheiro': 0, 'cartao_credito': 0, 'cartao_debito': 0,
+              'soma_pagamentos': 0, 'diferenca': 0, 'arredondamento': 0}
+
+
+class VendaNormalizada(Registro):
+    """Linha de vendas_aparelhos2_normalizado.csv (preview do lote 2)."""
+    CAMPOS = (
+        'orig_linha', 'data', 'data_iso', 'modelo', 'marca', 'imei', 'imei_dup',
+        'valor_venda', 'brinde', 'custo', 'lucro',
+        'forma_orig', 'formas_norm', 'pix', 'dinheiro', 'cartao_credito', 'cartao_debito',
+        'troca_aparelho', 'modelo_troca', 'soma_pgto',
+        'precisa_revisao', 'motivo_revisao',
+        'estado', 'vendedor', 'vendedor_id', 'loja', 'loja_id', 'issues',
+    )
+    CATEGORICOS = {'marca': MARCA, 'formas_norm': FORMAS, 'estado': ESTADO,
+                   'vendedor': VENDEDOR, 'loja': LOJA}
+    __slots__ = slots(CAMPOS, CATEGORICOS)
+
+
+class VendaAnalisada(Registro):
+    """Linha analisada de venda_aparelhos.csv (formas/trocas ainda como listas)."""
+    CAMPOS = (
+        'data', 'data_iso', 'modelo', 'imei', 'valor_venda', 'custo', 'brinde', 'lucro',
+        'formas', 'tem_troca', 'trocas', 'valores_pagto',
+        'vendedor_nome', 'vendedor_id', 'loja_nome', 'loja_id',
+    )
+    CATEGORICOS = {'vendedor_nome': VENDEDOR, 'loja_nome': LOJA}
+    __slots__ = slots(CAMPOS, CATEGORICOS)
+
+
+class TrocaDetectada(Registro):
+    """Aparelho recebido na troca, extraido do texto de pagamento."""
+    CAMPOS = ('modelo_vendido', 'valor_venda', 'modelo_troca', 'valor_troca', 'vendedor',
+              'data', 'data_iso', 'loja', 'loja_id', 'forma_orig')
+    CATEGORICOS = {'vendedor': VENDEDOR, 'loja': LOJA}
+    __slots__ = slots(CAMPOS, CATEGORICOS)
+
+
+class TrocaRevisao(Registro):
+    """Venda com troca cujo aparelho/valor nao foi extraido (revisao manual)."""
+    CAMPOS = ('modelo_vendido', 'valor_venda', 'vendedor', 'data', 'loja', 'loja_id', 'forma_orig')
+    CATEGORICOS = {'vendedor': VENDEDOR, 'loja': LOJA}
+    __slots__ = slots(CAMPOS, CATEGORICOS)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Resolve nomes de vendedor / loja das planilhas (grafias livres: RENAN, RENANN,
+RENNAN, Raissa/Rayssa, "BLOCO  B") para o id do cadastro, com uma confianca.
+
+Fontes, nesta ordem de prioridade:
+  apelidos   o mapa explicito de cada script (VENDEDOR_MAP / LOJA_MAP). Sao
+             DECISOES (Angel -> Angel Dourado num lote, -> Ronald em outro;
+             Luiz Henrique -> Luiz Felipe) e por isso cada script passa o seu
+  cadastro   scripts/_snapshot_cadastro.tsv (usuarios + lojas do banco, gerado
+             pelo snapshot_banco.py): nome completo e cada palavra do nome
+
+Chave = nome sem acento, minusculo, letras repetidas colapsadas e y -> i
+(RENNAN = RENAN, Rayssa = Raissa). O indice de trigramas e montado uma vez;
+cada texto distinto e resolvido uma vez (cache), o resto e um dict.
+
+Confianca:
+  1.0    chave igual a um apelido ou a um nome completo do cadastro
+  0.95   chave igual a UMA palavra de UM so nome do cadastro (Marcela)
+  <0.95  aproximado: media de trigramas (dice) e edicao (Levenshtein)
+  ambiguo: dois ids diferentes a menos de MARGEM -> id None
+O chamador decide o corte (CONFIANCA_MIN) e anota o que nao foi exato.
+
+Uso:
+  python3 scripts/resolvedor_nomes.py vendedor RENNAN Raissa "angel d"
+  python3 scripts/resolvedor_nomes.py loja "bloco  b" onlne
+"""
+import csv, os, sys, time, unicodedata
+from collections import namedtuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SNAP_CADASTRO = os.path.join(ROOT, 'scripts', '_snapshot_cadastro.tsv')
+
+CONFIANCA_MIN = 0.8   # abaixo disso o chamador trata como "sem cadastro"
+MARGEM = 0.08         # segundo id a menos disso do primeiro = ambiguo
+CANDIDATOS = 8        # quantos (por trigramas) passam para o Levenshtein
+PESO_PALAVRA = 0.95   # casar so uma palavra do nome vale menos que o nome todo
+
+Resolucao = namedtuple('Resolucao', 'id nome confianca via')
+NADA = Resolucao(None, '', 0.0, 'nada')
+
+
+def chave(texto):
+    """'  RENNAN  Leonardo' -> 'renan leonardo' (sem acento, sem repeticao, y->i)."""
+    t = unicodedata.normalize('NFKD', str(texto or '')).encode('ascii', 'ignore').decode().lower()
+    t = ''.join(c if c.isalnum() else ' ' for c in t).replace('y', 'i')
+    saida = []
+    for c in t:
+        if not saida or c != saida[-1] or c.isdigit():
+            saida.append(c)
+    return ' '.join(''.join(saida).split())
+
+
+def trigramas(k):
+    k = f'  {k} '
+    return {k[i:i + 3] for i in range(len(k) - 2)}
+
+
+def levenshtein(a, b):
+    if len(a) < len(b):
+        a, b = b, a
+    anterior = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        atual = [i]
+        for j, cb in enumerate(b, 1):
+            atual.append(min(anterior[j] + 1, atual[j - 1] + 1, anterior[j - 1] + (ca != cb)))
+        anterior = atual
+    return anterior[-1]
+
+
+class Resolvedor:
+    """Indice de um tipo (vendedor ou loja). cadastro = {id: nome}; apelidos = {texto: id}."""
+
+    def __init__(self, cadastro=None, apelidos=None):
+        self.nomes = {}      # id -> nome de exibicao
+        self.exatos = {}     # chave -> (id, confianca, via); id None = chave ambigua
+        palavras = {}        # chave de uma palavra -> {ids}
+        for id_, nome in (cadastro or {}).items():
+            self.nomes[id_] = nome
+            k = chave(nome)
+            if k:
+                self._exato(k, id_, 1.0, 'cadastro')
+            for p in k.split():
+                if len(p) >= 3:
+                    palavras.setdefault(p, set()).add(id_)
+        for p, ids in palavras.items():
+            if p not in self.exatos:
+                self.exatos[p] = (next(iter(ids)) if len(ids) == 1 else None, PESO_PALAVRA, 'palavra')
+        for texto, id_ in (apelidos or {}).items():   # apelido vence o cadastro
+            self.nomes.setdefault(id_, texto)
+            if chave(texto):
+                self.exatos[chave(texto)] = (id_, 1.0, 'apelido')
+
+        self.trigramas = {}  # trigrama -> [chaves]
+        for k in self.exatos:
+            for t in trigramas(k):
+                self.trigramas.setdefault(t, []).append(k)
+        self._cache = {}
+
+    def _exato(self, k, id_, confianca, via):
+        atual = self.exatos.get(k)
+        if atual and atual[0] != id_:
+            self.exatos[k] = (None, confianca, via)   # dois cadastros com o mesmo nome
+        else:
+            self.exatos[k] = (id_, confianca, via)
+
+    def resolver(self, texto):
+        """Resolucao(id, nome, confianca, via). id None = nao achou ou ambiguo."""
+        r = self._cache.get(texto)
+        if r is None:
+            r = self._cache[texto] = self._resolver(chave(texto))
+        return r
+
+    def _resolver(self, k):
+        if not k:
+            return NADA
+        if k in self.exatos:
+            id_, conf, via = self.exatos[k]
+            return Resolucao(id_, self.nomes.get(id_, ''), conf, via if id_ else 'ambiguo')
+
+        tq = trigramas(k)
+        comuns = {}
+        for t in tq:
+            for c in self.trigramas.get(t, ()):
+                comuns[c] = comuns.get(c, 0) + 1
+        if not comuns:
+            return NADA
+        melhores = sorted(comuns, key=lambda c: -comuns[c] / (len(tq) + len(trigramas(c))))[:CANDIDATOS]
+        por_id = {}
+        for c in melhores:
+            id_, peso, via = self.exatos[c]
+            dice = 2 * comuns[c] / (len(tq) + len(trigramas(c)))
+            edicao = 1 - levenshtein(k, c) / max(len(k), len(c))
+            nota = (dice + edicao) / 2 * min(peso, 0.99)
+            if nota > por_id.get(id_, (0,))[0]:
+                por_id[id_] = (nota, via)
+        ranking = sorted(por_id.items(), key=lambda x: -x[1][0])
+        id_, (nota, via) = ranking[0]
+        if id_ is None or (len(ranking) > 1 and ranking[1][1][0] > nota - MARGEM):
+            return Resolucao(None, '', round(nota, 3), 'ambiguo')
+        return Resolucao(id_, self.nomes.get(id_, ''), round(nota, 3), 'aproximado')
+
+
+def ler_cadastro(caminho=SNAP_CADASTRO):
+    """{'usuario': {id: nome}, 'loja': {id: nome}} do snapshot ({} se nao existe)."""
+    tipos = {'usuario': {}, 'loja': {}}
+    if os.path.exists(caminho):
+        with open(caminho, encoding='utf-8', newline='') as f:
+            for l in csv.reader(f, delimiter='\t'):
+                if len(l) >= 3 and l[0] in tipos:
+                    tipos[l[0]][int(l[1]) if l[0] == 'loja' else l[1]] = l[2]
+    return tipos
+
+
+def vendedores(apelidos=None, caminho=SNAP_CADASTRO):
+    return Resolvedor(ler_cadastro(caminho)['usuario'], apelidos)
+
+
+def lojas(apelidos=None, caminho=SNAP_CADASTRO):
+    return Resolvedor(ler_cadastro(caminho)['loja'], apelidos)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3 or sys.argv[1] not in ('vendedor', 'loja'):
+        sys.exit(__doc__)
+    if not os.path.exists(SNAP_CADASTRO):
+        print(f'AVISO: {SNAP_CADASTRO} nao existe - rode scripts/snapshot_banco.py')
+    t0 = time.perf_counter()
+    r = vendedores() if sys.argv[1] == 'vendedor' else lojas()
+    print(f'Indice: {len(r.exatos)} chaves em {(time.perf_counter() - t0) * 1000:.1f}ms\n')
+    for texto in sys.argv[2:]:
+        t0 = time.perf_counter()
+        res = r.resolver(texto)
+        us = (time.perf_counter() - t0) * 1e6
+        print(f'  {texto!r:24s} -> {res.nome or "-":24s} {str(res.id or ""):38s} {res.confianca:.2f} {res.via} ({us:.0f}us)')
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Desfaz UMA importacao registrada em importacao_registros (ver
+importacao_registro.py): uma transacao, DELETEs set-based em ordem de FK.
+Outras importacoes e as vendas lancadas pelo PDV nao sao tocadas; se o PDV
+ja lancou algo numa venda da importacao (pagamento, devolucao, credito...),
+a reversao aborta sem apagar nada.
+
+Uso:
+  python3 scripts/reverter_importacao.py --listar                 # importacoes no banco (IMPORTACAO_DSN)
+  python3 scripts/reverter_importacao.py ID                       # so gera scripts/reverter_importacao.sql
+  python3 scripts/reverter_importacao.py ID --conectar            # aplica via IMPORTACAO_DSN / --dsn
+  python3 scripts/reverter_importacao.py ID --executar            # aplica na VPS via SSH
+"""
+import os, sys, subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+from importacao_registro import sql_reverter
+from importacao_cli import arg_valor, args_posicionais
+from carregador import conectar
+import perfilador
+SQL_PATH = os.path.join(ROOT, 'scripts', 'reverter_importacao.sql')
+
+SQL_LISTAR = """
+SELECT i.id, i.script, i.fonte, i.criado_em, i.revertida_em,
+       count(r.*) FILTER (WHERE r.tabela = 'vendas') AS vendas,
+       count(r.*) AS registros
+FROM importacao.importacoes i
+LEFT JOIN importacao.importacao_registros r ON r.importacao_id = i.id
+GROUP BY i.id ORDER BY i.criado_em DESC"""
+
+
+if __name__ == '__main__':
+    perfilador.ativar()
+    if '--listar' in sys.argv:
+        conn = conectar(arg_valor('--dsn'))
+        with conn.cursor() as cur:
+            cur.execute(SQL_LISTAR)
+            for id_, script, fonte, criado, revertida, vendas, registros in cur.fetchall():
+                situacao = f'REVERTIDA {revertida:%d/%m %H:%M}' if revertida else f'{vendas} vendas, {registros} registros'
+                print(f'{id_:<40} {criado:%d/%m/%Y %H:%M}  {fonte or script:<30} {situacao}')
+        sys.exit(0)
+
+    args = args_posicionais(com_valor=('--dsn',))
+    if not args:
+        sys.exit(__doc__)
+    importacao_id = args[0]
+
+    sql = sql_reverter(importacao_id)
+    with open(SQL_PATH, 'w', encoding='utf-8') as f:
+        f.write(sql + '\n')
+    print(f'SQL de reversao de "{importacao_id}": {SQL_PATH}')
+
+    if '--conectar' in sys.argv:
+        conn = conectar(arg_valor('--dsn'))
+        conn.autocommit = True  # o proprio SQL tem BEGIN/COMMIT
+        with conn.cursor() as cur:
+            cur.execute(sql)
+        print('Importacao revertida.')
+    elif '--executar' in sys.argv:
+        subprocess.run(['scp', SQL_PATH, 'vps:/tmp/reverter_importacao.sql'], check=True)
+        subprocess.run([
+            'ssh', 'vps',
+            'docker cp /tmp/reverter_importacao.sql supabase_db_LogCell:/tmp/reverter_importacao.sql && '
+            'docker exec supabase_db_LogCell psql -U postgres -v ON_ERROR_STOP=1 -f /tmp/reverter_importacao.sql'
+        ], check=True)
+        print('Importacao revertida.')
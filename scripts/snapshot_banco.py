@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Atualiza os snapshots do banco usados no dedup das importacoes
+(importar_vendas_aparelhos3.py):
+
+  _snapshot_imeis_todos.txt     IMEIs de todos os aparelhos (ordenado)
+  _snapshot_imeis_vendidos.txt  IMEIs dos aparelhos vendidos
+  _snapshot_modelo_valor.txt    "MARCA modelo|valor_venda" dos vendidos (dedup sem-IMEI)
+
+Base: _snapshot_aparelhos.tsv, uma linha por aparelho (id, imei, status, marca,
+modelo, valor_venda, versao) + cabecalho com as colunas. versao = md5 das
+colunas, calculado no banco. Tudo vem por COPY ... TO STDOUT numa conexao so:
+  - completo (1a vez, --completo ou base de outro formato): a tabela inteira
+  - incremental: COPY de (id, versao) de todos; so os ids novos ou com versao
+    diferente da base vem inteiros, e os que sumiram saem. NAO usa
+    atualizado_em: os geradores gravam nele a data historica da venda e a carga
+    em modo replica nem passa pelo trigger NOW(), entao ele nao marca mudanca.
+Os .txt sao sempre regerados da base, entao o importador le o formato de sempre.
+
+  _snapshot_cadastro.tsv        tipo (usuario|loja), id, nome - sempre completo
+                                (tabelas pequenas); usado pelo resolvedor_nomes.py
+
+Uso:
+  python3 scripts/snapshot_banco.py              # incremental (IMPORTACAO_DSN ou --dsn)
+  python3 scripts/snapshot_banco.py --completo   # refaz do zero
+"""
+import csv, io, os, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+from carregador import conectar
+from importacao_cli import arg_valor
+import perfilador
+
+BASE = os.path.join(ROOT, 'scripts', '_snapshot_aparelhos.tsv')
+SNAP_IMEIS_TODOS = os.path.join(ROOT, 'scripts', '_snapshot_imeis_todos.txt')
+SNAP_IMEIS_VENDIDOS = os.path.join(ROOT, 'scripts', '_snapshot_imeis_vendidos.txt')
+SNAP_MODELO_VALOR = os.path.join(ROOT, 'scripts', '_snapshot_modelo_valor.txt')
+SNAP_CADASTRO = os.path.join(ROOT, 'scripts', '_snapshot_cadastro.tsv')
+
+COLUNAS = ('id', 'imei', 'status', 'marca', 'modelo', 'valor_venda', 'versao')
+# md5 das colunas que os .txt usam (NULL e '' distintos: '\N' nao aparece em dado)
+SQL_VERSAO = ("md5(concat_ws('|', coalesce(imei, '\\N'), coalesce(status, '\\N'), coalesce(marca, '\\N'), "
+              "coalesce(modelo, '\\N'), coalesce(valor_venda::text, '\\N'))) AS versao")
+
+SQL_COPY = "COPY (SELECT {cols} FROM aparelhos{filtro}) TO STDOUT WITH (FORMAT csv)"
+SQL_COPY_CADASTRO = ("COPY (SELECT 'usuario', id::text, nome FROM usuarios "
+                     "UNION ALL SELECT 'loja', id::text, nome FROM lojas) TO STDOUT WITH (FORMAT csv)")
+
+
+def _copy(cur, sql, params=None):
+    """Linhas (listas de str; NULL vira '') de um COPY ... TO STDOUT."""
+    if params:
+        sql = cur.mogrify(sql, params).decode()
+    buf = io.StringIO()
+    cur.copy_expert(sql, buf)
+    buf.seek(0)
+    return list(csv.reader(buf))
+
+
+def ler_base(caminho=None):
+    """{id: linha}, ou None se nao existe ou e de outro formato (refazer completo)."""
+    caminho = caminho or BASE
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, encoding='utf-8', newline='') as f:
+        r = csv.reader(f, delimiter='\t')
+        if next(r, None) != ['#colunas', *COLUNAS]:
+            return None
+        return {l[0]: l for l in r if l}
+
+
+def gravar_base(linhas, caminho=None):
+    caminho = caminho or BASE
+    tmp = f'{caminho}.{os.getpid()}.tmp'
+    with open(tmp, 'w', encoding='utf-8', newline='') as f:
+        w = csv.writer(f, delimiter='\t', lineterminator='\n')
+        w.writerow(['#colunas', *COLUNAS])
+        for id_ in sorted(linhas):
+            w.writerow(linhas[id_])
+    os.replace(tmp, caminho)
+
+
+def gerar_txts(linhas):
+    """Regera os 3 .txt no formato que importar_vendas_aparelhos3.py le."""
+    todos, vendidos, mv = set(), [], []
+    for id_, imei, status, marca, modelo, valor, _ in linhas.values():
+        if imei:
+            todos.add(imei)
+        if status != 'vendido':
+            continue
+        if imei:
+            vendidos.append(imei)
+        mv.append(f'{marca.upper()} {modelo}|{valor}')
+    for caminho, itens in ((SNAP_IMEIS_TODOS, sorted(todos)),
+                           (SNAP_IMEIS_VENDIDOS, sorted(set(vendidos))),
+                           (SNAP_MODELO_VALOR, sorted(mv))):
+        tmp = caminho + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(itens) + '\n')
+        os.replace(tmp, caminho)
+    return {'imeis_todos': len(todos), 'imeis_vendidos': len(set(vendidos)), 'modelo_valor': len(mv)}
+
+
+def atualizar(conn, completo=False):
+    """Atualiza base + .txt. Retorna estatisticas (modo, lidas, removidas, ...)."""
+    linhas = None if completo else ler_base()
+    cols = ', '.join(COLUNAS[:-1] + (SQL_VERSAO,))
+    with conn.cursor() as cur:
+        # snapshot consistente: os dois COPY enxergam o mesmo estado
+        cur.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        if linhas is None:
+            modo, removidas = 'completo', 0
+            novas = _copy(cur, SQL_COPY.format(cols=cols, filtro=''))
+            linhas = {}
+        else:
+            modo = 'incremental'
+            versoes = dict(_copy(cur, SQL_COPY.format(cols='id, ' + SQL_VERSAO, filtro='')))
+            removidas = len(linhas.keys() - versoes.keys())
+            linhas = {k: v for k, v in linhas.items() if k in versoes}
+            mudaram = [k for k, v in versoes.items() if k not in linhas or linhas[k][-1] != v]
+            novas = _copy(cur, SQL_COPY.format(cols=cols, filtro=' WHERE id = ANY(%s::uuid[])'),
+                          (mudaram,)) if mudaram else []
+    conn.rollback()
+
+    for l in novas:
+        linhas[l[0]] = l
+    gravar_base(linhas)
+    st = {'modo': modo, 'lidas': len(novas), 'removidas': removidas, 'aparelhos': len(linhas)}
+    st.update(gerar_txts(linhas))
+    return st
+
+
+def atualizar_cadastro(conn, caminho=None):
+    """Regrava usuarios + lojas. Retorna {'usuario': n, 'loja': n}."""
+    caminho = caminho or SNAP_CADASTRO
+    with conn.cursor() as cur:
+        linhas = [l for l in _copy(cur, SQL_COPY_CADASTRO) if l[2]]
+    conn.rollback()
+    tmp = caminho + '.tmp'
+    with open(tmp, 'w', encoding='utf-8', newline='') as f:
+        csv.writer(f, delimiter='\t', lineterminator='\n').writerows(sorted(linhas))
+    os.replace(tmp, caminho)
+    return {t: sum(1 for l in linhas if l[0] == t) for t in ('usuario', 'loja')}
+
+
+def atualizar_tudo(conn, completo=False):
+    """atualizar + atualizar_cadastro (o que este script e o --atualizar-snapshot rodam)."""
+    return atualizar(conn, completo), atualizar_cadastro(conn)
+
+
+def resumo(st, cad):
+    """Linhas do relatorio de atualizar_tudo."""
+    return [f'Snapshot {st["modo"]}: {st["lidas"]} aparelhos lidos, {st["removidas"]} removidos, '
+            f'{st["aparelhos"]} na base',
+            f'  IMEIs todos:    {st["imeis_todos"]}',
+            f'  IMEIs vendidos: {st["imeis_vendidos"]}',
+            f'  Modelo|valor:   {st["modelo_valor"]}',
+            f'  Cadastro:       {cad["usuario"]} usuarios, {cad["loja"]} lojas']
+
+
+if __name__ == '__main__':
+    perfilador.ativar()
+    conn = conectar(arg_valor('--dsn'))
+    print('\n'.join(resumo(*atualizar_tudo(conn, completo='--completo' in sys.argv))))
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Verificacao do --atualizar-snapshot sem banco: roda snapshot_banco.atualizar_tudo
+(o mesmo caminho do importar_vendas_aparelhos3.py --atualizar-snapshot e do
+snapshot_banco.py) contra uma conexao falsa, num diretorio temporario:
+
+  1. completo: base, .txt e _snapshot_cadastro.tsv gravados; o
+     resolvedor_nomes acha vendedor e loja no cadastro gravado
+  2. incremental: um aparelho alterado, um novo e um removido -> lidas 2,
+     removidas 1; .txt refletem a mudanca
+  3. as chaves que atualizar() devolve e o resumo() (o que os scripts imprimem)
+
+Sai com 1 na primeira falha.
+
+Uso:
+  python3 scripts/verificar_snapshot.py
+"""
+import csv, hashlib, io, os, sys, tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+import resolvedor_nomes
+import snapshot_banco
+
+CHAVES = {'modo', 'lidas', 'removidas', 'aparelhos', 'imeis_todos', 'imeis_vendidos', 'modelo_valor'}
+
+
+def _versao(a):
+    partes = ['\\N' if a[c] is None else str(a[c]) for c in ('imei', 'status', 'marca', 'modelo', 'valor_venda')]
+    return hashlib.md5('|'.join(partes).encode()).hexdigest()
+
+
+class CursorFalso:
+    """Responde aos COPY do snapshot_banco a partir de `aparelhos` / `cadastro` da conexao."""
+
+    def __init__(self, conn):
+        self.conn, self.params = conn, None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        return False
+
+    def execute(self, sql, params=None):
+        pass
+
+    def mogrify(self, sql, params):
+        self.params = params
+        return sql.encode()
+
+    def copy_expert(self, sql, buf):
+        w = csv.writer(buf)
+        if 'FROM usuarios' in sql:
+            w.writerows(self.conn.cadastro)
+            return
+        aparelhos = self.conn.aparelhos
+        if 'ANY(' in sql:
+            ids = set(self.params[0])
+            aparelhos = {k: v for k, v in aparelhos.items() if k in ids}
+        for id_, a in aparelhos.items():
+            if sql.startswith('COPY (SELECT id, md5'):
+                w.writerow([id_, _versao(a)])
+            else:
+                w.writerow([id_, a['imei'] or '', a['status'], a['marca'], a['modelo'], a['valor_venda'], _versao(a)])
+
+
+class ConexaoFalsa:
+    def __init__(self, aparelhos, cadastro):
+        self.aparelhos, self.cadastro = aparelhos, cadastro
+
+    def cursor(self):
+        return CursorFalso(self)
+
+    def rollback(self):
+        pass
+
+
+def conferir(cond, msg):
+    if not cond:
+        sys.exit(f'FALHA: {msg}')
+    print(f'  ok  {msg}')
+
+
+def _ler(caminho):
+    with open(caminho, encoding='utf-8') as f:
+        return [l for l in f.read().splitlines() if l]
+
+
+def aparelho(imei, status, modelo, valor):
+    return {'imei': imei, 'status': status, 'marca': 'Apple', 'modelo': modelo, 'valor_venda': valor}
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as d:
+        for nome in ('BASE', 'SNAP_IMEIS_TODOS', 'SNAP_IMEIS_VENDIDOS', 'SNAP_MODELO_VALOR', 'SNAP_CADASTRO'):
+            setattr(snapshot_banco, nome, os.path.join(d, os.path.basename(getattr(snapshot_banco, nome))))
+        conn = ConexaoFalsa({
+            'a1': aparelho('111', 'vendido', 'IPHONE 13', '3000.00'),
+            'a2': aparelho('222', 'disponivel', 'IPHONE 14', '4000.00'),
+            'a3': aparelho(None, 'vendido', 'IPHONE 12', '2000.00'),
+        }, [['usuario', 'u-1', 'Marcela Souza'], ['loja', '19', 'CASES']])
+
+        print('1. completo')
+        st, cad = snapshot_banco.atualizar_tudo(conn)
+        conferir(set(st) == CHAVES, f'atualizar() devolve {sorted(CHAVES)}')
+        conferir((st['modo'], st['lidas'], st['aparelhos']) == ('completo', 3, 3), 'completo le os 3 aparelhos')
+        conferir(_ler(snapshot_banco.SNAP_IMEIS_TODOS) == ['111', '222'], 'IMEIs todos')
+        conferir(_ler(snapshot_banco.SNAP_IMEIS_VENDIDOS) == ['111'], 'IMEIs vendidos')
+        conferir(len(_ler(snapshot_banco.SNAP_MODELO_VALOR)) == 2, 'modelo|valor dos vendidos')
+        conferir(cad == {'usuario': 1, 'loja': 1}, 'cadastro gravado')
+        conferir(resolvedor_nomes.vendedores(caminho=snapshot_banco.SNAP_CADASTRO).resolver('MARCELA').id == 'u-1',
+                 'resolvedor acha o vendedor no cadastro')
+        conferir(resolvedor_nomes.lojas(caminho=snapshot_banco.SNAP_CADASTRO).resolver('cases').id == 19,
+                 'resolvedor acha a loja no cadastro')
+
+        print('2. incremental')
+        conn.aparelhos['a2']['status'] = 'vendido'
+        conn.aparelhos['a4'] = aparelho('444', 'vendido', 'IPHONE 15', '5000.00')
+        del conn.aparelhos['a3']
+        st, cad = snapshot_banco.atualizar_tudo(conn)
+        conferir((st['modo'], st['lidas'], st['removidas'], st['aparelhos']) == ('incremental', 2, 1, 3),
+                 'so o alterado e o novo vem inteiros; o removido sai')
+        conferir(_ler(snapshot_banco.SNAP_IMEIS_VENDIDOS) == ['111', '222', '444'], 'IMEIs vendidos atualizados')
+        st, _ = snapshot_banco.atualizar_tudo(conn)
+        conferir((st['lidas'], st['removidas']) == (0, 0), 'sem mudanca, nada lido')
+
+        print('3. resumo')
+        conferir(len(snapshot_banco.resumo(st, cad)) == 5, 'resumo() com as chaves de atualizar()')
+    print('snapshot ok')